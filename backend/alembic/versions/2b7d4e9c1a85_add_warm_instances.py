@@ -0,0 +1,39 @@
+"""add warm instances
+
+Revision ID: 2b7d4e9c1a85
+Revises: 9c5e1f7a3d62
+Create Date: 2026-10-19 16:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b7d4e9c1a85'
+down_revision: Union[str, Sequence[str], None] = '9c5e1f7a3d62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('warm_instances',
+    sa.Column('c3_job_id', sa.String(), nullable=False),
+    sa.Column('pool', sa.String(), nullable=False),
+    sa.Column('region', sa.String(), nullable=True),
+    sa.Column('state', sa.String(), nullable=False),
+    sa.Column('price_per_hour', sa.Float(), nullable=False),
+    sa.Column('launched_at', sa.DateTime(), nullable=False),
+    sa.Column('ready_at', sa.DateTime(), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('job_id', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('c3_job_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('warm_instances')
@@ -0,0 +1,28 @@
+"""index billing_user_daily by user
+
+Revision ID: 4a9d2f6b8c17
+Revises: 7e3c1b9d5f28
+Create Date: 2026-10-21 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a9d2f6b8c17'
+down_revision: Union[str, Sequence[str], None] = '7e3c1b9d5f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_billing_user_daily_user_address_day', 'billing_user_daily', ['user_address', 'day'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_billing_user_daily_user_address_day', table_name='billing_user_daily')
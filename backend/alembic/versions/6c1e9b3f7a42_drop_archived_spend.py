@@ -0,0 +1,35 @@
+"""drop archived_spend
+
+Revision ID: 6c1e9b3f7a42
+Revises: 4a9d2f6b8c17
+Create Date: 2026-10-22 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c1e9b3f7a42'
+down_revision: Union[str, Sequence[str], None] = '4a9d2f6b8c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema (archived months' spend is read from billing_user_daily)."""
+    op.drop_table('archived_spend')
+
+
+def downgrade() -> None:
+    """Downgrade schema (the table comes back empty)."""
+    op.create_table('archived_spend',
+    sa.Column('user_address', sa.String(), nullable=False),
+    sa.Column('billed', sa.Boolean(), nullable=False),
+    sa.Column('jobs', sa.Integer(), nullable=False),
+    sa.Column('cost_usd', sa.Float(), nullable=False),
+    sa.Column('cost_bnb', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('user_address', 'billed')
+    )
@@ -0,0 +1,32 @@
+"""add archived months
+
+Revision ID: 7e3c1b9d5f28
+Revises: d4f8a2c6e913
+Create Date: 2026-10-21 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e3c1b9d5f28'
+down_revision: Union[str, Sequence[str], None] = 'd4f8a2c6e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('archived_months',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('month')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('archived_months')
@@ -0,0 +1,55 @@
+"""add billing rollups
+
+Revision ID: 8b41c6d2e9f0
+Revises: 5d2e8f1a7c3b
+Create Date: 2026-10-18 23:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b41c6d2e9f0'
+down_revision: Union[str, Sequence[str], None] = '5d2e8f1a7c3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('billing_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('gpu_type', sa.String(), nullable=False),
+    sa.Column('billed', sa.Boolean(), nullable=False),
+    sa.Column('jobs', sa.Integer(), nullable=False),
+    sa.Column('gpu_seconds', sa.BigInteger(), nullable=False),
+    sa.Column('cost_usd', sa.Float(), nullable=False),
+    sa.Column('cost_bnb', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'gpu_type', 'billed')
+    )
+    op.create_table('billing_user_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('user_address', sa.String(), nullable=False),
+    sa.Column('billed', sa.Boolean(), nullable=False),
+    sa.Column('jobs', sa.Integer(), nullable=False),
+    sa.Column('gpu_seconds', sa.BigInteger(), nullable=False),
+    sa.Column('cost_usd', sa.Float(), nullable=False),
+    sa.Column('cost_bnb', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'user_address', 'billed')
+    )
+    # Seed from existing jobs (same aggregation as `python rollups.py backfill`)
+    for table, group in (('billing_daily', 'gpu_type'), ('billing_user_daily', 'user_address')):
+        op.execute(f"""
+            INSERT INTO {table} (day, {group}, billed, jobs, gpu_seconds, cost_usd, cost_bnb)
+            SELECT created_at::date, {group}, billed, count(*), sum(duration_seconds), sum(cost_usd), sum(cost_bnb)
+            FROM jobs GROUP BY 1, 2, 3
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('billing_user_daily')
+    op.drop_table('billing_daily')
@@ -0,0 +1,44 @@
+"""add job lifecycle
+
+Revision ID: d4f8a2c6e913
+Revises: 2b7d4e9c1a85
+Create Date: 2026-10-20 10:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f8a2c6e913'
+down_revision: Union[str, Sequence[str], None] = '2b7d4e9c1a85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('job_lifecycle',
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('c3_job_id', sa.String(), nullable=False),
+    sa.Column('gpu_type', sa.String(), nullable=False),
+    sa.Column('region', sa.String(), nullable=True),
+    sa.Column('image', sa.String(), nullable=False),
+    sa.Column('warm', sa.Boolean(), nullable=False),
+    sa.Column('requested_at', sa.DateTime(), nullable=False),
+    sa.Column('launched_at', sa.DateTime(), nullable=False),
+    sa.Column('running_at', sa.DateTime(), nullable=True),
+    sa.Column('healthy_at', sa.DateTime(), nullable=True),
+    sa.Column('terminated_at', sa.DateTime(), nullable=True),
+    sa.Column('final_state', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_index(op.f('ix_job_lifecycle_launched_at'), 'job_lifecycle', ['launched_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_job_lifecycle_launched_at'), table_name='job_lifecycle')
+    op.drop_table('job_lifecycle')
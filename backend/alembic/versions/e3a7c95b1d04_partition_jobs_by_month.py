@@ -0,0 +1,89 @@
+"""partition jobs by month
+
+Revision ID: e3a7c95b1d04
+Revises: 8b41c6d2e9f0
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c95b1d04'
+down_revision: Union[str, Sequence[str], None] = '8b41c6d2e9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ("id, user_address, c3_job_id, gpu_type, image, duration_seconds, cost_usd, cost_bnb, "
+           "bnb_price_usd, created_at, billed")
+
+
+def job_columns():
+    return [
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('user_address', sa.String(), nullable=False),
+        sa.Column('c3_job_id', sa.String(), nullable=False),
+        sa.Column('gpu_type', sa.String(), nullable=False),
+        sa.Column('image', sa.String(), nullable=False),
+        sa.Column('duration_seconds', sa.Integer(), nullable=False),
+        sa.Column('cost_usd', sa.Float(), nullable=False),
+        sa.Column('cost_bnb', sa.Float(), nullable=False),
+        sa.Column('bnb_price_usd', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('billed', sa.Boolean(), nullable=False, server_default='true'),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.rename_table('jobs', 'jobs_unpartitioned')
+    op.execute("ALTER TABLE jobs_unpartitioned RENAME CONSTRAINT jobs_pkey TO jobs_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_jobs_user_address RENAME TO ix_jobs_unpartitioned_user_address")
+
+    op.create_table('jobs', *job_columns(),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index('ix_jobs_user_address_created_at', 'jobs', ['user_address', 'created_at'], unique=False)
+    op.create_table('archived_spend',
+    sa.Column('user_address', sa.String(), nullable=False),
+    sa.Column('billed', sa.Boolean(), nullable=False),
+    sa.Column('jobs', sa.Integer(), nullable=False),
+    sa.Column('cost_usd', sa.Float(), nullable=False),
+    sa.Column('cost_bnb', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('user_address', 'billed')
+    )
+
+    # One partition per month from the oldest job to three months ahead (partitions.py keeps extending)
+    op.execute("""
+        DO $$
+        DECLARE
+            m date := date_trunc('month', coalesce((SELECT min(created_at) FROM jobs_unpartitioned),
+                                                   now() AT TIME ZONE 'utc'))::date;
+        BEGIN
+            WHILE m <= (date_trunc('month', now() AT TIME ZONE 'utc') + interval '3 months')::date LOOP
+                EXECUTE format('CREATE TABLE %I PARTITION OF jobs FOR VALUES FROM (%L) TO (%L)',
+                               'jobs_y' || to_char(m, 'YYYY') || 'm' || to_char(m, 'MM'),
+                               m, (m + interval '1 month')::date);
+                m := (m + interval '1 month')::date;
+            END LOOP;
+        END $$
+    """)
+    op.execute(f"INSERT INTO jobs ({COLUMNS}) SELECT {COLUMNS} FROM jobs_unpartitioned")
+    op.drop_table('jobs_unpartitioned')
+
+
+def downgrade() -> None:
+    """Downgrade schema (rows already archived out of jobs are not restored)."""
+    op.rename_table('jobs', 'jobs_partitioned')
+    op.execute("ALTER TABLE jobs_partitioned RENAME CONSTRAINT jobs_pkey TO jobs_partitioned_pkey")
+    op.create_table('jobs', *job_columns(),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_jobs_user_address'), 'jobs', ['user_address'], unique=False)
+    op.execute(f"INSERT INTO jobs ({COLUMNS}) SELECT {COLUMNS} FROM jobs_partitioned")
+    op.drop_table('jobs_partitioned')  # drops its partitions too
+    op.drop_table('archived_spend')
@@ -0,0 +1,98 @@
+"""
+Balances - per address for /balance and job launches, and in bulk for admin reporting
+
+user_balance() is single-flight per address: concurrent /balance and POST /jobs calls share
+one deposit fetch and spend query, and the result is kept BALANCE_CACHE_TTL seconds. It is
+dropped when the address launches a job or its cached deposit total changes. It is for display:
+launches check launch_balance(), which reads spend from the database under a per-address lock.
+
+all_balances() does one full railgun transaction fetch grouped by sender, one GROUP BY over
+the billed spend rollup and one BNB price lookup, instead of a /balance call per user.
+"""
+import asyncio
+import os
+from collections import defaultdict
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+import cache
+import deadline
+import railgun
+import rollups
+from partitions import user_spent_bnb
+from pricing import get_bnb_price
+
+BALANCE_CACHE_TTL = float(os.getenv("BALANCE_CACHE_TTL", "2"))
+
+LAUNCH_LOCK_NS = 0x6C61756E  # advisory lock namespace, keyed by address within it
+
+SORT_KEYS = ("balance_bnb", "deposits_bnb", "spent_bnb", "address")
+
+
+async def user_balance(db: Session, address: str) -> dict:
+    """deposits_wei, deposits_bnb, spent_bnb and balance_bnb for one address"""
+    async def load():
+        deposits_wei = await railgun.get_deposits_wei(address)
+        spent_bnb = user_spent_bnb(db, address)
+        return {"deposits_wei": deposits_wei, "deposits_bnb": deposits_wei / 1e18, "spent_bnb": spent_bnb,
+                "balance_bnb": deposits_wei / 1e18 - spent_bnb}
+
+    key = f"balance:{address}"
+    balance = await cache.cached("balance", key, BALANCE_CACHE_TTL, load)
+    # A deposit refresh elsewhere (another pane, a job launch) saw new funds: recompute
+    deposits_wei = await cache.peek(f"deposits:{address}")
+    if deposits_wei is not None and deposits_wei != balance["deposits_wei"]:
+        await cache.invalidate(key)
+        balance = await cache.cached("balance", key, BALANCE_CACHE_TTL, load)
+    return balance
+
+
+async def launch_balance(db: Session, address: str) -> float:
+    """Balance to check a launch against - uncached spend, with the address's launches serialized
+    until db's transaction ends (the job insert commits), so concurrent launches on any worker or
+    pod can't both spend the same funds"""
+    lock = text("SELECT pg_try_advisory_xact_lock(:ns, hashtext(:address))")
+    params = {"ns": LAUNCH_LOCK_NS, "address": address}
+    # Polled (from a worker thread, backing off) rather than waited on inside Postgres, so a waiter
+    # gives up at its deadline instead of blocking until the launch ahead of it commits
+    delay = 0.05
+    while not await asyncio.to_thread(lambda: db.execute(lock, params).scalar()):
+        deadline.check()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+    # Cached deposits only ever lag behind (deposits don't shrink), which errs on the safe side
+    deposits_wei = await railgun.get_deposits_wei(address)
+    return deposits_wei / 1e18 - await asyncio.to_thread(user_spent_bnb, db, address)
+
+
+async def invalidate(address: str):
+    await cache.invalidate(f"balance:{address}")
+
+
+def deposits_by_sender(txs: list) -> dict[str, int]:
+    """Sender address -> total deposited wei"""
+    totals = defaultdict(int)
+    for tx in txs:
+        for r in tx.get("received", []):
+            if r.get("from"):
+                totals[r["from"]] += int(r["amount"])
+    return totals
+
+
+async def all_balances(db: Session, sort: str = "balance_bnb", desc: bool = False,
+                       below: float | None = None) -> list[dict]:
+    """Balances for every address that deposited or spent, optionally only those under `below` BNB"""
+    deposits = deposits_by_sender(await railgun.get_transactions())
+    spent = rollups.spend_by_user(db)
+    bnb_price = await get_bnb_price()
+
+    rows = []
+    for address in deposits.keys() | spent.keys():
+        deposits_bnb = deposits.get(address, 0) / 1e18
+        spent_bnb = spent.get(address, 0.0)
+        balance_bnb = deposits_bnb - spent_bnb
+        if below is not None and balance_bnb >= below:
+            continue
+        rows.append({"address": address, "deposits_bnb": deposits_bnb, "spent_bnb": spent_bnb,
+                     "balance_bnb": balance_bnb, "balance_usd": balance_bnb * bnb_price})
+    rows.sort(key=lambda r: r[sort], reverse=desc)
+    return rows
@@ -0,0 +1,148 @@
+"""
+Circuit breakers for upstream dependencies (railgun, c3, coingecko)
+
+closed     calls flow; the last BREAKER_WINDOW outcomes are kept, and once BREAKER_MIN_CALLS
+           are in, an error rate >= BREAKER_ERROR_RATE or a slow-call rate >= BREAKER_SLOW_RATE opens it
+open       calls fail immediately with CircuitOpen for BREAKER_OPEN_SECONDS (callers fall back to
+           cached values, or the app answers 503 with Retry-After)
+half_open  a single probe call goes through; success closes the breaker, failure re-opens it
+
+    async with RAILGUN.call(), track_upstream("railgun", "verify"):
+        ...
+"""
+import os
+import threading
+import time
+from collections import deque
+from metrics import BREAKER_REJECTED, BREAKER_STATE, BREAKER_TRANSITIONS
+
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+breakers: dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} circuit open")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, slow_seconds: float, is_failure=None):
+        self.name = name
+        self.slow_seconds = slow_seconds
+        self.is_failure = is_failure or (lambda exc: True)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probing = False
+        self._outcomes = deque(maxlen=BREAKER_WINDOW)  # (failed, slow)
+        self._lock = threading.Lock()  # C3 calls also run in worker threads
+        breakers[name] = self
+        BREAKER_STATE.labels(name).set(0)
+
+    def call(self) -> "_Call":
+        """Context manager (with / async with) guarding one upstream call"""
+        return _Call(self)
+
+    def _transition(self, state: str):
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        BREAKER_STATE.labels(self.name).set(STATE_VALUES[state])
+        BREAKER_TRANSITIONS.labels(self.name, state).inc()
+
+    def before(self) -> bool:
+        """Raises CircuitOpen when calls aren't allowed; returns True if this call is the half-open probe"""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.opened_at + BREAKER_OPEN_SECONDS - time.monotonic()
+                if remaining > 0:
+                    BREAKER_REJECTED.labels(self.name).inc()
+                    raise CircuitOpen(self.name, remaining)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    BREAKER_REJECTED.labels(self.name).inc()
+                    raise CircuitOpen(self.name, 1)
+                self._probing = True
+                return True
+            return False
+
+    def after(self, probe: bool, failed: bool | None, duration: float):
+        """Record an outcome (failed=None: cancelled, not counted)"""
+        slow = duration >= self.slow_seconds
+        with self._lock:
+            if probe:
+                self._probing = False
+                if failed is None:
+                    return
+                if failed or slow:
+                    self._transition(OPEN)
+                else:
+                    self._outcomes.clear()
+                    self._transition(CLOSED)
+                return
+            if failed is None or self.state != CLOSED:
+                return  # calls started before the breaker opened don't count
+            self._outcomes.append((failed, slow))
+            n = len(self._outcomes)
+            if n < BREAKER_MIN_CALLS:
+                return
+            errors = sum(f for f, _ in self._outcomes) / n
+            slows = sum(s for _, s in self._outcomes) / n
+            if errors >= BREAKER_ERROR_RATE or slows >= BREAKER_SLOW_RATE:
+                self._outcomes.clear()
+                self._transition(OPEN)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            n = len(self._outcomes)
+            retry_after = max(0.0, self.opened_at + BREAKER_OPEN_SECONDS - time.monotonic()) if self.state == OPEN else 0
+            return {
+                "state": self.state,
+                "calls": n,
+                "error_rate": sum(f for f, _ in self._outcomes) / n if n else 0.0,
+                "slow_rate": sum(s for _, s in self._outcomes) / n if n else 0.0,
+                "slow_seconds": self.slow_seconds,
+                "retry_after": round(retry_after, 1),
+            }
+
+
+class _Call:
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+
+    def __enter__(self):
+        self.probe = self.breaker.before()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            failed = False
+        elif issubclass(exc_type, Exception):
+            failed = self.breaker.is_failure(exc)
+        else:
+            failed = None  # cancellation / shutdown
+        self.breaker.after(self.probe, failed, time.perf_counter() - self.start)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def status() -> dict:
+    return {name: b.snapshot() for name, b in breakers.items()}
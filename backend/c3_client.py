@@ -0,0 +1,22 @@
+"""
+C3 SDK access - imported on first use, one shared client per process
+"""
+import os
+from breaker import CircuitBreaker
+from env_config import get_c3_api_key
+
+C3_SLOW_SECONDS = float(os.getenv("C3_SLOW_SECONDS", "5"))
+
+# APIError 4xx (unknown GPU, job not found) is the caller's problem, not an outage
+BREAKER = CircuitBreaker("c3", C3_SLOW_SECONDS, is_failure=lambda e: getattr(e, "status_code", 500) >= 500)
+
+_client = None
+
+
+def get_c3():
+    """Shared C3 client (the SDK import is deferred until a handler or warm-up needs it)"""
+    global _client
+    if _client is None:
+        from c3 import C3
+        _client = C3(api_key=get_c3_api_key())
+    return _client
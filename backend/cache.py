@@ -0,0 +1,239 @@
+"""
+Cache backends - TTL entries for upstream lookups (BNB price, C3 pricing, deposits)
+
+CACHE_BACKEND=memory    per-process dict (default, fine for a single worker)
+CACHE_BACKEND=postgres  UNLOGGED cache_entries table shared by all workers and pods
+
+Both keep expired entries around for stale-if-error and prune them later (memory: past
+MAX_ENTRIES; postgres: CACHE_RETAIN_SECONDS after expiry, swept every CACHE_SWEEP_SECONDS).
+
+Refreshes are single-flight: a caller that finds an expired entry takes a lease
+(atomic compare-and-set), fetches and stores the new value; everyone else keeps
+serving the stale value meanwhile, or waits for the refresher when there is none.
+Within a process, concurrent callers of the same key share one refresh outright.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from sqlalchemy import text
+import deadline
+from database import engine
+from deadline import DeadlineExceeded
+from metrics import CACHE_REQUESTS, cache_lookup
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_LEASE_SECONDS = float(os.getenv("CACHE_LEASE_SECONDS", "10"))  # max refresh time before another caller may retry
+CACHE_RETAIN_SECONDS = float(os.getenv("CACHE_RETAIN_SECONDS", "86400"))  # keep expired entries this long (stale-if-error)
+CACHE_SWEEP_SECONDS = float(os.getenv("CACHE_SWEEP_SECONDS", "300"))  # how often each process deletes older ones
+
+
+class CacheBackend:
+    """Interface - values must be JSON-serializable"""
+
+    async def get(self, key: str) -> tuple[object, float] | None:
+        """(value, seconds until expiry - negative once stale) or None"""
+        raise NotImplementedError
+
+    async def set(self, key: str, value, ttl: float):
+        """Store a value and release any refresh lease on the key"""
+        raise NotImplementedError
+
+    async def acquire(self, key: str, lease: float) -> bool:
+        """Take the refresh lease unless another caller holds an unexpired one"""
+        raise NotImplementedError
+
+    async def release(self, key: str):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    MAX_ENTRIES = 10_000  # expired entries are pruned past this (per-address deposit keys)
+
+    def __init__(self):
+        self._entries: dict[str, tuple[object, float]] = {}
+        self._leases: dict[str, float] = {}
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[0], entry[1] - time.monotonic()
+
+    async def set(self, key, value, ttl):
+        now = time.monotonic()
+        if len(self._entries) >= self.MAX_ENTRIES:
+            self._entries = {k: e for k, e in self._entries.items() if e[1] > now}
+        self._entries[key] = (value, now + ttl)
+        self._leases.pop(key, None)
+
+    async def acquire(self, key, lease):
+        now = time.monotonic()
+        if self._leases.get(key, 0) > now:
+            return False
+        self._leases[key] = now + lease
+        return True
+
+    async def release(self, key):
+        self._leases.pop(key, None)
+
+    async def delete(self, key):
+        self._entries.pop(key, None)
+        self._leases.pop(key, None)
+
+
+class PostgresCache(CacheBackend):
+    """Shared cache in an UNLOGGED table (no WAL; contents may be lost on a DB crash, which is fine for a cache)"""
+
+    GET = text("SELECT value, EXTRACT(EPOCH FROM expires_at - now()) FROM cache_entries "
+               "WHERE key = :key AND value IS NOT NULL")
+    SET = text("INSERT INTO cache_entries (key, value, expires_at, lease_until) "
+               "VALUES (:key, CAST(:value AS jsonb), now() + make_interval(secs => :ttl), NULL) "
+               "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+               "lease_until = NULL")
+    ACQUIRE = text("INSERT INTO cache_entries (key, value, expires_at, lease_until) "
+                   "VALUES (:key, NULL, now(), now() + make_interval(secs => :lease)) "
+                   "ON CONFLICT (key) DO UPDATE SET lease_until = excluded.lease_until "
+                   "WHERE cache_entries.lease_until IS NULL OR cache_entries.lease_until < now() "
+                   "RETURNING key")
+    RELEASE = text("UPDATE cache_entries SET lease_until = NULL WHERE key = :key")
+    DELETE = text("DELETE FROM cache_entries WHERE key = :key")
+    SWEEP = text("DELETE FROM cache_entries WHERE expires_at < now() - make_interval(secs => :retain) "
+                 "AND (lease_until IS NULL OR lease_until < now())")
+
+    def __init__(self):
+        self._swept = time.monotonic()
+
+    def _execute(self, stmt, params: dict):
+        with engine.begin() as conn:
+            result = conn.execute(stmt, params)
+            return result.first() if result.returns_rows else None
+
+    async def _run(self, stmt, **params):
+        return await asyncio.to_thread(self._execute, stmt, params)
+
+    async def get(self, key):
+        row = await self._run(self.GET, key=key)
+        return (row[0], float(row[1])) if row else None
+
+    async def set(self, key, value, ttl):
+        await self._run(self.SET, key=key, value=json.dumps(value), ttl=ttl)
+        # Per-address keys (deposits, balances) would otherwise pile up forever
+        if time.monotonic() - self._swept >= CACHE_SWEEP_SECONDS:
+            self._swept = time.monotonic()
+            try:
+                await self._run(self.SWEEP, retain=CACHE_RETAIN_SECONDS)
+            except Exception as e:
+                logger.warning(f"Failed to sweep expired cache entries: {e!r}")
+
+    async def acquire(self, key, lease):
+        return await self._run(self.ACQUIRE, key=key, lease=lease) is not None
+
+    async def release(self, key):
+        await self._run(self.RELEASE, key=key)
+
+    async def delete(self, key):
+        await self._run(self.DELETE, key=key)
+
+
+_inflight: dict[str, asyncio.Future] = {}  # key -> refresh running in this process
+
+BACKENDS = {"memory": MemoryCache, "postgres": PostgresCache}
+_backend: CacheBackend | None = None
+
+
+def backend() -> CacheBackend:
+    global _backend
+    if _backend is None:
+        if CACHE_BACKEND not in BACKENDS:
+            raise RuntimeError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND} (expected one of {', '.join(BACKENDS)})")
+        _backend = BACKENDS[CACHE_BACKEND]()
+    return _backend
+
+
+async def cached(name: str, key: str, ttl: float, loader, stale_if_error: float = 0):
+    """
+    Value for key, refreshed through `await loader()` at most once per ttl across all callers.
+    If the refresh fails, an entry expired less than stale_if_error seconds ago is served instead.
+    """
+    store = backend()
+    entry = await store.get(key)
+    if entry and entry[1] > 0:
+        cache_lookup(name, True)
+        return entry[0]
+    cache_lookup(name, False)
+
+    if key in _inflight:
+        return await _join(_inflight[key])
+    future = _inflight[key] = asyncio.get_running_loop().create_future()
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())  # nobody may be waiting
+    try:
+        value = await _refresh(name, key, ttl, loader, stale_if_error, entry)
+    except BaseException as e:
+        future.set_exception(e) if isinstance(e, Exception) else future.cancel()
+        raise
+    else:
+        future.set_result(value)
+        if _inflight.get(key) is not future:  # invalidated mid-refresh, the value may predate the change
+            await store.delete(key)
+        return value
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+async def _join(future: asyncio.Future):
+    """Wait for another caller's refresh, no longer than this request's deadline"""
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), deadline.remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("request deadline exceeded waiting for a cache refresh")
+
+
+async def _refresh(name: str, key: str, ttl: float, loader, stale_if_error: float, entry):
+    store = backend()
+    if await store.acquire(key, CACHE_LEASE_SECONDS):
+        try:
+            value = await loader()
+        except BaseException as e:
+            await store.release(key)
+            if isinstance(e, Exception) and entry and entry[1] > -stale_if_error:
+                logger.warning(f"Serving stale {name} ({-entry[1]:.0f}s past expiry): {e!r}")
+                CACHE_REQUESTS.labels(name, "stale").inc()
+                return entry[0]
+            raise
+        await store.set(key, value, ttl)
+        return value
+
+    # Another process is refreshing: serve stale for up to one more ttl, else wait for it,
+    # polling with backoff so a slow refresh isn't hammered by every waiter
+    if entry and entry[1] > -ttl:
+        return entry[0]
+    left = deadline.remaining()
+    until = time.monotonic() + (CACHE_LEASE_SECONDS if left is None else min(CACHE_LEASE_SECONDS, left))
+    delay = 0.05
+    while (wait := until - time.monotonic()) > 0:
+        await asyncio.sleep(min(delay, wait))
+        delay = min(delay * 2, 1.0)
+        entry = await store.get(key)
+        if entry and entry[1] > 0:
+            return entry[0]
+    deadline.check()
+    return await loader()
+
+
+async def peek(key: str):
+    """Unexpired value for key without loading or counting a lookup, else None"""
+    entry = await backend().get(key)
+    return entry[0] if entry and entry[1] > 0 else None
+
+
+async def invalidate(key: str):
+    _inflight.pop(key, None)  # later callers start a fresh refresh instead of joining one that predates this
+    await backend().delete(key)
@@ -3,6 +3,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+from metrics import DB_POOL_CHECKOUT, instrument_pool
 
 load_dotenv()
 
@@ -24,11 +25,14 @@ engine = create_engine(
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+instrument_pool(engine)
 
 
 def get_db():
     db = SessionLocal()
     try:
+        with DB_POOL_CHECKOUT.time():
+            db.connection()
         yield db
     finally:
         db.close()
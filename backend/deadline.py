@@ -0,0 +1,50 @@
+"""
+Request deadlines - one latency budget per handler, shared by all of its upstream calls
+
+    @router.get("", dependencies=[Depends(with_deadline(BALANCE_DEADLINE))])
+
+Upstream clients ask timeout(default) for what is left of the budget instead of a
+fixed timeout; once it is spent, DeadlineExceeded becomes a 504.
+"""
+import time
+from contextvars import ContextVar
+
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def with_deadline(seconds: float):
+    """Dependency starting the handler's budget (async: sync dependencies run in a thread's copied context)"""
+    async def start_deadline():
+        _deadline.set(time.monotonic() + seconds)
+    return start_deadline
+
+
+def remaining() -> float | None:
+    """Seconds left in the current budget (None when the caller has no deadline)"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check():
+    """Raise before starting work whose result would arrive after the deadline"""
+    if expired():
+        raise DeadlineExceeded("request deadline exceeded")
+
+
+def timeout(default: float) -> float:
+    """Timeout for the next upstream call: the default, capped by the remaining budget"""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return min(default, left)
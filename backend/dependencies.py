@@ -5,9 +5,11 @@ Keys in SEC1 format:
 - Private: 64 hex chars (256-bit value)
 - Public: 130 hex chars (04 + x + y coordinates)
 """
+import hmac
 import os
 import jwt
 import logging
+from functools import lru_cache
 from datetime import datetime, timedelta
 from fastapi import Header, HTTPException
 from cryptography.hazmat.primitives.asymmetric import ec
@@ -41,9 +43,21 @@ def load_public_key(hex_key: str):
     return public_numbers.public_key(default_backend())
 
 
+@lru_cache(maxsize=1)
+def signing_key():
+    """Parsed JWT_PRIVATE_KEY (loaded once)"""
+    return load_private_key(JWT_PRIVATE_KEY)
+
+
+@lru_cache(maxsize=1)
+def verifying_key():
+    """Parsed JWT_PUBLIC_KEY (loaded once)"""
+    return load_public_key(JWT_PUBLIC_KEY)
+
+
 def create_jwt(address: str) -> str:
     """Create JWT token for authenticated user"""
-    private_key = load_private_key(JWT_PRIVATE_KEY)
+    private_key = signing_key()
     payload = {
         "address": address,
         "iat": datetime.utcnow(),
@@ -55,7 +69,7 @@ def create_jwt(address: str) -> str:
 def decode_jwt(token: str) -> dict:
     """Decode and validate JWT token"""
     try:
-        public_key = load_public_key(JWT_PUBLIC_KEY)
+        public_key = verifying_key()
         return jwt.decode(token, public_key, algorithms=["ES256"])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
@@ -76,9 +90,31 @@ async def require_auth(authorization: str = Header(...)) -> str:
 BACKEND_API_KEY = os.getenv("BACKEND_API_KEY")
 
 
+def _matches(value: str | None, secret: str | None) -> bool:
+    return bool(secret and value and hmac.compare_digest(value, secret))
+
+
+def is_admin_key(key: str | None) -> bool:
+    """Constant-time admin API key check (also used by middleware, where dependencies don't run)"""
+    return _matches(key, BACKEND_API_KEY)
+
+
 async def require_admin(x_backend_api_key: str = Header(..., alias="X-BACKEND-API-KEY")) -> None:
     """Dependency to require admin API key"""
     if not BACKEND_API_KEY:
         raise HTTPException(status_code=500, detail="BACKEND_API_KEY not configured")
-    if x_backend_api_key != BACKEND_API_KEY:
+    if not is_admin_key(x_backend_api_key):
         raise HTTPException(status_code=403, detail="Invalid API key")
+
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+async def require_metrics_access(
+    authorization: str | None = Header(None),
+    x_backend_api_key: str | None = Header(None, alias="X-BACKEND-API-KEY"),
+) -> None:
+    """Dependency for the Prometheus scrape endpoint: `Bearer METRICS_TOKEN` or the admin API key"""
+    token = authorization[7:] if authorization and authorization.startswith("Bearer ") else None
+    if not (_matches(token, METRICS_TOKEN) or is_admin_key(x_backend_api_key)):
+        raise HTTPException(status_code=403, detail="Metrics require METRICS_TOKEN or the admin API key")
@@ -2,21 +2,18 @@
 set -e
 
 echo "Running database migrations..."
+python migrate.py
 
-# Check if alembic_version table exists
-if ! python -c "
-from database import engine
-from sqlalchemy import text
-with engine.connect() as conn:
-    conn.execute(text('SELECT 1 FROM alembic_version LIMIT 1'))
-" 2>/dev/null; then
-    echo "No alembic_version table found, stamping base revision..."
-    # Get the base revision (first migration)
-    BASE_REV=$(alembic history | grep '<base>' | awk '{print $3}' | tr -d ',')
-    alembic stamp "$BASE_REV"
-fi
+# Schema is owned by Alembic from here on, the app skips create_all
+export MIGRATIONS_MANAGED=true
 
-alembic upgrade head
-echo "Migrations complete."
+WEB_CONCURRENCY="${WEB_CONCURRENCY:-1}"
+if [ "$WEB_CONCURRENCY" -gt 1 ]; then
+    # Workers share Prometheus metrics through files in this directory
+    export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
 
-exec uvicorn main:app --host 0.0.0.0 --port 8000
+# Bounded so open /jobs/events streams don't hold a rolling deploy; access lines come from logs.py
+exec uvicorn main:app --host 0.0.0.0 --port 8000 --workers "$WEB_CONCURRENCY" --timeout-graceful-shutdown 10 --no-access-log
@@ -13,6 +13,15 @@ BACKEND_API_KEY = os.getenv("BACKEND_API_KEY")
 BNB_BUFFER = float(os.getenv("BNB_BUFFER", "1.2"))  # 20% buffer for price fluctuations
 BILLING_ENABLED = os.getenv("BILLING_ENABLED", "true").lower() == "true"
 
+# Request deadlines (seconds) - total budget per handler across its upstream calls
+AUTH_DEADLINE = float(os.getenv("AUTH_DEADLINE", "5"))
+BALANCE_DEADLINE = float(os.getenv("BALANCE_DEADLINE", "5"))
+JOBS_DEADLINE = float(os.getenv("JOBS_DEADLINE", "15"))
+
+# Startup
+MIGRATIONS_MANAGED = os.getenv("MIGRATIONS_MANAGED", "false").lower() == "true"  # schema owned by Alembic (entrypoint.sh)
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "20"))
+
 
 def get_c3_api_key() -> str:
     return os.getenv("C3_API_KEY")
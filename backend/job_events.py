@@ -0,0 +1,256 @@
+"""
+Job lifecycle events - one watcher per process feeds every subscribed terminal
+
+The watcher polls C3 with a single jobs.list() call every JOB_WATCH_INTERVAL seconds (only
+while someone is subscribed), diffs job states and pushes events to the owners' streams, so
+N connected terminals cost one upstream call per interval. Launches are published directly
+by create_job; jobs launched through another worker show up on the next poll.
+
+Events: queued, billed, running (with hostname), terminated (with the final C3 state)
+
+The same polls time this process's launches through their lifecycle stages (running,
+healthy, or failing first) for lifecycle.py and the region selector, so the watcher also keeps
+polling while any of them is still on its way up.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from c3_client import BREAKER as C3_BREAKER, get_c3
+from database import SessionLocal
+from metrics import JOB_EVENT_SUBSCRIBERS, track_upstream
+from models import Job
+from partitions import hot_since
+import lifecycle
+from ratelimit import quota
+from regions import REGION_TTR_TIMEOUT, selector
+
+logger = logging.getLogger(__name__)
+
+JOB_WATCH_INTERVAL = float(os.getenv("JOB_WATCH_INTERVAL", "5"))
+JOB_EVENTS_MAX_STREAMS = int(os.getenv("JOB_EVENTS_MAX_STREAMS", "5"))  # per address
+# A job another worker launched may be listed by C3 before its row commits: unknown active jobs are
+# looked up again after this long rather than written off
+JOB_OWNER_RETRY_SECONDS = float(os.getenv("JOB_OWNER_RETRY_SECONDS", "15"))
+QUEUE_SIZE = 100  # events buffered per stream; the oldest is dropped past this
+
+TERMINAL_STATES = {"completed", "cancelled", "failed", "terminated", "preempted", "expired"}
+CLOSED = None  # sentinel ending a stream on shutdown
+
+
+def event_for(state: str, hostname: str | None) -> str | None:
+    """Event type for a C3 state; None while running without a hostname yet"""
+    if state in TERMINAL_STATES:
+        return "terminated"
+    if state == "running":
+        return "running" if hostname else None
+    return "queued"
+
+
+@dataclass
+class Launch:
+    """A launch from this process on its way to running / healthy"""
+    job_id: str
+    gpu_type: str
+    region: str | None
+    launched_at: datetime
+    started: float  # monotonic, for the region selector
+    warm: bool  # handed over from the warm pool: says nothing about the region's time-to-running
+    service: bool  # has a load-balancer port to health-check
+    hostname: str | None = None  # set once running
+
+
+class JobWatcher:
+    def __init__(self):
+        self.streams: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self.states: dict[str, tuple[str, str | None]] = {}  # c3_job_id -> (state, hostname)
+        self.owners: dict[str, dict] = {}  # c3_job_id -> job info
+        self.misses: dict[str, float] = {}  # c3_job_id -> when a lookup last found no job row (monotonic)
+        self.pending: dict[str, Launch] = {}  # c3_job_id -> launch still being timed
+        self.ready = asyncio.Event()  # set once states reflect a poll made while subscribed
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, address: str) -> asyncio.Queue | None:
+        """New stream for an address, None when it already has JOB_EVENTS_MAX_STREAMS open"""
+        if len(self.streams[address]) >= JOB_EVENTS_MAX_STREAMS:
+            return None
+        queue = asyncio.Queue(QUEUE_SIZE)
+        self.streams[address].add(queue)
+        JOB_EVENT_SUBSCRIBERS.inc()
+        self._start()
+        return queue
+
+    def _start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        self._wake.set()
+
+    def unsubscribe(self, address: str, queue: asyncio.Queue):
+        if queue in self.streams.get(address, ()):
+            self.streams[address].discard(queue)
+            JOB_EVENT_SUBSCRIBERS.dec()
+        if not self.streams.get(address):
+            self.streams.pop(address, None)
+
+    def publish(self, address: str, event: dict):
+        for queue in self.streams.get(address, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def launched(self, job: Job, state: str, warm: bool = False, service: bool = False):
+        """create_job hook: push queued/billed now instead of on the next poll, start timing the launch"""
+        info = self._info(job)
+        self.owners[job.c3_job_id] = info
+        self.misses.pop(job.c3_job_id, None)
+        self.states[job.c3_job_id] = (state, None)
+        self.publish(job.user_address, {"type": "queued", **info, "state": state})
+        if job.billed:
+            self.publish(job.user_address, {"type": "billed", **info})
+        started = selector.launched(job.gpu_type, job.region) if job.region and not warm else time.monotonic()
+        self.pending[job.c3_job_id] = Launch(job.id, job.gpu_type, job.region, job.created_at, started, warm, service)
+        self._start()
+
+    def snapshot(self, address: str) -> list[dict]:
+        """Current events for the address's active jobs (sent when a stream opens)"""
+        events = []
+        for c3_job_id, (state, hostname) in self.states.items():
+            info = self.owners.get(c3_job_id)
+            kind = event_for(state, hostname)
+            if info and info["address"] == address and kind and kind != "terminated":
+                events.append({"type": kind, **info, "state": state, "hostname": hostname})
+        return events
+
+    async def close(self):
+        """End every stream and stop polling (app shutdown)"""
+        for queues in self.streams.values():
+            for queue in queues:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(CLOSED)
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    @staticmethod
+    def _info(job: Job) -> dict:
+        return {"job_id": job.id, "c3_job_id": job.c3_job_id, "address": job.user_address,
+                "gpu_type": job.gpu_type, "cost_bnb": job.cost_bnb, "billed": job.billed}
+
+    async def observe_launches(self, jobs: list):
+        """Record lifecycle stages of pending launches: running, healthy, or terminated before that"""
+        now = datetime.utcnow()
+        updates = []
+        for j in jobs:
+            launch = self.pending.get(j.job_id)
+            if launch is None:
+                continue
+            if j.state in TERMINAL_STATES:
+                del self.pending[j.job_id]
+                updates.append((launch.job_id, {"terminated_at": now, "final_state": j.state}))
+                if launch.hostname is None and launch.region and not launch.warm:
+                    selector.observe_failure(launch.gpu_type, launch.region)
+            elif j.state == "running" and j.hostname and launch.hostname is None:
+                launch.hostname = j.hostname
+                updates.append((launch.job_id, {"running_at": now}))
+                lifecycle.reached(launch.gpu_type, launch.region, "running", launch.launched_at, now)
+                if launch.region and not launch.warm:
+                    selector.observe_running(launch.gpu_type, launch.region, launch.started)
+                if not launch.service:
+                    del self.pending[j.job_id]
+
+        probing = [(c3_job_id, l) for c3_job_id, l in self.pending.items() if l.hostname]
+        healthy = await asyncio.gather(*(lifecycle.probe(l.hostname) for _, l in probing))
+        for (c3_job_id, launch), ok in zip(probing, healthy):
+            if ok:
+                del self.pending[c3_job_id]
+                updates.append((launch.job_id, {"healthy_at": now}))
+                lifecycle.reached(launch.gpu_type, launch.region, "healthy", launch.launched_at, now)
+
+        elapsed = time.monotonic()
+        for c3_job_id, launch in list(self.pending.items()):
+            if launch.hostname is None and elapsed - launch.started > REGION_TTR_TIMEOUT:
+                del self.pending[c3_job_id]
+                if launch.region and not launch.warm:
+                    selector.observe_failure(launch.gpu_type, launch.region)
+            elif elapsed - launch.started > lifecycle.LIFECYCLE_TRACK_SECONDS:
+                del self.pending[c3_job_id]
+        return updates
+
+    def _lookup(self, c3_job_ids: list[str]) -> dict[str, dict]:
+        with SessionLocal() as db:
+            jobs = db.query(Job).filter(Job.c3_job_id.in_(c3_job_ids), Job.created_at >= hot_since()).all()
+            return {j.c3_job_id: self._info(j) for j in jobs}
+
+    async def poll(self):
+        await quota("c3")
+        async with C3_BREAKER.call(), track_upstream("c3", "list"):
+            jobs = await asyncio.to_thread(get_c3().jobs.list)
+        updates = await self.observe_launches(jobs)
+
+        now = time.monotonic()
+        unknown = [j.job_id for j in jobs if j.job_id not in self.owners and (
+            j.job_id not in self.misses
+            or j.state not in TERMINAL_STATES and now - self.misses[j.job_id] >= JOB_OWNER_RETRY_SECONDS)]
+        resolved = set()  # ours after an earlier miss: their owners haven't had any event yet
+        if unknown:
+            found = await asyncio.to_thread(self._lookup, unknown)
+            for c3_job_id in unknown:
+                if c3_job_id in found:
+                    self.owners[c3_job_id] = found[c3_job_id]
+                    if self.misses.pop(c3_job_id, None) is not None:
+                        resolved.add(c3_job_id)
+                else:
+                    self.misses[c3_job_id] = now
+
+        seeding = not self.ready.is_set()
+        seen = set()
+        for j in jobs:
+            seen.add(j.job_id)
+            current = (j.state, j.hostname)
+            previous = None if j.job_id in resolved else self.states.get(j.job_id)
+            self.states[j.job_id] = current
+            info = self.owners.get(j.job_id)
+            kind = event_for(j.state, j.hostname)
+            if seeding or not info or kind is None:
+                continue
+            if previous is None:
+                if kind == "terminated":
+                    continue  # finished before we ever saw it
+            elif kind == event_for(*previous):
+                continue
+            if kind == "terminated":
+                updates.append((info["job_id"], {"terminated_at": datetime.utcnow(), "final_state": j.state}))
+            self.publish(info["address"], {"type": kind, **info, "state": j.state, "hostname": j.hostname})
+            if previous is None and info["billed"]:
+                self.publish(info["address"], {"type": "billed", **info})  # launched through another worker
+        # Forget finished jobs C3 no longer lists (launches not listed yet are kept)
+        for c3_job_id, (state, _) in list(self.states.items()):
+            if c3_job_id not in seen and state in TERMINAL_STATES:
+                del self.states[c3_job_id]
+                self.owners.pop(c3_job_id, None)
+        for c3_job_id in self.misses.keys() - seen:
+            del self.misses[c3_job_id]
+        await asyncio.to_thread(lifecycle.save, updates)
+        self.ready.set()
+
+    async def _run(self):
+        while True:
+            if not self.streams and not self.pending:
+                # Idle: nobody to notify, stop polling and start from a fresh snapshot later
+                self.ready.clear()
+                self._wake.clear()
+                await self._wake.wait()
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning(f"Job watcher poll failed: {e!r}")
+                self.ready.set()  # don't hold new streams back, they get events from the next poll
+            await asyncio.sleep(JOB_WATCH_INTERVAL)
+
+
+watcher = JobWatcher()
@@ -0,0 +1,103 @@
+"""
+Job lifecycle timing - when each launch was requested, created on C3, running with a hostname,
+serving HTTP and terminated
+
+create_job inserts the row together with the job; the job watcher (job_events.py) fills in the
+later stages from its polls, so they are accurate to about JOB_WATCH_INTERVAL. "healthy" only
+applies to jobs with a load-balancer port: LIFECYCLE_HEALTH_URL answering with any non-5xx
+status (a 401 from an API-key protected model server still means it is up).
+
+Durations from C3 create are exported per gpu_type, region and stage as a histogram, and as
+percentiles per gpu_type, region and image by GET /admin/lifecycle.
+"""
+import os
+from datetime import datetime
+import httpx
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from metrics import JOB_LAUNCH_SECONDS
+from models import Job, JobLifecycle
+
+LIFECYCLE_HEALTH_URL = os.getenv("LIFECYCLE_HEALTH_URL", "https://{hostname}/health")
+LIFECYCLE_HEALTH_TIMEOUT = float(os.getenv("LIFECYCLE_HEALTH_TIMEOUT", "3"))
+LIFECYCLE_TRACK_SECONDS = float(os.getenv("LIFECYCLE_TRACK_SECONDS", "1800"))  # give up waiting for healthy after this
+
+PERCENTILES = (0.5, 0.9, 0.99)
+_client: httpx.AsyncClient | None = None
+
+
+def record_launch(db: Session, job: Job, requested_at: datetime, warm: bool):
+    """Add the lifecycle row of a new job (call before committing the job insert)"""
+    db.add(JobLifecycle(job_id=job.id, c3_job_id=job.c3_job_id, gpu_type=job.gpu_type, region=job.region,
+                        image=job.image, warm=warm, requested_at=requested_at, launched_at=job.created_at))
+
+
+def reached(gpu_type: str, region: str | None, stage: str, launched_at: datetime, at: datetime):
+    JOB_LAUNCH_SECONDS.labels(gpu_type, region or "", stage).observe((at - launched_at).total_seconds())
+
+
+def save(updates: list[tuple[str, dict]]):
+    """Set stage timestamps - (job_id, {column: value}); a stage already recorded is kept"""
+    if not updates:
+        return
+    with SessionLocal() as db:
+        for job_id, values in updates:
+            first = next(iter(values))
+            db.execute(update(JobLifecycle).where(JobLifecycle.job_id == job_id,
+                                                  getattr(JobLifecycle, first).is_(None)).values(**values))
+        db.commit()
+
+
+def client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=LIFECYCLE_HEALTH_TIMEOUT, follow_redirects=True)
+    return _client
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def probe(hostname: str) -> bool:
+    """Whether the job's service answers HTTP yet"""
+    try:
+        r = await client().get(LIFECYCLE_HEALTH_URL.format(hostname=hostname))
+    except httpx.HTTPError:
+        return False
+    return r.status_code < 500
+
+
+def _seconds(column):
+    return func.extract("epoch", column - JobLifecycle.launched_at)
+
+
+def _percentiles(values) -> dict | None:
+    if values is None:
+        return None
+    return {f"p{round(p * 100)}": round(v, 2) for p, v in zip(PERCENTILES, values)}
+
+
+def percentiles(db: Session, since: datetime, warm: bool = False, gpu_type: str | None = None) -> list[dict]:
+    """Launch counts and time-to-running / time-to-healthy percentiles per gpu_type, region and image"""
+    t = JobLifecycle
+    query = select(
+        t.gpu_type, t.region, t.image, func.count(),
+        func.count(t.running_at), func.count(t.healthy_at),
+        func.count().filter(and_(t.running_at.is_(None), t.final_state.isnot(None))),
+        func.percentile_cont(array(PERCENTILES)).within_group(func.extract("epoch", t.launched_at - t.requested_at)),
+        func.percentile_cont(array(PERCENTILES)).within_group(_seconds(t.running_at)),
+        func.percentile_cont(array(PERCENTILES)).within_group(_seconds(t.healthy_at)),
+    ).where(t.launched_at >= since, t.warm == warm).group_by(t.gpu_type, t.region, t.image) \
+        .order_by(t.gpu_type, t.region, t.image)
+    if gpu_type:
+        query = query.where(t.gpu_type == gpu_type)
+    return [{"gpu_type": g, "region": r, "image": image, "launches": n, "running": running, "healthy": healthy,
+             "failed_before_running": failed, "create_seconds": _percentiles(create),
+             "to_running_seconds": _percentiles(to_running), "to_healthy_seconds": _percentiles(to_healthy)}
+            for g, r, image, n, running, healthy, failed, create, to_running, to_healthy in db.execute(query)]
@@ -0,0 +1,213 @@
+"""
+Logging - records are queued on the calling thread and formatted / written by a listener thread
+
+LOG_FORMAT=json   one JSON object per line with the request id (default)
+LOG_FORMAT=text   the classic "time - logger - level - message" lines
+
+Below ERROR, each call site (logger + line) may log LOG_BURST lines per LOG_SAMPLE_WINDOW
+seconds; past that only 1 in LOG_SAMPLE_EVERY is kept, so a hot warning can't flood the output.
+
+Per-request access lines are replaced by AccessLogMiddleware: a summary per route every
+ACCESS_LOG_INTERVAL seconds, plus a line for each 5xx or request slower than ACCESS_LOG_SLOW_MS.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_BURST = int(os.getenv("LOG_BURST", "20"))
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "60"))
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+ACCESS_LOG_INTERVAL = float(os.getenv("ACCESS_LOG_INTERVAL", "60"))
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id", "color_message"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update((k, v) for k, v in vars(record).items() if k not in _RESERVED)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Per call site: LOG_BURST records per window, then 1 in LOG_SAMPLE_EVERY (ERROR and up always pass)"""
+
+    def __init__(self):
+        super().__init__()
+        self._sites: dict[tuple[str, int], list] = {}  # (logger, line) -> [window start, count]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or record.name == "access.summary":
+            return True
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.setdefault((record.name, record.lineno), [now, 0])
+            if now - site[0] > LOG_SAMPLE_WINDOW:
+                site[0], site[1] = now, 0
+            site[1] += 1
+            count = site[1]
+        if count <= LOG_BURST:
+            return True
+        if (count - LOG_BURST) % LOG_SAMPLE_EVERY:
+            return False
+        record.sampled = f"1/{LOG_SAMPLE_EVERY} after {LOG_BURST} in {LOG_SAMPLE_WINDOW:.0f}s"
+        return True
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Captures the request id (a contextvar, only readable here) and leaves formatting to the listener"""
+
+    def prepare(self, record):
+        record.request_id = request_id.get()
+        record.msg = record.getMessage()  # args may be mutated after the call returns
+        record.args = None
+        return record
+
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def setup():
+    """Route all logging (uvicorn's included) through one queue; safe to call more than once"""
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    handler = ContextQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    # uvicorn installs its own synchronous stderr handlers; send its records through the queue too
+    for name in ("uvicorn", "uvicorn.error"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+    logging.getLogger("uvicorn.access").disabled = True  # summarized by AccessLogMiddleware
+
+    _listener = logging.handlers.QueueListener(log_queue, stream)
+    _listener.start()
+    atexit.register(stop)
+
+
+def stop():
+    """Flush queued records (shutdown)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+access_logger = logging.getLogger("access")
+summary_logger = logging.getLogger("access.summary")
+
+
+class AccessLogMiddleware:
+    """ASGI middleware: request ids (X-Request-ID in and out), access summaries, slow and 5xx lines"""
+
+    def __init__(self, app):
+        self.app = app
+        self.stats: dict[tuple[str, str], list] = {}  # (method, route) -> [count, 4xx, 5xx, total ms, max ms]
+        self.since = time.monotonic()
+        self.flusher: asyncio.Task | None = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.app(scope, self.lifespan_receive(receive), send)
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        rid = next((v.decode() for k, v in scope["headers"] if k == b"x-request-id"), None) or uuid.uuid4().hex[:16]
+        token = request_id.set(rid)
+        status = 500
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(k == b"content-type" and v.startswith(b"text/event-stream")
+                                for k, v in message.get("headers", []))  # long-lived by design, never "slow"
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", rid.encode())]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            self.record(scope, status, ms, streaming)
+            request_id.reset(token)
+
+    def lifespan_receive(self, receive):
+        """Summaries are flushed on a timer (idle windows included) and once more at shutdown"""
+        async def wrapped():
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.flusher = asyncio.create_task(self.flush_periodically())
+            elif message["type"] == "lifespan.shutdown":
+                if self.flusher is not None:
+                    self.flusher.cancel()
+                    self.flusher = None
+                self.flush()
+            return message
+        return wrapped
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(ACCESS_LOG_INTERVAL)
+            self.flush()
+
+    def record(self, scope, status: int, ms: float, streaming: bool = False):
+        route = scope.get("route_template") or scope["path"]
+        if status >= 500 or (ms >= ACCESS_LOG_SLOW_MS and not streaming):
+            access_logger.warning(f"{scope['method']} {scope['path']} {status} {ms:.0f}ms",
+                                  extra={"route": route, "status": status, "duration_ms": round(ms, 1)})
+        stats = self.stats.setdefault((scope["method"], route), [0, 0, 0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += 400 <= status < 500
+        stats[2] += status >= 500
+        stats[3] += ms
+        stats[4] = max(stats[4], ms)
+
+    def flush(self):
+        now = time.monotonic()
+        window = now - self.since
+        stats, self.stats, self.since = self.stats, {}, now
+        for (method, route), (count, client_errors, server_errors, total, slowest) in sorted(stats.items()):
+            summary_logger.info(f"{method} {route}: {count} requests in {window:.0f}s", extra={
+                "route": route, "method": method, "requests": count, "4xx": client_errors, "5xx": server_errors,
+                "avg_ms": round(total / count, 1), "max_ms": round(slowest, 1),
+            })
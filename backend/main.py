@@ -1,21 +1,38 @@
+import asyncio
 import logging
+import math
 import os
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from database import Base, engine
-from env_config import validate_env
-from routes import auth_router, balance_router, jobs_router
-
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
 
-class HealthCheckFilter(logging.Filter):
-    def filter(self, record):
-        return "/health" not in record.getMessage()
+_import_start = time.perf_counter()
+
+from fastapi import Depends, FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+import job_events
+import lifecycle
+import logs
+import notify
+import partitions
+import pricing
+import railgun
+import startup
+import warm_pool
+from breaker import CircuitOpen
+from deadline import DeadlineExceeded
+from ratelimit import RateLimited
+from database import Base, engine
+from dependencies import require_metrics_access
+from env_config import MIGRATIONS_MANAGED, validate_env
+from logs import AccessLogMiddleware
+from metrics import MetricsMiddleware, mark_process_dead, render
+from profiling import ProfileMiddleware
+from routes import admin_router, auth_router, balance_router, jobs_router
 
+startup.TIMINGS["imports"] = round(time.perf_counter() - _import_start, 4)
 
-logging.getLogger("uvicorn.access").addFilter(HealthCheckFilter())
+logs.setup()
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -27,10 +44,25 @@ async def lifespan(app: FastAPI):
     except RuntimeError as e:
         logger.error(f"Environment validation failed: {e}")
         raise
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables ready")
+    if MIGRATIONS_MANAGED:
+        logger.info("Schema managed by Alembic, skipping create_all")
+    else:
+        Base.metadata.create_all(bind=engine)
+        logger.info("Database tables ready")
+    await startup.warm_up()  # uvicorn starts serving (and /health goes green) only after this
+    maintenance = [asyncio.create_task(partitions.maintain())]
+    if warm_pool.POOLS:
+        maintenance.append(asyncio.create_task(warm_pool.maintain()))
     yield
     logger.info("Shutting down...")
+    for task in maintenance:
+        task.cancel()
+    await job_events.watcher.close()
+    await notify.flush()
+    await railgun.close()
+    await pricing.close()
+    await lifecycle.close()
+    mark_process_dead()
 
 
 PREFIX = os.getenv("PREFIX", "")
@@ -45,9 +77,32 @@ app = FastAPI(
     openapi_url=f"{PREFIX}/openapi.json" if PREFIX else "/openapi.json",
 )
 
+@app.exception_handler(CircuitOpen)
+async def circuit_open_handler(request: Request, exc: CircuitOpen):
+    """Upstream breaker open and no cached fallback - fail fast instead of queueing on timeouts"""
+    return JSONResponse(status_code=503, content={"detail": f"{exc.upstream} temporarily unavailable"},
+                        headers={"Retry-After": str(math.ceil(exc.retry_after))})
+
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(status_code=429, content={"detail": str(exc)},
+                        headers={"Retry-After": str(math.ceil(exc.retry_after))})
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": "Upstream services too slow, try again"})
+
+
+app.add_middleware(ProfileMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(AccessLogMiddleware)
+
 app.include_router(auth_router, prefix=PREFIX)
 app.include_router(balance_router, prefix=PREFIX)
 app.include_router(jobs_router, prefix=PREFIX)
+app.include_router(admin_router, prefix=PREFIX)
 
 
 @app.get(f"{PREFIX}/health" if PREFIX else "/health")
@@ -55,10 +110,17 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get(f"{PREFIX}/metrics" if PREFIX else "/metrics", include_in_schema=False,
+         dependencies=[Depends(require_metrics_access)])
+async def metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get(f"{PREFIX}/address" if PREFIX else "/address")
 async def get_deposit_address():
     """Get the Railgun address for deposits (unauthenticated)"""
-    import railgun
     return await railgun.get_address()
 
 
@@ -0,0 +1,161 @@
+"""
+Prometheus metrics - HTTP routes, DB pool, upstream calls and caches
+
+Cache hit ratio: rate(tamashii_cache_requests_total{result="hit"}) / rate(tamashii_cache_requests_total)
+
+With several uvicorn workers, entrypoint.sh sets PROMETHEUS_MULTIPROC_DIR and /metrics
+aggregates every worker (gauges are summed over live workers).
+"""
+import os
+import time
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client import multiprocess
+from starlette.routing import Match
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# HTTP
+REQUESTS = Counter("tamashii_http_requests_total", "HTTP requests", ["method", "route", "status"])
+REQUEST_LATENCY = Histogram("tamashii_http_request_duration_seconds", "HTTP request latency", ["method", "route"])
+IN_FLIGHT = Gauge("tamashii_http_requests_in_flight", "HTTP requests being served", ["method", "route"],
+                  multiprocess_mode="livesum")
+
+# DB pool
+DB_POOL_CHECKOUT = Histogram("tamashii_db_pool_checkout_seconds", "Time waiting for a pooled DB connection",
+                             buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30))
+DB_POOL_CONNECTIONS = Gauge("tamashii_db_pool_connections", "DB pool connections", ["state"],
+                            multiprocess_mode="livesum")
+
+# Upstreams (c3, railgun, coingecko, notify)
+UPSTREAM_LATENCY = Histogram("tamashii_upstream_duration_seconds", "Upstream call latency", ["upstream", "op", "outcome"])
+UPSTREAM_ERRORS = Counter("tamashii_upstream_errors_total", "Upstream call errors", ["upstream", "op", "error"])
+UPSTREAM_HEDGES = Counter("tamashii_upstream_hedges_total", "Hedged requests (result: sent, won)", ["upstream", "result"])
+
+# Circuit breakers (state: 0 closed, 1 half-open, 2 open)
+BREAKER_STATE = Gauge("tamashii_breaker_state", "Circuit breaker state", ["upstream"], multiprocess_mode="max")
+BREAKER_TRANSITIONS = Counter("tamashii_breaker_transitions_total", "Circuit breaker state changes", ["upstream", "state"])
+BREAKER_REJECTED = Counter("tamashii_breaker_rejected_total", "Calls failed fast by an open breaker", ["upstream"])
+
+# Rate limits (scope: address, or the upstream whose quota ran out)
+RATE_LIMITED = Counter("tamashii_rate_limited_total", "Requests rejected by rate limits", ["scope"])
+
+# Job event streams (SSE connections open on /jobs/events)
+JOB_EVENT_SUBSCRIBERS = Gauge("tamashii_job_event_streams", "Open job event streams", multiprocess_mode="livesum")
+
+# Job launches (stage: running = running with a hostname, healthy = service answering HTTP)
+JOB_LAUNCH_SECONDS = Histogram("tamashii_job_launch_seconds", "Time from C3 create to each lifecycle stage",
+                               ["gpu_type", "region", "stage"],
+                               buckets=(5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600, 900, 1800))
+
+# Warm pool (claims: hit, miss, failed handoff; instances: launched, ready, claimed, cancelled, lost)
+WARM_POOL_CLAIMS = Counter("tamashii_warm_pool_claims_total", "Job launches served from the warm pool", ["gpu_type", "result"])
+WARM_POOL_INSTANCES = Counter("tamashii_warm_pool_instances_total", "Warm pool instance lifecycle events", ["event"])
+
+# Notification dispatcher (outcome: coalesced into digests, queued, sent, retried, failed, dropped)
+NOTIFY_EVENTS = Counter("tamashii_notify_events_total", "Notification events by outcome", ["outcome"])
+
+# Caches (result: hit, miss, stale = expired value served because the refresh failed)
+CACHE_REQUESTS = Counter("tamashii_cache_requests_total", "Cache lookups", ["cache", "result"])
+
+
+class track_upstream:
+    """Time an upstream call and count its errors (exceptions propagate); usable with `with` or `async with`"""
+
+    def __init__(self, upstream: str, op: str):
+        self.upstream = upstream
+        self.op = op
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        outcome = "ok"
+        if exc_type is not None and issubclass(exc_type, Exception):
+            outcome = "error"
+            UPSTREAM_ERRORS.labels(self.upstream, self.op, exc_type.__name__).inc()
+        UPSTREAM_LATENCY.labels(self.upstream, self.op, outcome).observe(time.perf_counter() - self.start)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+_pools = []
+
+
+def instrument_pool(engine):
+    """Expose SQLAlchemy QueuePool usage as gauges (refreshed at scrape time, and per request when multiprocess)"""
+    _pools.append(engine.pool)
+
+
+def refresh_pool_gauges():
+    for pool in _pools:
+        DB_POOL_CONNECTIONS.labels("size").set(pool.size())
+        DB_POOL_CONNECTIONS.labels("checked_out").set(pool.checkedout())
+        DB_POOL_CONNECTIONS.labels("idle").set(pool.checkedin())
+        DB_POOL_CONNECTIONS.labels("overflow").set(max(pool.overflow(), 0))
+
+
+def render() -> tuple[bytes, str]:
+    refresh_pool_gauges()
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drop this worker's live gauges from the multiprocess aggregate (call on shutdown)"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def _route_path(scope) -> str:
+    """Route template (e.g. /api/jobs/{job_id}) so labels stay low-cardinality"""
+    for route in scope["app"].router.routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(child_scope.get("route", route), "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route counts, latency and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        route = scope["route_template"] = _route_path(scope)  # also read by the access log
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            REQUESTS.labels(method, route, str(status)).inc()
+            if MULTIPROCESS:
+                refresh_pool_gauges()  # scrapes only reach one worker, keep the others' values current
@@ -0,0 +1,45 @@
+"""
+Database migrations - version check, stamp and upgrade in a single process
+
+    python migrate.py
+"""
+import os
+import sys
+import time
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from database import engine
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def alembic_config() -> Config:
+    config = Config(os.path.join(HERE, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(HERE, "alembic"))
+    return config
+
+
+def migrate():
+    """Upgrade to head; schemas created before Alembic (by create_all) are stamped at base first"""
+    config = alembic_config()
+    with engine.connect() as conn:
+        tables = set(inspect(conn).get_table_names())
+    if "alembic_version" not in tables and "jobs" in tables:
+        base = ScriptDirectory.from_config(config).get_base()
+        print(f"No alembic_version table found, stamping base revision {base}")
+        command.stamp(config, base)
+    command.upgrade(config, "head")
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    try:
+        migrate()
+    except Exception as e:
+        print(f"Migrations failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        engine.dispose()
+    print(f"Migrations complete in {time.perf_counter() - start:.2f}s")
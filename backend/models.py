@@ -1,27 +1,122 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Float, Integer, Boolean
+from sqlalchemy import BigInteger, Boolean, Column, Date, DateTime, Float, Index, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
 from pydantic import BaseModel
 from database import Base
 
 
 class Job(Base):
-    """GPU job billing record"""
+    """GPU job billing record - range partitioned by created_at month (see partitions.py)"""
     __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_user_address_created_at", "user_address", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_address = Column(String, nullable=False, index=True)  # railgun address
+    user_address = Column(String, nullable=False)  # railgun address
     c3_job_id = Column(String, nullable=False)
     gpu_type = Column(String, nullable=False)
+    region = Column(String, nullable=True)  # where C3 placed the job (NULL for jobs before region tracking)
     image = Column(String, nullable=False)
     duration_seconds = Column(Integer, nullable=False)
     cost_usd = Column(Float, nullable=False)
     cost_bnb = Column(Float, nullable=False)
     bnb_price_usd = Column(Float, nullable=False)  # price at launch time
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)  # partition key, so part of the PK
     billed = Column(Boolean, nullable=False, default=True)  # False when BILLING_ENABLED=false
 
 
+class BillingDaily(Base):
+    """Rollup of jobs per day x gpu_type x billed (maintained by rollups.record_job)"""
+    __tablename__ = "billing_daily"
+
+    day = Column(Date, primary_key=True)
+    gpu_type = Column(String, primary_key=True)
+    billed = Column(Boolean, primary_key=True)
+    jobs = Column(Integer, nullable=False, default=0)
+    gpu_seconds = Column(BigInteger, nullable=False, default=0)
+    cost_usd = Column(Float, nullable=False, default=0)
+    cost_bnb = Column(Float, nullable=False, default=0)
+
+
+class BillingUserDaily(Base):
+    """Rollup of jobs per day x user x billed (top spenders, per-user spend and job months)"""
+    __tablename__ = "billing_user_daily"
+    __table_args__ = (Index("ix_billing_user_daily_user_address_day", "user_address", "day"),)
+
+    day = Column(Date, primary_key=True)
+    user_address = Column(String, primary_key=True)
+    billed = Column(Boolean, primary_key=True)
+    jobs = Column(Integer, nullable=False, default=0)
+    gpu_seconds = Column(BigInteger, nullable=False, default=0)
+    cost_usd = Column(Float, nullable=False, default=0)
+    cost_bnb = Column(Float, nullable=False, default=0)
+
+
+class ArchivedMonth(Base):
+    """Months whose partition has been archived - each month is archived once"""
+    __tablename__ = "archived_months"
+
+    month = Column(Date, primary_key=True)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class CacheEntry(Base):
+    """Shared cache entry (CACHE_BACKEND=postgres) - UNLOGGED, contents are disposable"""
+    __tablename__ = "cache_entries"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String, primary_key=True)
+    value = Column(JSONB, nullable=True)  # NULL while the first refresh holds the lease
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    lease_until = Column(DateTime(timezone=True), nullable=True)
+
+
+class RateLimitBucket(Base):
+    """Token bucket (RATE_LIMIT_BACKEND=postgres) - UNLOGGED, losing it just refills every bucket"""
+    __tablename__ = "rate_limits"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String, primary_key=True)  # address:<addr> or upstream:<name>
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class WarmInstance(Base):
+    """Pre-launched C3 instance of a warm pool, claimed by create_job (see warm_pool.py)"""
+    __tablename__ = "warm_instances"
+
+    c3_job_id = Column(String, primary_key=True)
+    pool = Column(String, nullable=False)  # gpu_type/image/region key of the configured pool
+    region = Column(String, nullable=True)
+    state = Column(String, nullable=False, default="warming")  # warming, ready, claimed
+    price_per_hour = Column(Float, nullable=False)  # USD, what it costs while idle
+    launched_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    ready_at = Column(DateTime, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    job_id = Column(String, nullable=True)  # jobs.id it was handed to
+
+
+class JobLifecycle(Base):
+    """When each launch reached each stage (see lifecycle.py) - NULL stages were not (yet) observed"""
+    __tablename__ = "job_lifecycle"
+
+    job_id = Column(String, primary_key=True)  # jobs.id
+    c3_job_id = Column(String, nullable=False)
+    gpu_type = Column(String, nullable=False)
+    region = Column(String, nullable=True)
+    image = Column(String, nullable=False)
+    warm = Column(Boolean, nullable=False, default=False)  # handed over from the warm pool
+    requested_at = Column(DateTime, nullable=False)  # POST /jobs received
+    launched_at = Column(DateTime, nullable=False, index=True)  # c3.jobs.create returned
+    running_at = Column(DateTime, nullable=True)  # running with a hostname
+    healthy_at = Column(DateTime, nullable=True)  # load-balancer port answering HTTP
+    terminated_at = Column(DateTime, nullable=True)
+    final_state = Column(String, nullable=True)
+
+
 # Pydantic schemas
 
 class JobCreate(BaseModel):
@@ -52,3 +147,4 @@ class BalanceResponse(BaseModel):
     balance_bnb: float
     balance_usd: float
     bnb_price_usd: float
+
@@ -15,14 +15,37 @@ Usage:
 
     # In Lambda/sync
     notify_sync(Category.EC2, Severity.INFO, "Instance started", instance_id="i-123")
+
+    # On shutdown (async apps) - deliver whatever is still queued
+    await flush()
+
+Async events go through a dispatcher: a bounded queue (oldest events are dropped
+when full) drained by one worker over a persistent connection, in batches, with
+retry and backoff. A batch is one POST to NOTIFY_BATCH_URL when set, otherwise its
+events are POSTed to NOTIFY_URL concurrently.
+
+Digest mode (opt-in, NOTIFY_DIGEST, e.g. "jobs=30,billing=60") folds a category's events
+into one message per window: "42 × Job launched in 30s, total cost_bnb 1.3,
+by gpu_type: l4 30, h100 12". ERROR events are always sent immediately.
 """
 
 import logging
 import os
+from collections import Counter, deque
+from contextlib import nullcontext
 from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+try:
+    # Upstream latency/error metrics when running inside the backend
+    from metrics import NOTIFY_EVENTS, track_upstream
+except ImportError:
+    NOTIFY_EVENTS = None
+
+    def track_upstream(upstream: str, op: str):
+        return nullcontext()
+
 
 class Category(Enum):
     """Event categories - route to different Telegram channels"""
@@ -46,13 +69,227 @@ class Severity(Enum):
 NOTIFY_URL = os.getenv("NOTIFY_URL")  # e.g. https://notify.compute3.ai/notify
 NOTIFY_API_KEY = os.getenv("NOTIFY_API_KEY")
 NOTIFY_TIMEOUT = float(os.getenv("NOTIFY_TIMEOUT", "2.0"))
+NOTIFY_BATCH_URL = os.getenv("NOTIFY_BATCH_URL")  # accepts {"events": [...]}; unset = one POST per event
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "1000"))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "20"))
+NOTIFY_LINGER = float(os.getenv("NOTIFY_LINGER", "0.5"))  # seconds to let a batch fill up
+NOTIFY_RETRIES = int(os.getenv("NOTIFY_RETRIES", "3"))
+NOTIFY_BACKOFF = float(os.getenv("NOTIFY_BACKOFF", "0.5"))  # first retry delay, doubles each attempt
+NOTIFY_DIGEST = os.getenv("NOTIFY_DIGEST", "")  # category=window seconds, comma separated, e.g. "jobs=30"
+NOTIFY_DIGEST_SUM = os.getenv("NOTIFY_DIGEST_SUM", "cost_bnb,cost_usd")  # numeric meta fields totalled in digests
+NOTIFY_DIGEST_GROUP_BY = os.getenv("NOTIFY_DIGEST_GROUP_BY", "gpu_type")  # meta fields counted per value
+
+
+def parse_windows(spec: str) -> dict[str, float]:
+    """"jobs=30,billing=60" -> {"jobs": 30.0, "billing": 60.0}"""
+    windows = {}
+    for item in filter(None, (p.strip() for p in spec.split(","))):
+        category, _, seconds = item.partition("=")
+        windows[category.strip()] = float(seconds)
+    return windows
+
+
+DIGEST_WINDOWS = parse_windows(NOTIFY_DIGEST)
+
+
+def build_payload(category: Category, severity: Severity, message: str, meta: dict) -> dict:
+    """JSON body accepted by the notify service"""
+    return {
+        "category": category.value,
+        "severity": severity.value,
+        "message": message,
+        "meta": meta
+    }
+
+
+class Digest:
+    """Running aggregate of one category's events within a window (constant size, whatever the volume)"""
+
+    def __init__(self, category: str, window: float):
+        self.category = category
+        self.window = window
+        self.count = 0
+        self.first = None
+        self.warning = False
+        self.kinds = Counter()
+        self.totals = {field: 0.0 for field in filter(None, NOTIFY_DIGEST_SUM.split(","))}
+        self.groups = {field: Counter() for field in filter(None, NOTIFY_DIGEST_GROUP_BY.split(","))}
+
+    def add(self, payload: dict):
+        meta = payload["meta"]
+        self.count += 1
+        self.first = self.first or payload
+        self.warning = self.warning or payload["severity"] == Severity.WARNING.value
+        self.kinds[payload["message"].split(":")[0]] += 1
+        for field in self.totals:
+            if isinstance(meta.get(field), (int, float)):
+                self.totals[field] += meta[field]
+        for field, counts in self.groups.items():
+            if field in meta:
+                counts[str(meta[field])] += 1
+
+    def payload(self) -> dict:
+        """The single event itself, or a digest of all of them"""
+        if self.count == 1:
+            return self.first
+        parts = [", ".join(f"{n} × {kind}" for kind, n in self.kinds.most_common()) + f" in {self.window:g}s"]
+        totals = {field: total for field, total in self.totals.items() if total}
+        parts += [f"total {field} {total:.6g}" for field, total in totals.items()]
+        parts += [f"by {field}: " + ", ".join(f"{value} {n}" for value, n in counts.most_common())
+                  for field, counts in self.groups.items() if counts]
+        severity = Severity.WARNING if self.warning else Severity.INFO
+        meta = {"digest": True, "count": self.count, "window_seconds": self.window, "totals": totals,
+                **{f"by_{field}": dict(counts) for field, counts in self.groups.items() if counts}}
+        return build_payload(Category(self.category), severity, ", ".join(parts), meta)
+
+
+class Dispatcher:
+    """Bounded queue of payloads drained by a single worker task over one pooled connection"""
+
+    def __init__(self, maxsize: int = NOTIFY_QUEUE_SIZE, batch_size: int = NOTIFY_BATCH_SIZE):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.stats = {"coalesced": 0, "queued": 0, "sent": 0, "retried": 0, "failed": 0, "dropped": 0}
+        self._queue = deque()
+        self._loop = None
+        self._task = None
+        self._client = None
+        self._wakeup = None
+        self._idle = None
+        self._closing = False
+        self._digests: dict[str, Digest] = {}
+        self._timers = {}
+
+    def _count(self, outcome: str, n: int = 1):
+        self.stats[outcome] += n
+        if NOTIFY_EVENTS is not None:
+            NOTIFY_EVENTS.labels(outcome).inc(n)
+
+    def submit(self, payload: dict):
+        """Queue a payload (call from the event loop), or fold it into its category's digest"""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (e.g. tests) - state from the old loop can't be reused
+            self._loop, self._task, self._client, self._closing = loop, None, None, False
+            self._wakeup, self._idle = asyncio.Event(), asyncio.Event()
+            self._idle.set()
+            self._digests, self._timers = {}, {}
+        category = payload["category"]
+        window = DIGEST_WINDOWS.get(category)
+        if not window or payload["severity"] == Severity.ERROR.value or self._closing:
+            self._enqueue(payload)
+            return
+        if category not in self._digests:
+            self._digests[category] = Digest(category, window)
+            self._timers[category] = loop.call_later(window, self._close_digest, category)
+        self._digests[category].add(payload)
+
+    def _close_digest(self, category: str):
+        self._timers.pop(category).cancel()
+        digest = self._digests.pop(category)
+        if digest.count > 1:
+            self._count("coalesced", digest.count)
+        self._enqueue(digest.payload())
+
+    def _enqueue(self, payload: dict):
+        """Drops the oldest queued payload when full"""
+        if len(self._queue) >= self.maxsize:
+            self._queue.popleft()
+            self._count("dropped")
+        self._queue.append(payload)
+        self._count("queued")
+        self._idle.clear()
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+
+    async def _run(self):
+        import asyncio
+
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if NOTIFY_LINGER and not self._closing and len(self._queue) < self.batch_size:
+                await asyncio.sleep(NOTIFY_LINGER)
+            while self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                await self._send(batch)
+            self._idle.set()
+
+    async def _send(self, batch: list[dict]):
+        import asyncio
+
+        if NOTIFY_BATCH_URL and len(batch) > 1:
+            requests = [(NOTIFY_BATCH_URL, {"events": batch}, len(batch))]
+        else:
+            requests = [(NOTIFY_URL, payload, 1) for payload in batch]
+        # At most batch_size POSTs in flight, so a burst costs one round trip per batch
+        results = await asyncio.gather(*(self._post(url, body) for url, body, _ in requests))
+        for (_, _, count), ok in zip(requests, results):
+            self._count("sent" if ok else "failed", count)
+
+    async def _post(self, url: str, body: dict) -> bool:
+        """POST with retry; 5xx, 429 and network errors are retried with exponential backoff"""
+        import asyncio
+        import random
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=NOTIFY_TIMEOUT, headers={"X-BACKEND-API-KEY": NOTIFY_API_KEY})
+        for attempt in range(NOTIFY_RETRIES + 1):
+            try:
+                async with track_upstream("notify", "post"):
+                    response = await self._client.post(url, json=body)
+                if response.status_code < 400:
+                    return True
+                error = f"HTTP {response.status_code}"
+                if response.status_code < 500 and response.status_code != 429:
+                    break
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            if attempt == NOTIFY_RETRIES or self._closing:
+                break
+            self._count("retried")
+            await asyncio.sleep(NOTIFY_BACKOFF * 2 ** attempt * random.uniform(0.8, 1.2))
+        # Never let notifications break the app
+        logger.debug(f"Telegram notification failed: {error}")
+        return False
+
+    async def flush(self, timeout: float = 5.0):
+        """Close open digests and deliver queued events (no lingering, no further retries), then close the connection"""
+        import asyncio
+
+        if self._loop is not asyncio.get_running_loop():
+            return
+        self._closing = True
+        for category in list(self._digests):
+            self._close_digest(category)
+        if self._queue:
+            self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Notification flush timed out, {len(self._queue)} events dropped")
+            self._count("dropped", len(self._queue))
+            self._queue.clear()
+        if self._task is not None:
+            self._task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+        self._loop = self._task = self._client = None
+
+
+dispatcher = Dispatcher()
 
 
 async def notify(category: Category, severity: Severity, message: str, **meta):
     """
     Send notification to Telegram (async, non-blocking).
 
-    Use in async contexts (FastAPI handlers, async functions).
+    Use in async contexts (FastAPI handlers, async functions). The event is
+    queued for the dispatcher and delivered in the background.
     Requires: httpx
 
     Args:
@@ -66,32 +303,18 @@ async def notify(category: Category, severity: Severity, message: str, **meta):
                      f"Job {job_id} charged ${cost:.2f}",
                      job_id=job_id, cost=cost, runtime=120)
     """
-    # Lazy import - only loads in environments that use this function
-    import httpx
-
     if not NOTIFY_URL or not NOTIFY_API_KEY:
         return  # Silently skip if not configured
 
-    payload = {
-        "category": category.value,
-        "severity": severity.value,
-        "message": message,
-        "meta": meta
-    }
+    dispatcher.submit(build_payload(category, severity, message, meta))
 
-    # Single flat endpoint
-    url = NOTIFY_URL
 
-    try:
-        async with httpx.AsyncClient(timeout=NOTIFY_TIMEOUT) as client:
-            await client.post(
-                url,
-                json=payload,
-                headers={"X-BACKEND-API-KEY": NOTIFY_API_KEY}
-            )
-    except Exception as e:
-        # Never let notifications break the app
-        logger.debug(f"Telegram notification failed ({category.value}/{severity.value}): {e}")
+async def flush(timeout: float = 5.0):
+    """Deliver queued notifications before shutdown (call from the app lifespan)"""
+    await dispatcher.flush(timeout)
+
+
+_pool_manager = None  # urllib3 pool shared by notify_sync calls (thread-safe)
 
 
 def notify_sync(category: Category, severity: Severity, message: str, **meta):
@@ -119,28 +342,27 @@ def notify_sync(category: Category, severity: Severity, message: str, **meta):
     if not NOTIFY_URL or not NOTIFY_API_KEY:
         return  # Silently skip if not configured
 
-    payload = {
-        "category": category.value,
-        "severity": severity.value,
-        "message": message,
-        "meta": meta
-    }
+    payload = build_payload(category, severity, message, meta)
 
     # Single flat endpoint
     url = NOTIFY_URL
 
+    global _pool_manager
+
     try:
-        http = urllib3.PoolManager(timeout=urllib3.Timeout(total=NOTIFY_TIMEOUT))
-
-        response = http.request(
-            'POST',
-            url,
-            body=json.dumps(payload).encode('utf-8'),
-            headers={
-                'Content-Type': 'application/json',
-                'X-BACKEND-API-KEY': NOTIFY_API_KEY
-            }
-        )
+        if _pool_manager is None:
+            _pool_manager = urllib3.PoolManager(timeout=urllib3.Timeout(total=NOTIFY_TIMEOUT))
+
+        with track_upstream("notify", "post"):
+            response = _pool_manager.request(
+                'POST',
+                url,
+                body=json.dumps(payload).encode('utf-8'),
+                headers={
+                    'Content-Type': 'application/json',
+                    'X-BACKEND-API-KEY': NOTIFY_API_KEY
+                }
+            )
 
         if response.status != 200:
             logger.debug(f"Telegram notification failed ({category.value}/{severity.value}): HTTP {response.status}")
@@ -155,7 +377,7 @@ def notify_background(category: Category, severity: Severity, message: str, **me
     Send notification as background task.
 
     Works in both async and sync/thread contexts:
-    - Async contexts: Creates a background task without blocking
+    - Async contexts: Queues the event for the dispatcher without blocking
     - Sync/thread contexts: Falls back to sync notification
 
     Args:
@@ -170,7 +392,11 @@ def notify_background(category: Category, severity: Severity, message: str, **me
     import asyncio
 
     try:
-        asyncio.create_task(notify(category, severity, message, **meta))
+        asyncio.get_running_loop()
     except RuntimeError:
         # No event loop (e.g., in tests or threads) - use sync version
         notify_sync(category, severity, message, **meta)
+        return
+
+    if NOTIFY_URL and NOTIFY_API_KEY:
+        dispatcher.submit(build_payload(category, severity, message, meta))
@@ -0,0 +1,230 @@
+"""
+Jobs partitioning - monthly range partitions of jobs by created_at, archival and retention
+
+Partitions are named jobs_yYYYYmMM. ensure() keeps the current month and PARTITIONS_AHEAD
+months after it created (at startup and every PARTITION_CHECK_HOURS). archive() detaches
+partitions older than the retention window (once per month, recorded in archived_months), then
+the rows are exported to JOBS_ARCHIVE_DIR as gzipped CSV and dropped (or kept as cold tables named
+archived_jobs_yYYYYmMM). Spend and job counts of archived months stay in the billing rollups,
+which backfills never rebuild for months no longer in jobs.
+
+    python partitions.py ensure
+    python partitions.py archive --keep 12 [--cold-table]
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+from sqlalchemy import Date, cast, func, select, text
+from sqlalchemy.orm import Session
+from database import engine
+from models import BillingUserDaily, Job
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS_AHEAD = int(os.getenv("PARTITIONS_AHEAD", "3"))
+PARTITION_CHECK_HOURS = float(os.getenv("PARTITION_CHECK_HOURS", "6"))
+JOBS_RETENTION_MONTHS = int(os.getenv("JOBS_RETENTION_MONTHS", "0"))  # archive partitions older than this; 0 keeps all
+JOBS_ARCHIVE_DIR = os.getenv("JOBS_ARCHIVE_DIR", "archive")
+JOBS_HOT_DAYS = int(os.getenv("JOBS_HOT_DAYS", "31"))  # window /jobs/running and the job watcher look at
+
+LOCK_ID = 0x6A6F6273  # advisory lock serializing partition DDL across workers and pods
+ARCHIVE_LOCK_ID = 0x6A6F6261  # held for a whole archive run, export and drop included
+NAME = re.compile(r"^jobs_y(\d{4})m(\d{2})$")
+ARCHIVED_PREFIX = "archived_"
+
+
+def add_months(month: date, n: int) -> date:
+    years, index = divmod(month.month - 1 + n, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def current_month() -> date:
+    return datetime.utcnow().date().replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    return f"jobs_y{month.year}m{month.month:02d}"
+
+
+def partition_month(name: str) -> date | None:
+    m = NAME.match(name)
+    return date(int(m[1]), int(m[2]), 1) if m else None
+
+
+def hot_since() -> datetime:
+    return datetime.utcnow() - timedelta(days=JOBS_HOT_DAYS)
+
+
+def attached(conn) -> list[str]:
+    """Partition names currently attached to jobs"""
+    return list(conn.scalars(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('jobs') ORDER BY c.relname")))
+
+
+def is_partitioned(conn) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('jobs'))")).scalar()
+
+
+def oldest_month(conn) -> date | None:
+    """First month still held in jobs (earlier ones are archived)"""
+    months = [m for m in map(partition_month, attached(conn)) if m]
+    return min(months) if months else None
+
+
+def ensure(ahead: int = PARTITIONS_AHEAD) -> list[str]:
+    """Create missing partitions for the current month and `ahead` months after it"""
+    created = []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return created
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": LOCK_ID})
+        existing = set(attached(conn))
+        for i in range(ahead + 1):
+            month = add_months(current_month(), i)
+            name = partition_name(month)
+            if name not in existing:
+                conn.execute(text(f"CREATE TABLE {name} PARTITION OF jobs "
+                                  f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"))
+                created.append(name)
+    if created:
+        logger.info(f"Created jobs partitions: {', '.join(created)}")
+    return created
+
+
+def export(table: str) -> str:
+    """COPY a detached partition to JOBS_ARCHIVE_DIR/<table>.csv.gz (written atomically)"""
+    path = os.path.join(JOBS_ARCHIVE_DIR, f"{table}.csv.gz")
+    if os.path.exists(path):
+        return path
+    os.makedirs(JOBS_ARCHIVE_DIR, exist_ok=True)
+    conn = engine.raw_connection()
+    try:
+        with conn.driver_connection.cursor() as cur, gzip.open(path + ".tmp", "wb") as f:
+            with cur.copy(f"COPY {table} TO STDOUT WITH (FORMAT csv, HEADER)") as copy:
+                for chunk in copy:
+                    f.write(chunk)
+    finally:
+        conn.close()
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def archive(keep: int, cold_table: bool = False) -> list[str]:
+    """Detach partitions entirely older than `keep` months and archive them; returns archived table names"""
+    with engine.connect() as lock:
+        # One pod archives at a time; the others skip this round rather than export the same tables
+        if not lock.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": ARCHIVE_LOCK_ID}).scalar():
+            logger.info("Jobs archive already running elsewhere")
+            return []
+        try:
+            return _archive(keep, cold_table)
+        finally:
+            lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ARCHIVE_LOCK_ID})
+
+
+def _archive(keep: int, cold_table: bool) -> list[str]:
+    cutoff = add_months(current_month(), -keep)
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": LOCK_ID})
+        for name in attached(conn):
+            month = partition_month(name)
+            if month is None or add_months(month, 1) > cutoff:
+                continue
+            # A month is archived once: a second copy would find its export already written and be
+            # dropped without one
+            claimed = conn.execute(text(
+                "INSERT INTO archived_months (month, archived_at) VALUES (:month, now() AT TIME ZONE 'utc') "
+                "ON CONFLICT (month) DO NOTHING RETURNING month"), {"month": month}).scalar()
+            if claimed is None:
+                logger.error(f"Jobs partition {name} is attached but {month:%Y-%m} was already archived; skipping")
+                continue
+            conn.execute(text(f"ALTER TABLE jobs DETACH PARTITION {name}"))
+            conn.execute(text(f"ALTER TABLE {name} RENAME TO {ARCHIVED_PREFIX}{name}"))
+            logger.info(f"Detached jobs partition {name}")
+        tables = list(conn.scalars(text(
+            "SELECT tablename FROM pg_tables WHERE tablename LIKE :pattern ORDER BY tablename"),
+            {"pattern": f"{ARCHIVED_PREFIX}jobs_y%"}))
+
+    if cold_table:
+        return tables
+    # Also picks up tables detached by an earlier run that failed before dropping them
+    for table in tables:
+        path = export(table)
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE {table}"))
+        logger.info(f"Archived {table} to {path}")
+    return tables
+
+
+def _start(month: date) -> datetime:
+    return datetime.combine(month, datetime.min.time())
+
+
+def user_spent_bnb(db: Session, address: str) -> float:
+    """Billed BNB spent by an address: user rollup for closed months (archived ones included) plus
+    the current month's partition"""
+    month = current_month()
+    closed = select(func.coalesce(func.sum(BillingUserDaily.cost_bnb), 0)).where(
+        BillingUserDaily.user_address == address, BillingUserDaily.billed == True,
+        BillingUserDaily.day < month).scalar_subquery()
+    live = select(func.coalesce(func.sum(Job.cost_bnb), 0)).where(
+        Job.user_address == address, Job.billed == True, Job.created_at >= _start(month)).scalar_subquery()
+    return float(db.execute(select(closed + live)).scalar())
+
+
+def recent_since(db: Session, address: str, limit: int) -> datetime | None:
+    """Start of the oldest month needed to list an address's `limit` newest jobs, from the user rollup,
+    so the jobs query only touches those months' partitions (None: the address has no jobs)"""
+    t = BillingUserDaily
+    month = cast(func.date_trunc("month", t.day), Date)
+    counts = db.execute(select(month, func.sum(t.jobs)).where(t.user_address == address)
+                        .group_by(month).order_by(month.desc())).all()
+    total = 0
+    for start, jobs in counts:
+        total += jobs
+        if total >= limit:
+            return _start(start)
+    return _start(counts[-1][0]) if counts else None
+
+
+def find_job(db: Session, address: str, job_id: str) -> Job | None:
+    """An address's job by id. Ids are random UUIDs that don't give the month away, so the hot
+    window (where jobs asked about by id almost always are) is searched before older partitions"""
+    query = db.query(Job).filter(Job.id == job_id, Job.user_address == address)
+    since = hot_since()
+    return query.filter(Job.created_at >= since).first() or query.filter(Job.created_at < since).first()
+
+
+async def maintain():
+    """Background loop: keep future partitions created and apply JOBS_RETENTION_MONTHS"""
+    while True:
+        await asyncio.sleep(PARTITION_CHECK_HOURS * 3600)
+        try:
+            await asyncio.to_thread(ensure)
+            if JOBS_RETENTION_MONTHS > 0:
+                await asyncio.to_thread(archive, JOBS_RETENTION_MONTHS)
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Jobs partition maintenance")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    e = sub.add_parser("ensure", help="create partitions for the current and upcoming months")
+    e.add_argument("--ahead", type=int, default=PARTITIONS_AHEAD)
+    a = sub.add_parser("archive", help="detach and archive old partitions")
+    a.add_argument("--keep", type=int, default=JOBS_RETENTION_MONTHS or 12, help="months to keep attached")
+    a.add_argument("--cold-table", action="store_true", help="keep detached partitions as tables instead of files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.cmd == "ensure":
+        print(f"Created {len(ensure(args.ahead))} partitions")
+    else:
+        print(f"Archived {len(archive(args.keep, args.cold_table))} partitions")
@@ -1,45 +1,102 @@
 """
 Pricing - BNB price and C3 GPU costs
 """
+import asyncio
 import httpx
 import logging
-from time import time
-from c3 import C3
-from env_config import get_c3_api_key
+import os
+import cache
+import deadline
+from breaker import CircuitBreaker
+from deadline import DeadlineExceeded
+from c3_client import BREAKER as C3_BREAKER, get_c3
+from metrics import track_upstream
+from ratelimit import quota
 
 logger = logging.getLogger(__name__)
 
 BNB_BUFFER = 1.2  # 20% buffer for fluctuations
-_bnb_cache = {"price": None, "ts": 0}
+COINGECKO_URL = os.getenv("COINGECKO_URL", "https://api.coingecko.com/api/v3")
+BNB_PRICE_TTL = int(os.getenv("BNB_PRICE_TTL", "60"))
+GPU_PRICING_TTL = int(os.getenv("GPU_PRICING_TTL", "300"))
+PRICES_STALE_IF_ERROR = int(os.getenv("PRICES_STALE_IF_ERROR", "3600"))  # keep pricing on last known values during outages
+COINGECKO_SLOW_SECONDS = float(os.getenv("COINGECKO_SLOW_SECONDS", "2"))
+
+COINGECKO_BREAKER = CircuitBreaker("coingecko", COINGECKO_SLOW_SECONDS,
+                                   is_failure=lambda e: not isinstance(e, DeadlineExceeded))
+_client: httpx.AsyncClient | None = None
+
+
+def client() -> httpx.AsyncClient:
+    """Shared keep-alive client for CoinGecko"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(base_url=COINGECKO_URL)
+    return _client
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_bnb_price() -> float:
+    async with COINGECKO_BREAKER.call(), track_upstream("coingecko", "price"):
+        try:
+            r = await client().get("/simple/price", params={"ids": "binancecoin", "vs_currencies": "usd"},
+                                   timeout=deadline.timeout(5))
+        except httpx.TimeoutException as e:
+            if deadline.expired():
+                raise DeadlineExceeded("request deadline exceeded during CoinGecko call") from e
+            raise
+        r.raise_for_status()
+        return r.json()["binancecoin"]["usd"]
 
 
 async def get_bnb_price() -> float:
-    """Fetch BNB/USD from CoinGecko (cached 60s)"""
-    if _bnb_cache["price"] and (time() - _bnb_cache["ts"]) < 60:
-        return _bnb_cache["price"]
+    """BNB/USD from CoinGecko (cached BNB_PRICE_TTL seconds)"""
+    return await cache.cached("bnb_price", "bnb_price", BNB_PRICE_TTL, fetch_bnb_price,
+                              stale_if_error=PRICES_STALE_IF_ERROR)
+
+
+def fetch_gpu_prices() -> dict:
+    """Fetch the C3 catalog: single-GPU interruptible $/hour by gpu_type (blocking SDK call)"""
+    deadline.check()  # the SDK has no per-call timeout, only skip calls that can't finish in budget
+    with C3_BREAKER.call(), track_upstream("c3", "pricing"):
+        catalog = get_c3().instances.pricing(refresh=True)
+    prices = {}
+    for p in catalog.values():
+        if p.gpu_count == 1:
+            rate = next((t.interruptible for t in p.tiers if t.interruptible), None)
+            if rate:
+                prices[p.gpu_type] = rate
+    return prices
+
+
+async def load_gpu_prices() -> dict:
+    await quota("c3")
+    return await asyncio.to_thread(fetch_gpu_prices)
+
 
-    async with httpx.AsyncClient(timeout=5) as client:
-        r = await client.get("https://api.coingecko.com/api/v3/simple/price",
-                             params={"ids": "binancecoin", "vs_currencies": "usd"})
-        price = r.json()["binancecoin"]["usd"]
-        _bnb_cache.update({"price": price, "ts": time()})
-        return price
+async def get_gpu_prices() -> dict:
+    """C3 catalog (cached GPU_PRICING_TTL seconds)"""
+    return await cache.cached("gpu_pricing", "gpu_prices", GPU_PRICING_TTL, load_gpu_prices,
+                              stale_if_error=PRICES_STALE_IF_ERROR)
 
 
-def get_gpu_price(gpu_type: str) -> float:
+async def get_gpu_price(gpu_type: str) -> float:
     """Get GPU $/hour from C3"""
-    c3 = C3(api_key=get_c3_api_key())
-    for p in c3.instances.pricing().values():
-        if p.gpu_type == gpu_type and p.gpu_count == 1:
-            for t in p.tiers:
-                if t.interruptible:
-                    return t.interruptible
-    raise ValueError(f"Unknown GPU: {gpu_type}")
+    prices = await get_gpu_prices()
+    if gpu_type not in prices:
+        raise ValueError(f"Unknown GPU: {gpu_type}")
+    return prices[gpu_type]
 
 
 async def calc_cost(gpu_type: str, seconds: int) -> dict:
     """Calculate job cost in USD and BNB"""
-    usd_per_hour = get_gpu_price(gpu_type)
+    usd_per_hour = await get_gpu_price(gpu_type)
     cost_usd = usd_per_hour * (seconds / 3600)
     bnb_price = await get_bnb_price()
     cost_bnb = cost_usd / (bnb_price * BNB_BUFFER)
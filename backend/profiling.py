@@ -0,0 +1,190 @@
+"""
+On-demand profiling for live requests (admin only)
+
+- X-Profile header: sample a single request with pyinstrument
+- Process-wide profile: time-boxed sampling of the event loop thread
+- tracemalloc: allocation diff over a short window
+
+Nothing is imported or traced until an admin asks for it.
+"""
+import asyncio
+import logging
+import os
+import tracemalloc
+from datetime import datetime, timezone
+from dependencies import is_admin_key
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/tamashii-profiles")
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+
+_process = {"profiler": None, "timer": None, "started": None, "last": None}
+
+
+def _save(profiler, kind: str) -> str:
+    """Render and store a profile (blocking - run in a thread)"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{kind}-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S-%f')}.html"
+    with open(os.path.join(PROFILE_DIR, name), "w") as f:
+        f.write(profiler.output_html())
+    return name
+
+
+def list_profiles() -> list[str]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    names = [f for f in os.listdir(PROFILE_DIR) if f.endswith(".html")]
+    return sorted(names, key=lambda f: os.path.getmtime(os.path.join(PROFILE_DIR, f)), reverse=True)
+
+
+def profile_path(name: str) -> str | None:
+    path = os.path.join(PROFILE_DIR, os.path.basename(name))
+    return path if os.path.isfile(path) else None
+
+
+# Process-wide profile
+
+def process_profile_status() -> dict:
+    return {"running": _process["profiler"] is not None, "started": _process["started"], "last": _process["last"]}
+
+
+def start_process_profile(seconds: int) -> dict:
+    """Sample the event loop thread for up to `seconds` (stops itself)"""
+    from pyinstrument import Profiler
+
+    if _process["profiler"] is not None:
+        raise RuntimeError("Process profile already running")
+    seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+    profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="disabled")
+    profiler.start()
+    _process.update(profiler=profiler, started=datetime.now(timezone.utc).isoformat(),
+                    timer=asyncio.create_task(_stop_after(seconds)))
+    logger.info(f"Process profile started for {seconds}s")
+    return {"seconds": seconds, **process_profile_status()}
+
+
+async def _stop_after(seconds: float):
+    await asyncio.sleep(seconds)
+    await stop_process_profile()
+
+
+async def stop_process_profile() -> str | None:
+    """Stop the process-wide profile, returns the stored profile name"""
+    profiler, timer = _process["profiler"], _process["timer"]
+    if profiler is None:
+        return None
+    if timer is not asyncio.current_task():
+        timer.cancel()
+    profiler.stop()
+    _process.update(profiler=None, timer=None, started=None)
+    _process["last"] = await asyncio.to_thread(_save, profiler, "process")
+    logger.info(f"Process profile stored: {_process['last']}")
+    return _process["last"]
+
+
+# tracemalloc
+
+async def allocation_diff(seconds: float, limit: int = 25, frames: int = 1) -> dict:
+    """Trace allocations for `seconds` and return the top growth by source line"""
+    if tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc already running")
+    tracemalloc.start(frames)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "traceback" if frames > 1 else "lineno")
+    return {
+        "seconds": seconds,
+        "total_diff_bytes": sum(s.size_diff for s in stats),
+        "top": [{"trace": [f"{f.filename}:{f.lineno}" for f in s.traceback], "size_diff": s.size_diff,
+                 "size": s.size, "count_diff": s.count_diff, "count": s.count} for s in stats[:limit]],
+    }
+
+
+# Per-request profile
+
+class ProfileMiddleware:
+    """
+    Profile a single request when it carries `X-Profile` and a valid X-BACKEND-API-KEY.
+
+    X-Profile: store  - save the flamegraph, id returned in the X-Profile-Id header
+    X-Profile: inline - replace the response body with the flamegraph HTML
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        mode = key = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                mode = value.decode().lower() or "store"
+            elif name == b"x-backend-api-key":
+                key = value.decode()
+        if mode is None or not is_admin_key(key):
+            return await self.app(scope, receive, send)
+        if _process["profiler"] is not None:
+            return await self.app(scope, receive, _with_header(send, b"x-profile-status", b"busy"))
+
+        from pyinstrument import Profiler
+
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+        profiler.start()
+        if mode != "inline":
+            try:
+                await self.app(scope, receive, _DeferredHeaders(send, profiler))
+            finally:
+                if profiler.is_running:
+                    profiler.stop()
+            return
+
+        try:
+            await self.app(scope, receive, _discard)
+        finally:
+            profiler.stop()
+        body = (await asyncio.to_thread(profiler.output_html)).encode()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/html; charset=utf-8"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _with_header(send, name: bytes, value: bytes):
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message.get("headers", []), (name, value)]}
+        await send(message)
+    return wrapped
+
+
+async def _discard(message):
+    pass
+
+
+class _DeferredHeaders:
+    """Hold the response start until the handler returns so the profile id can be attached"""
+
+    def __init__(self, send, profiler):
+        self.send = send
+        self.profiler = profiler
+        self.start = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if self.start is not None:
+            self.profiler.stop()
+            name = await asyncio.to_thread(_save, self.profiler, "request")
+            start, self.start = self.start, None
+            await self.send({**start, "headers": [*start.get("headers", []), (b"x-profile-id", name.encode())]})
+        await self.send(message)
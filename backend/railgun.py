@@ -1,22 +1,169 @@
 """
 Railgun backend passthrough client
 """
+import asyncio
+import os
+import time
+from collections import deque
 import httpx
+import cache
+import deadline
+from breaker import CircuitBreaker
+from deadline import DeadlineExceeded
 from env_config import RAILGUN_URL
+from metrics import UPSTREAM_HEDGES, track_upstream
+from ratelimit import RateLimited, quota, try_quota
+
+DEPOSITS_CACHE_TTL = int(os.getenv("DEPOSITS_CACHE_TTL", "10"))
+DEPOSITS_STALE_IF_ERROR = int(os.getenv("DEPOSITS_STALE_IF_ERROR", "3600"))  # serve last known deposits while railgun is down
+RAILGUN_SLOW_SECONDS = float(os.getenv("RAILGUN_SLOW_SECONDS", "2"))
+RAILGUN_TIMEOUT = float(os.getenv("RAILGUN_TIMEOUT", "10"))  # per call, further capped by the request deadline
+
+# Hedging: GETs slower than the recent p95 get a second attempt, first answer wins
+RAILGUN_HEDGE = os.getenv("RAILGUN_HEDGE", "true").lower() == "true"
+RAILGUN_HEDGE_MAX_RATIO = float(os.getenv("RAILGUN_HEDGE_MAX_RATIO", "0.05"))  # hedges per GET, at most
+RAILGUN_HEDGE_MIN_DELAY = float(os.getenv("RAILGUN_HEDGE_MIN_DELAY", "0.05"))
+
+# The quota is taken before entering the breaker; RateLimited is excluded anyway, it says nothing about railgun
+BREAKER = CircuitBreaker("railgun", RAILGUN_SLOW_SECONDS, is_failure=lambda e: not (
+    isinstance(e, (DeadlineExceeded, RateLimited))
+    or (isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500)))
+
+_client: httpx.AsyncClient | None = None
+
+def client() -> httpx.AsyncClient:
+    """Shared keep-alive client for the railgun service"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(base_url=RAILGUN_URL, timeout=RAILGUN_TIMEOUT)
+    return _client
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+class Hedger:
+    """p95 of recent GET latencies, and a cap on how many GETs may be hedged"""
+
+    SAMPLES = 200
+    MIN_SAMPLES = 20
+    PERIOD = 60  # seconds the request/hedge counters cover
+
+    def __init__(self):
+        self.latencies = deque(maxlen=self.SAMPLES)
+        self._p95 = None
+        self.requests = 0
+        self.hedges = 0
+        self.period_start = time.monotonic()
+
+    def observe(self, seconds: float):
+        self.latencies.append(seconds)
+        if len(self.latencies) >= self.MIN_SAMPLES and len(self.latencies) % 10 == 0:
+            ordered = sorted(self.latencies)
+            self._p95 = ordered[int(len(ordered) * 0.95) - 1]
+
+    def delay(self) -> float | None:
+        """Hedge delay for a new GET, None if it may not be hedged"""
+        now = time.monotonic()
+        if now - self.period_start > self.PERIOD:
+            self.requests = self.hedges = 0
+            self.period_start = now
+        self.requests += 1
+        if not RAILGUN_HEDGE or self._p95 is None or self.hedges >= self.requests * RAILGUN_HEDGE_MAX_RATIO:
+            return None
+        return max(self._p95, RAILGUN_HEDGE_MIN_DELAY)
+
+
+hedger = Hedger()
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """One railgun call bounded by the request deadline (timeouts past it raise DeadlineExceeded)"""
+    try:
+        return await client().request(method, url, timeout=deadline.timeout(RAILGUN_TIMEOUT), **kwargs)
+    except httpx.TimeoutException as e:
+        if deadline.expired():
+            raise DeadlineExceeded("request deadline exceeded during railgun call") from e
+        raise
+
+def _attempt(url: str) -> asyncio.Task:
+    task = asyncio.ensure_future(request("GET", url))
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())  # losers' errors are expected
+    return task
+
+async def get(url: str) -> httpx.Response:
+    """Idempotent GET, hedged with a second attempt once it runs past the recent p95"""
+    start = time.perf_counter()
+    delay = hedger.delay()
+    first = _attempt(url)
+    pending = {first}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            # No quota to spare: keep waiting on the first attempt rather than queueing a hedge
+            if not done and await try_quota("railgun"):
+                hedger.hedges += 1
+                UPSTREAM_HEDGES.labels("railgun", "sent").inc()
+                pending.add(_attempt(url))
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+            if winner is None and pending:
+                continue  # one attempt failed, the other may still succeed
+            winner = winner or done.pop()
+            if winner is not first and winner.exception() is None:
+                UPSTREAM_HEDGES.labels("railgun", "won").inc()
+            hedger.observe(time.perf_counter() - start)
+            return winner.result()
+    finally:
+        # Also when the caller is cancelled (deadline, client gone) mid-wait
+        for task in pending:
+            task.cancel()
+
+def check(r: httpx.Response) -> httpx.Response:
+    """Raise on 5xx so failures reach the breaker (instead of reading as invalid / empty)"""
+    if r.status_code >= 500:
+        r.raise_for_status()
+    return r
 
 async def verify(message: str, signature: str, address: str) -> bool:
     """POST /verify passthrough"""
-    async with httpx.AsyncClient(timeout=10) as c:
-        r = await c.post(f"{RAILGUN_URL}/verify", json={"message": message, "signature": signature, "address": address})
-        return r.json().get("valid", False)
+    await quota("railgun")
+    async with BREAKER.call(), track_upstream("railgun", "verify"):
+        r = await request("POST", "/verify", json={"message": message, "signature": signature, "address": address})
+        return check(r).json().get("valid", False)
+
+def sum_deposits(txs: list) -> int:
+    """Total received amount (wei) across a transaction list"""
+    return sum(int(r["amount"]) for tx in txs for r in tx.get("received", []))
 
 async def get_transactions(sender: str = None) -> list:
     """GET /transactions passthrough"""
-    async with httpx.AsyncClient(timeout=10) as c:
-        url = f"{RAILGUN_URL}/transactions/{sender}" if sender else f"{RAILGUN_URL}/transactions"
-        return (await c.get(url)).json().get("transactions", [])
+    await quota("railgun")
+    async with BREAKER.call(), track_upstream("railgun", "transactions"):
+        url = f"/transactions/{sender}" if sender else "/transactions"
+        return check(await get(url)).json().get("transactions", [])
+
+async def fetch_deposits_wei(address: str) -> int:
+    """Deposit total from railgun; failed responses raise instead of counting as zero"""
+    await quota("railgun")
+    async with BREAKER.call(), track_upstream("railgun", "transactions"):
+        r = await get(f"/transactions/{address}")
+        r.raise_for_status()
+        return sum_deposits(r.json().get("transactions", []))
+
+async def get_deposits_wei(address: str) -> int:
+    """Total deposited by address in wei (cached DEPOSITS_CACHE_TTL seconds)"""
+    return await cache.cached("deposits", f"deposits:{address}", DEPOSITS_CACHE_TTL,
+                              lambda: fetch_deposits_wei(address), stale_if_error=DEPOSITS_STALE_IF_ERROR)
 
 async def get_address() -> dict:
     """GET /address passthrough"""
-    async with httpx.AsyncClient(timeout=10) as c:
-        return (await c.get(f"{RAILGUN_URL}/address")).json()
+    await quota("railgun")
+    async with BREAKER.call(), track_upstream("railgun", "address"):
+        return check(await get("/address")).json()
+
+async def ping():
+    """Open the pooled connection (TLS included) ahead of the first request"""
+    await client().get("/health")
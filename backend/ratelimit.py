@@ -0,0 +1,163 @@
+"""
+Token-bucket rate limits - per address (JWT) with per-route costs, plus global upstream quotas
+
+Each address gets RATE_LIMIT_BURST tokens, refilled at RATE_LIMIT_RATE per second; a route
+costs what it is likely to cost upstream (/jobs/running may make ~10 C3 calls, /balance none).
+Exhausted buckets answer 429 with Retry-After.
+
+Upstream quotas (C3_QUOTA, RAILGUN_QUOTA as "rate/burst") cap calls from the whole process,
+or from all workers and pods with RATE_LIMIT_BACKEND=postgres. A call that finds the quota
+empty waits up to QUOTA_MAX_WAIT (within the request deadline), then gets a 429.
+
+    @router.get("/running", dependencies=[Depends(rate_limit(5))])
+    await quota("c3")
+"""
+import asyncio
+import logging
+import os
+import time
+from sqlalchemy import text
+from fastapi import Depends
+import deadline
+from database import engine
+from dependencies import require_auth
+from metrics import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", os.getenv("CACHE_BACKEND", "memory"))  # memory | postgres
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "2"))  # tokens per second per address
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "30"))
+QUOTA_MAX_WAIT = float(os.getenv("QUOTA_MAX_WAIT", "1"))
+RATE_LIMIT_SWEEP_SECONDS = float(os.getenv("RATE_LIMIT_SWEEP_SECONDS", "300"))  # postgres: how often full buckets are deleted
+
+
+def parse_quota(value: str) -> tuple[float, float]:
+    """"20/40" -> (20 per second, burst 40)"""
+    rate, _, burst = value.partition("/")
+    return float(rate), float(burst or rate)
+
+
+QUOTAS = {
+    "c3": parse_quota(os.getenv("C3_QUOTA", "20/40")),
+    "railgun": parse_quota(os.getenv("RAILGUN_QUOTA", "50/100")),
+}
+# Any bucket left alone this long has refilled completely, so dropping it changes nothing
+FULL_AFTER = max(RATE_LIMIT_BURST / RATE_LIMIT_RATE, *(burst / rate for rate, burst in QUOTAS.values()))
+
+
+class RateLimited(Exception):
+    """Bucket empty - answered with 429 and Retry-After"""
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"{scope} rate limit exceeded")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class RateLimitBackend:
+    async def take(self, key: str, cost: float, rate: float, burst: float) -> float:
+        """Take cost tokens; 0 when granted, else seconds until enough have refilled"""
+        raise NotImplementedError
+
+
+class MemoryRateLimit(RateLimitBackend):
+    MAX_KEYS = 10_000  # full buckets are pruned past this
+
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float, float]] = {}  # key -> (tokens, updated, full at)
+
+    async def take(self, key, cost, rate, burst):
+        now = time.monotonic()
+        tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens < cost:
+            return (cost - tokens) / rate
+        if len(self._buckets) >= self.MAX_KEYS:
+            self._buckets = {k: b for k, b in self._buckets.items() if b[2] > now}
+        tokens -= cost
+        self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        return 0
+
+
+class PostgresRateLimit(RateLimitBackend):
+    """Buckets in the UNLOGGED rate_limits table, refilled and taken in one atomic statement"""
+
+    REFILLED = "least(:burst, rate_limits.tokens + EXTRACT(EPOCH FROM clock_timestamp() - rate_limits.updated_at) * :rate)"
+    TAKE = text("INSERT INTO rate_limits (key, tokens, updated_at) VALUES (:key, :burst - :cost, clock_timestamp()) "
+                f"ON CONFLICT (key) DO UPDATE SET tokens = {REFILLED} - :cost, updated_at = clock_timestamp() "
+                f"WHERE {REFILLED} >= :cost RETURNING key")
+    WAIT = text(f"SELECT (:cost - {REFILLED}) / :rate FROM rate_limits WHERE key = :key")
+    SWEEP = text("DELETE FROM rate_limits WHERE updated_at < clock_timestamp() - make_interval(secs => :full_after)")
+
+    def __init__(self):
+        self._swept = time.monotonic()
+
+    def _take(self, params: dict) -> float:
+        with engine.begin() as conn:
+            if conn.execute(self.TAKE, params).first():
+                return 0
+            return max(float(conn.execute(self.WAIT, params).scalar() or 0), 0.001)
+
+    def _sweep(self):
+        with engine.begin() as conn:
+            conn.execute(self.SWEEP, {"full_after": FULL_AFTER})
+
+    async def take(self, key, cost, rate, burst):
+        # One row per address would otherwise stay forever (the memory backend prunes full buckets too)
+        if time.monotonic() - self._swept >= RATE_LIMIT_SWEEP_SECONDS:
+            self._swept = time.monotonic()
+            try:
+                await asyncio.to_thread(self._sweep)
+            except Exception as e:
+                logger.warning(f"Failed to sweep full rate limit buckets: {e!r}")
+        return await asyncio.to_thread(self._take, {"key": key, "cost": cost, "rate": rate, "burst": burst})
+
+
+BACKENDS = {"memory": MemoryRateLimit, "postgres": PostgresRateLimit}
+_backend: RateLimitBackend | None = None
+
+
+def backend() -> RateLimitBackend:
+    global _backend
+    if _backend is None:
+        if RATE_LIMIT_BACKEND not in BACKENDS:
+            raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND: {RATE_LIMIT_BACKEND} (expected one of {', '.join(BACKENDS)})")
+        _backend = BACKENDS[RATE_LIMIT_BACKEND]()
+    return _backend
+
+
+def rate_limit(cost: float):
+    """Route dependency charging `cost` tokens to the caller's address"""
+    async def check_rate_limit(address: str = Depends(require_auth)):
+        if not RATE_LIMIT_ENABLED:
+            return
+        wait = await backend().take(f"address:{address}", cost, RATE_LIMIT_RATE, RATE_LIMIT_BURST)
+        if wait:
+            RATE_LIMITED.labels("address").inc()
+            raise RateLimited("address", wait)
+    return check_rate_limit
+
+
+async def quota(upstream: str, cost: float = 1):
+    """Take from an upstream's global quota, waiting up to QUOTA_MAX_WAIT for a refill"""
+    if not RATE_LIMIT_ENABLED:
+        return
+    rate, burst = QUOTAS[upstream]
+    left = deadline.remaining()
+    budget = QUOTA_MAX_WAIT if left is None else min(QUOTA_MAX_WAIT, left)
+    give_up = time.monotonic() + budget
+    while wait := await backend().take(f"upstream:{upstream}", cost, rate, burst):
+        if time.monotonic() + wait > give_up:
+            RATE_LIMITED.labels(upstream).inc()
+            raise RateLimited(upstream, wait)
+        await asyncio.sleep(wait)
+
+
+async def try_quota(upstream: str, cost: float = 1) -> bool:
+    """Take from an upstream's quota only if it has tokens now (for optional calls such as hedges)"""
+    if not RATE_LIMIT_ENABLED:
+        return True
+    rate, burst = QUOTAS[upstream]
+    return not await backend().take(f"upstream:{upstream}", cost, rate, burst)
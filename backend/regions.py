@@ -0,0 +1,130 @@
+"""
+Region selection - where create_job launches when the user doesn't pick a region
+
+Per (gpu_type, region) the selector keeps an EWMA of time-to-running and of launch success,
+fed by the job watcher as launches reach running, fail or time out. A launch goes to the
+candidate with the lowest expected wait (time-to-running / success rate); REGION_EXPLORE of
+launches try another candidate so the stats of unused regions don't go stale.
+
+The C3 SDK has no per-region capacity call; its catalog (instances.types) lists the regions
+each GPU configuration is currently offered in. Candidates come from the catalog cached
+REGIONS_TTL seconds, and before choosing, a fresh catalog read (bounded by
+REGION_PROBE_TIMEOUT, skipped when it doesn't answer in time) drops regions that have stopped
+offering the GPU since.
+
+Stats are per process: each worker learns from the launches it made.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+import cache
+from c3_client import BREAKER as C3_BREAKER, get_c3
+from metrics import track_upstream
+from ratelimit import quota
+
+logger = logging.getLogger(__name__)
+
+REGION_SELECTION = os.getenv("REGION_SELECTION", "true").lower() == "true"
+REGION_PROBE = os.getenv("REGION_PROBE", "true").lower() == "true"
+REGION_PROBE_TIMEOUT = float(os.getenv("REGION_PROBE_TIMEOUT", "1"))
+REGION_EXPLORE = float(os.getenv("REGION_EXPLORE", "0.1"))  # share of launches sent to a non-best region
+REGION_TTR_TIMEOUT = float(os.getenv("REGION_TTR_TIMEOUT", "900"))  # not running after this counts as a failure
+REGIONS_TTL = int(os.getenv("REGIONS_TTL", "300"))
+
+EWMA_WEIGHT = 0.2  # weight of the newest sample
+PRIOR_SECONDS = 60.0  # assumed time-to-running of a region with nothing better to go on
+
+
+@dataclass
+class RegionStats:
+    launches: int = 0
+    running: int = 0
+    failures: int = 0
+    ttr_seconds: float = PRIOR_SECONDS  # EWMA time-to-running
+    success_rate: float = 1.0  # EWMA of running (1) vs failed (0)
+
+    def observe(self, ok: bool, seconds: float | None = None):
+        if ok:
+            self.running += 1
+            # The first sample replaces the prior outright
+            self.ttr_seconds = seconds if self.running == 1 else \
+                EWMA_WEIGHT * seconds + (1 - EWMA_WEIGHT) * self.ttr_seconds
+        else:
+            self.failures += 1
+        self.success_rate = EWMA_WEIGHT * ok + (1 - EWMA_WEIGHT) * self.success_rate
+
+    @property
+    def samples(self) -> int:
+        return self.running + self.failures
+
+
+async def _catalog_regions(refresh: bool = False) -> dict[str, list[str]]:
+    await quota("c3")
+    async with C3_BREAKER.call(), track_upstream("c3", "types"):
+        types = await asyncio.to_thread(get_c3().instances.types, refresh)
+    return {gpu: t.available_regions(1) for gpu, t in types.items()}
+
+
+async def candidate_regions(gpu_type: str) -> list[str]:
+    """Regions offering single-GPU gpu_type (C3 catalog, cached REGIONS_TTL seconds)"""
+    return (await cache.cached("gpu_regions", "gpu_regions", REGIONS_TTL, _catalog_regions)).get(gpu_type, [])
+
+
+class RegionSelector:
+    def __init__(self):
+        self.stats: dict[tuple[str, str], RegionStats] = {}
+
+    def _stats(self, gpu_type: str, region: str) -> RegionStats:
+        return self.stats.setdefault((gpu_type, region), RegionStats())
+
+    async def probe(self, gpu_type: str) -> set[str] | None:
+        """Regions offering gpu_type right now (fresh catalog read), None when it didn't answer in time"""
+        if not REGION_PROBE:
+            return None
+        try:
+            regions = await asyncio.wait_for(_catalog_regions(refresh=True), REGION_PROBE_TIMEOUT)
+        except Exception as e:
+            logger.debug(f"Region probe for {gpu_type} failed: {e!r}")
+            return None
+        return set(regions.get(gpu_type, []))
+
+    def score(self, gpu_type: str, region: str) -> float:
+        """Expected seconds until running (lower is better)"""
+        stats = self.stats.get((gpu_type, region)) or RegionStats()
+        return stats.ttr_seconds / max(stats.success_rate, 0.05)
+
+    async def choose(self, gpu_type: str) -> str | None:
+        """Region to launch gpu_type in, None to let C3 decide (no candidates known)"""
+        regions = await candidate_regions(gpu_type)
+        if len(regions) < 2:
+            return regions[0] if regions else None
+        offered = await self.probe(gpu_type)
+        # Regions no longer offering the GPU are out, unless none of the candidates is left
+        usable = [r for r in regions if offered is None or r in offered] or regions
+        ranked = sorted(usable, key=lambda r: self.score(gpu_type, r))
+        if len(ranked) > 1 and random.random() < REGION_EXPLORE:
+            return random.choice(ranked[1:])
+        return ranked[0]
+
+    def launched(self, gpu_type: str, region: str) -> float:
+        """Count a launch; returns the start time to pass to observe_running"""
+        self._stats(gpu_type, region).launches += 1
+        return time.monotonic()
+
+    def observe_running(self, gpu_type: str, region: str, started: float):
+        self._stats(gpu_type, region).observe(True, time.monotonic() - started)
+
+    def observe_failure(self, gpu_type: str, region: str):
+        self._stats(gpu_type, region).observe(False)
+
+    def snapshot(self) -> list[dict]:
+        return [{"gpu_type": gpu, "region": region, "launches": s.launches, "running": s.running,
+                 "failures": s.failures, "ttr_seconds": round(s.ttr_seconds, 1),
+                 "success_rate": round(s.success_rate, 3), "score": round(self.score(gpu, region), 1)}
+                for (gpu, region), s in sorted(self.stats.items())]
+
+
+selector = RegionSelector()
@@ -0,0 +1,124 @@
+"""
+Billing rollups - per-day aggregates kept in step with the jobs table
+
+Jobs are added to billing_daily (day x gpu_type x billed) and billing_user_daily
+(day x user x billed) in the same transaction that inserts them, so reads never scan jobs.
+
+    python rollups.py backfill [--since 2025-12-01] [--until 2026-01-01]
+"""
+import argparse
+from datetime import date, datetime
+from sqlalchemy import Date, cast, delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from models import BillingDaily, BillingUserDaily, Job
+import partitions
+
+MEASURES = ("jobs", "gpu_seconds", "cost_usd", "cost_bnb")
+
+
+def _upsert(db: Session, table, keys: dict, values: dict):
+    stmt = insert(table).values(**keys, **values)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={m: getattr(table, m) + stmt.excluded[m] for m in MEASURES},
+    ))
+
+
+def record_job(db: Session, job: Job):
+    """Add a new job to the rollups (call before committing the job insert)"""
+    day = job.created_at.date()
+    values = {"jobs": 1, "gpu_seconds": job.duration_seconds, "cost_usd": job.cost_usd, "cost_bnb": job.cost_bnb}
+    _upsert(db, BillingDaily, {"day": day, "gpu_type": job.gpu_type, "billed": job.billed}, values)
+    _upsert(db, BillingUserDaily, {"day": day, "user_address": job.user_address, "billed": job.billed}, values)
+
+
+def backfill(db: Session, since: date | None = None, until: date | None = None) -> int:
+    """Rebuild rollup rows for [since, until) from jobs, returns the number of jobs aggregated"""
+    # Archived months are no longer in jobs: their rollup rows are kept rather than rebuilt empty
+    oldest = partitions.oldest_month(db.connection())
+    if oldest and (since is None or since < oldest):
+        since = oldest
+    day = cast(Job.created_at, Date)
+    job_filter, rollup_filter = [], {BillingDaily: [], BillingUserDaily: []}
+    if since:
+        job_filter.append(Job.created_at >= datetime.combine(since, datetime.min.time()))
+        for table in rollup_filter:
+            rollup_filter[table].append(table.day >= since)
+    if until:
+        job_filter.append(Job.created_at < datetime.combine(until, datetime.min.time()))
+        for table in rollup_filter:
+            rollup_filter[table].append(table.day < until)
+
+    # Blocks record_job until commit: jobs committed before the lock are in the SELECT, later ones upsert after
+    db.execute(text("LOCK TABLE billing_daily, billing_user_daily IN EXCLUSIVE MODE"))
+    aggregates = (func.count(), func.sum(Job.duration_seconds), func.sum(Job.cost_usd), func.sum(Job.cost_bnb))
+    inserted = {}
+    for table, group in ((BillingDaily, Job.gpu_type), (BillingUserDaily, Job.user_address)):
+        db.execute(delete(table).where(*rollup_filter[table]))
+        rows = select(day, group, Job.billed, *aggregates).where(*job_filter).group_by(day, group, Job.billed)
+        stmt = insert(table).from_select(["day", group.key, "billed", *MEASURES], rows).returning(table.jobs)
+        inserted[table] = db.scalars(stmt).all()
+    db.commit()
+    # Jobs in the rows just inserted - exactly what was read from jobs, archived months excluded
+    return sum(inserted[BillingDaily])
+
+
+def _range(query, table, start: date | None, end: date | None, billed: bool | None):
+    if start:
+        query = query.where(table.day >= start)
+    if end:
+        query = query.where(table.day <= end)
+    if billed is not None:
+        query = query.where(table.billed == billed)
+    return query
+
+
+def daily(db: Session, start=None, end=None, gpu_type=None, billed=None) -> list[dict]:
+    """Revenue and GPU-hours per day and gpu_type"""
+    query = _range(select(BillingDaily), BillingDaily, start, end, billed).order_by(BillingDaily.day, BillingDaily.gpu_type)
+    if gpu_type:
+        query = query.where(BillingDaily.gpu_type == gpu_type)
+    return [{"day": r.day, "gpu_type": r.gpu_type, "billed": r.billed, "jobs": r.jobs,
+             "gpu_hours": r.gpu_seconds / 3600, "cost_usd": r.cost_usd, "cost_bnb": r.cost_bnb}
+            for r in db.scalars(query)]
+
+
+def by_gpu_type(db: Session, start=None, end=None, billed=None) -> list[dict]:
+    """Totals per gpu_type over the range"""
+    t = BillingDaily
+    query = select(t.gpu_type, func.sum(t.jobs), func.sum(t.gpu_seconds), func.sum(t.cost_usd), func.sum(t.cost_bnb))
+    query = _range(query, t, start, end, billed).group_by(t.gpu_type).order_by(func.sum(t.gpu_seconds).desc())
+    return [{"gpu_type": g, "jobs": n, "gpu_hours": int(s) / 3600, "cost_usd": usd, "cost_bnb": bnb}
+            for g, n, s, usd, bnb in db.execute(query)]
+
+
+def top_spenders(db: Session, start=None, end=None, limit: int = 20, billed=True) -> list[dict]:
+    """Users ranked by BNB spent over the range"""
+    t = BillingUserDaily
+    query = select(t.user_address, func.sum(t.jobs), func.sum(t.gpu_seconds), func.sum(t.cost_usd), func.sum(t.cost_bnb))
+    query = _range(query, t, start, end, billed).group_by(t.user_address)
+    query = query.order_by(func.sum(t.cost_bnb).desc()).limit(limit)
+    return [{"address": a, "jobs": n, "gpu_hours": int(s) / 3600, "cost_usd": usd, "cost_bnb": bnb}
+            for a, n, s, usd, bnb in db.execute(query)]
+
+
+def spend_by_user(db: Session) -> dict[str, float]:
+    """Billed BNB per user over all time - one GROUP BY over the user rollup"""
+    t = BillingUserDaily
+    query = select(t.user_address, func.sum(t.cost_bnb)).where(t.billed == True).group_by(t.user_address)
+    return {a: float(bnb) for a, bnb in db.execute(query)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild billing rollups from the jobs table")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("backfill")
+    b.add_argument("--since", type=date.fromisoformat, help="first day to rebuild (default: all)")
+    b.add_argument("--until", type=date.fromisoformat, help="day after the last one to rebuild (default: all)")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+    with SessionLocal() as session:
+        count = backfill(session, args.since, args.until)
+    print(f"Rollups rebuilt from {count} jobs")
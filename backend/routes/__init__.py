@@ -1,5 +1,6 @@
+from .admin import router as admin_router
 from .auth import router as auth_router
 from .balance import router as balance_router
 from .jobs import router as jobs_router
 
-__all__ = ["auth_router", "balance_router", "jobs_router"]
+__all__ = ["admin_router", "auth_router", "balance_router", "jobs_router"]
@@ -0,0 +1,123 @@
+"""Admin routes - bulk balances, billing analytics, profiling and diagnostics (requires X-BACKEND-API-KEY)"""
+import json
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from database import get_db
+from dependencies import require_admin
+import balances
+import breaker
+import lifecycle
+import profiling
+import regions
+import rollups
+import startup
+import warm_pool
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/balances")
+async def all_balances(sort: str = "balance_bnb", desc: bool = False, below: float | None = None,
+                       db: Session = Depends(get_db)):
+    """Every user's balance as NDJSON; below=0 lists negative balances only"""
+    if sort not in balances.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(balances.SORT_KEYS)}")
+    rows = await balances.all_balances(db, sort, desc, below)
+    return StreamingResponse((json.dumps(row) + "\n" for row in rows), media_type="application/x-ndjson")
+
+
+@router.get("/billing/daily")
+async def billing_daily(start: date | None = None, end: date | None = None, gpu_type: str | None = None,
+                        billed: bool | None = None, db: Session = Depends(get_db)):
+    """Revenue and GPU-hours per day and gpu_type (start/end inclusive)"""
+    return rollups.daily(db, start, end, gpu_type, billed)
+
+
+@router.get("/billing/gpu-types")
+async def billing_gpu_types(start: date | None = None, end: date | None = None, billed: bool | None = None,
+                            db: Session = Depends(get_db)):
+    """GPU-hours and revenue per gpu_type over the range"""
+    return rollups.by_gpu_type(db, start, end, billed)
+
+
+@router.get("/billing/top-spenders")
+async def billing_top_spenders(start: date | None = None, end: date | None = None, limit: int = 20,
+                               db: Session = Depends(get_db)):
+    """Users ranked by billed BNB spend over the range"""
+    return rollups.top_spenders(db, start, end, min(limit, 1000))
+
+
+@router.get("/lifecycle")
+async def launch_lifecycle(hours: float = 168, warm: bool = False, gpu_type: str | None = None,
+                           db: Session = Depends(get_db)):
+    """Time from C3 create to running / healthy (p50, p90, p99) per gpu_type, region and image"""
+    return lifecycle.percentiles(db, datetime.utcnow() - timedelta(hours=hours), warm, gpu_type)
+
+
+@router.get("/startup")
+async def startup_timings():
+    """Import and warm-up timing breakdown of this process"""
+    return startup.TIMINGS
+
+
+@router.get("/regions")
+async def region_stats():
+    """Region selector launch stats per gpu_type and region (this worker)"""
+    return regions.selector.snapshot()
+
+
+@router.get("/warm-pool")
+async def warm_pool_status():
+    """Warm pools: target size, warming/ready instances, recent claims and idle cost"""
+    return warm_pool.status()
+
+
+@router.get("/breakers")
+async def breaker_status():
+    """Upstream circuit breaker states (this worker)"""
+    return breaker.status()
+
+
+@router.post("/profile/start")
+async def start_profile(seconds: int = 30):
+    """Start a time-boxed process-wide CPU profile"""
+    try:
+        return profiling.start_process_profile(seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/profile/stop")
+async def stop_profile():
+    """Stop the process-wide profile early and return its flamegraph"""
+    name = await profiling.stop_process_profile() or profiling.process_profile_status()["last"]
+    if not name:
+        raise HTTPException(status_code=404, detail="No process profile recorded")
+    return FileResponse(profiling.profile_path(name), media_type="text/html")
+
+
+@router.get("/profile")
+async def profile_status():
+    """Process profile state and stored profiles"""
+    return {**profiling.process_profile_status(), "profiles": profiling.list_profiles()}
+
+
+@router.get("/profile/{name}")
+async def get_profile(name: str):
+    """Download a stored flamegraph"""
+    path = profiling.profile_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/html")
+
+
+@router.get("/tracemalloc")
+async def tracemalloc_diff(seconds: float = 10, limit: int = 25, frames: int = 1):
+    """Trace allocations for a short window and return the snapshot diff"""
+    seconds = max(0.1, min(seconds, profiling.PROFILE_MAX_SECONDS))
+    try:
+        return await profiling.allocation_diff(seconds, limit=limit, frames=max(1, min(frames, 25)))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -2,7 +2,9 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 import railgun
+from deadline import with_deadline
 from dependencies import create_jwt, require_admin
+from env_config import AUTH_DEADLINE
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -18,7 +20,7 @@ class VerifyResponse(BaseModel):
     address: str
 
 
-@router.post("/verify", response_model=VerifyResponse)
+@router.post("/verify", response_model=VerifyResponse, dependencies=[Depends(with_deadline(AUTH_DEADLINE))])
 async def verify(req: VerifyRequest):
     """Verify SIWR signature and issue JWT"""
     valid = await railgun.verify(req.message, req.signature, req.address)
@@ -1,35 +1,29 @@
 """Balance routes"""
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from database import get_db
+from deadline import with_deadline
 from dependencies import require_auth
-from models import Job
+from env_config import BALANCE_DEADLINE
+from balances import user_balance
 from pricing import get_bnb_price
-import railgun
+from ratelimit import rate_limit
 
 router = APIRouter(prefix="/balance", tags=["balance"])
 
 
-@router.get("")
+@router.get("", dependencies=[Depends(with_deadline(BALANCE_DEADLINE)), Depends(rate_limit(1))])
 async def get_balance(address: str = Depends(require_auth), db: Session = Depends(get_db)):
     """Get user balance: deposits - spent"""
-    # Get deposits from railgun (txs FROM this address to us)
-    txs = await railgun.get_transactions(address)
-    deposits_wei = sum(int(r["amount"]) for tx in txs for r in tx.get("received", []))
-    deposits_bnb = deposits_wei / 1e18
-
-    # Get spent from local jobs table (only billed jobs)
-    spent_bnb = db.query(func.coalesce(func.sum(Job.cost_bnb), 0)).filter(Job.user_address == address, Job.billed == True).scalar()
-
-    balance_bnb = deposits_bnb - float(spent_bnb)
+    # Deposits from railgun (txs FROM this address to us) minus billed jobs, shared by concurrent callers
+    balance = await user_balance(db, address)
     bnb_price = await get_bnb_price()
 
     return {
         "address": address,
-        "deposits_bnb": deposits_bnb,
-        "spent_bnb": float(spent_bnb),
-        "balance_bnb": balance_bnb,
-        "balance_usd": balance_bnb * bnb_price,
+        "deposits_bnb": balance["deposits_bnb"],
+        "spent_bnb": balance["spent_bnb"],
+        "balance_bnb": balance["balance_bnb"],
+        "balance_usd": balance["balance_bnb"] * bnb_price,
         "bnb_price": bnb_price,
     }
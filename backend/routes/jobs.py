@@ -1,23 +1,37 @@
 """Jobs routes - launch GPU jobs"""
+import asyncio
+import json
 import uuid
 import logging
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from pydantic import BaseModel
-from c3 import C3
 from database import get_db
 from dependencies import require_auth
 from models import Job
+from rollups import record_job
+from partitions import find_job, hot_since, recent_since
 from pricing import calc_cost, get_bnb_price
-from env_config import get_c3_api_key, BILLING_ENABLED
+from env_config import BILLING_ENABLED, JOBS_DEADLINE
+import deadline
+from ratelimit import quota, rate_limit
+from breaker import CircuitOpen
+from c3_client import BREAKER as C3_BREAKER, get_c3
 from notify import notify_background, Category, Severity
-import railgun
+from metrics import track_upstream
+import balances
+import lifecycle
+from job_events import CLOSED, watcher
+from regions import REGION_SELECTION, selector
+import warm_pool
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
+JOB_EVENTS_HEARTBEAT = 15  # seconds between keep-alive comments on idle event streams
+
 
 class JobCreate(BaseModel):
     gpu_type: str
@@ -30,40 +44,28 @@ class JobCreate(BaseModel):
     auth: bool = False  # Enable Bearer token auth on load balancer
 
 
-@router.post("")
+@router.post("", dependencies=[Depends(deadline.with_deadline(JOBS_DEADLINE)), Depends(rate_limit(10))])
 async def create_job(req: JobCreate, address: str = Depends(require_auth), db: Session = Depends(get_db)):
     """Launch a GPU job, deduct from balance"""
+    requested_at = datetime.utcnow()
     # Calculate cost
     cost = await calc_cost(req.gpu_type, req.duration_seconds)
 
     # Check balance only if billing is enabled
     if BILLING_ENABLED:
-        txs = await railgun.get_transactions(address)
-        deposits_wei = sum(int(r["amount"]) for tx in txs for r in tx.get("received", []))
-        deposits_bnb = deposits_wei / 1e18
-        spent_bnb = db.query(func.coalesce(func.sum(Job.cost_bnb), 0)).filter(Job.user_address == address, Job.billed == True).scalar()
-        balance_bnb = deposits_bnb - float(spent_bnb)
+        balance_bnb = await balances.launch_balance(db, address)
 
         if balance_bnb < cost["cost_bnb"]:
             raise HTTPException(status_code=402, detail=f"Insufficient balance: {balance_bnb:.6f} BNB < {cost['cost_bnb']:.6f} BNB")
 
-    # Launch C3 job
-    c3 = C3(api_key=get_c3_api_key())
-    try:
-        c3_job = c3.jobs.create(
-            image=req.image,
-            gpu_type=req.gpu_type,
-            runtime=req.duration_seconds,
-            region=req.region,
-            command=req.command,
-            env=req.env,
-            ports=req.ports,
-            auth=req.auth,
-            interruptible=True,
-        )
-    except Exception as e:
-        logger.error(f"C3 job launch failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to launch job: {e}")
+    # Hand over a pre-launched instance from the warm pool if one matches, else launch
+    # (not if the client would already have given up on the response)
+    deadline.check()
+    c3_job = await warm_pool.handoff(req)
+    warm = c3_job is not None
+    region = None
+    if not warm:
+        c3_job, region = await launch(req)
 
     # Record job
     job = Job(
@@ -71,6 +73,7 @@ async def create_job(req: JobCreate, address: str = Depends(require_auth), db: S
         user_address=address,
         c3_job_id=c3_job.job_id,
         gpu_type=req.gpu_type,
+        region=getattr(c3_job, "region", None) or region,
         image=req.image,
         duration_seconds=req.duration_seconds,
         cost_usd=cost["cost_usd"],
@@ -80,43 +83,104 @@ async def create_job(req: JobCreate, address: str = Depends(require_auth), db: S
         billed=BILLING_ENABLED,
     )
     db.add(job)
+    record_job(db, job)
+    if warm:
+        warm_pool.assign(db, c3_job.job_id, job.id)
+    lifecycle.record_launch(db, job, requested_at, warm)
     db.commit()
+    await balances.invalidate(address)
+    watcher.launched(job, c3_job.state, warm=warm, service=bool(req.ports and req.ports.get("lb")))
 
-    notify_background(Category.JOBS, Severity.INFO, f"Job launched: {req.gpu_type} for {req.duration_seconds}s",
-                      job_id=job.id, c3_job_id=c3_job.job_id, cost_bnb=cost["cost_bnb"], address=address[:20])
+    notify_background(Category.JOBS, Severity.INFO,
+                      f"Job launched{' (warm pool)' if warm else ''}: {req.gpu_type} for {req.duration_seconds}s",
+                      job_id=job.id, c3_job_id=c3_job.job_id, gpu_type=req.gpu_type, cost_bnb=cost["cost_bnb"],
+                      address=address[:20])
 
     return {
         "id": job.id,
         "c3_job_id": c3_job.job_id,
         "gpu_type": req.gpu_type,
+        "region": job.region,
         "duration_seconds": req.duration_seconds,
         "cost_usd": cost["cost_usd"],
         "cost_bnb": cost["cost_bnb"],
         "hostname": c3_job.hostname,
+        "warm": warm,
     }
 
 
-@router.get("")
+async def launch(req: JobCreate):
+    """Launch a fresh C3 job; returns it and the region it was sent to (None: C3 chose)"""
+    # Pick the region likely to reach running soonest unless the user chose one
+    region = req.region
+    if region is None and REGION_SELECTION:
+        try:
+            region = await selector.choose(req.gpu_type)
+        except Exception as e:
+            logger.warning(f"Region selection failed, letting C3 choose: {e!r}")
+
+    deadline.check()
+    await quota("c3")
+    c3 = get_c3()
+    try:
+        async with C3_BREAKER.call(), track_upstream("c3", "create"):
+            c3_job = await asyncio.to_thread(
+                c3.jobs.create,
+                image=req.image,
+                gpu_type=req.gpu_type,
+                runtime=req.duration_seconds,
+                region=region,
+                command=req.command,
+                env=req.env,
+                ports=req.ports,
+                auth=req.auth,
+                interruptible=True,
+            )
+    except CircuitOpen:
+        raise
+    except Exception as e:
+        logger.error(f"C3 job launch failed: {e}")
+        if region and getattr(e, "status_code", 500) >= 500:
+            selector.observe_failure(req.gpu_type, region)
+        raise HTTPException(status_code=500, detail=f"Failed to launch job: {e}")
+    return c3_job, region
+
+
+def job_summary(j: Job) -> dict:
+    """Row shape returned by list_jobs"""
+    return {"id": j.id, "c3_job_id": j.c3_job_id, "gpu_type": j.gpu_type, "region": j.region, "cost_bnb": j.cost_bnb, "created_at": j.created_at}
+
+
+@router.get("", dependencies=[Depends(rate_limit(1))])
 async def list_jobs(address: str = Depends(require_auth), db: Session = Depends(get_db)):
     """List user's jobs"""
-    jobs = db.query(Job).filter(Job.user_address == address).order_by(Job.created_at.desc()).limit(50).all()
-    return [{"id": j.id, "c3_job_id": j.c3_job_id, "gpu_type": j.gpu_type, "cost_bnb": j.cost_bnb, "created_at": j.created_at} for j in jobs]
+    # Only the months holding the user's 50 newest jobs (known from the rollup) are scanned
+    since = recent_since(db, address, 50)
+    if since is None:
+        return []
+    jobs = db.query(Job).filter(Job.user_address == address, Job.created_at >= since) \
+        .order_by(Job.created_at.desc()).limit(50).all()
+    return [job_summary(j) for j in jobs]
 
 
-@router.get("/running")
+@router.get("/running", dependencies=[Depends(deadline.with_deadline(JOBS_DEADLINE)), Depends(rate_limit(5))])
 async def get_running_job(address: str = Depends(require_auth), db: Session = Depends(get_db)):
     """Get the first running job for this user with hostname from C3"""
-    # Get user's recent jobs
-    jobs = db.query(Job).filter(Job.user_address == address).order_by(Job.created_at.desc()).limit(10).all()
+    # Get user's recent jobs (older ones can't still be running; keeps the scan on recent partitions)
+    jobs = db.query(Job).filter(Job.user_address == address, Job.created_at >= hot_since()) \
+        .order_by(Job.created_at.desc()).limit(10).all()
     if not jobs:
         return {"job": None}
 
-    c3 = C3(api_key=get_c3_api_key())
+    c3 = get_c3()
 
     # Check each job's status on C3
     for job in jobs:
+        deadline.check()
+        await quota("c3")
         try:
-            c3_job = c3.jobs.get(job.c3_job_id)
+            async with C3_BREAKER.call(), track_upstream("c3", "get"):
+                c3_job = await asyncio.to_thread(c3.jobs.get, job.c3_job_id)
             if c3_job.state == "running" and c3_job.hostname:
                 return {
                     "job": {
@@ -127,47 +191,91 @@ async def get_running_job(address: str = Depends(require_auth), db: Session = De
                         "state": c3_job.state,
                     }
                 }
+        except CircuitOpen:
+            raise
         except Exception:
             continue
 
     return {"job": None}
 
 
-@router.get("/logs/{job_id}")
+@router.get("/events", dependencies=[Depends(rate_limit(1))])
+async def job_events(address: str = Depends(require_auth)):
+    """Server-sent events for this user's jobs: queued, billed, running (with hostname), terminated"""
+    queue = watcher.subscribe(address)
+    if queue is None:
+        raise HTTPException(status_code=429, detail="Too many open event streams for this address")
+
+    async def stream():
+        try:
+            try:
+                await asyncio.wait_for(watcher.ready.wait(), JOB_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                pass
+            for event in watcher.snapshot(address):
+                yield sse(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), JOB_EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is CLOSED:
+                    return
+                yield sse(event)
+        finally:
+            watcher.unsubscribe(address, queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def sse(event: dict) -> str:
+    data = {k: v for k, v in event.items() if k not in ("type", "address")}
+    return f"event: {event['type']}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/logs/{job_id}", dependencies=[Depends(rate_limit(2))])
 async def get_job_logs(job_id: str, address: str = Depends(require_auth), db: Session = Depends(get_db)):
     """Get job logs from C3"""
-    job = db.query(Job).filter(Job.id == job_id, Job.user_address == address).first()
+    job = find_job(db, address, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    c3 = C3(api_key=get_c3_api_key())
+    await quota("c3")
+    c3 = get_c3()
     try:
-        logs = c3.jobs.logs(job.c3_job_id)
+        async with C3_BREAKER.call(), track_upstream("c3", "logs"):
+            logs = await asyncio.to_thread(c3.jobs.logs, job.c3_job_id)
         return {"logs": logs}
+    except CircuitOpen:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get logs: {e}")
 
 
-@router.get("/{job_id}")
+@router.get("/{job_id}", dependencies=[Depends(rate_limit(1))])
 async def get_job(job_id: str, address: str = Depends(require_auth), db: Session = Depends(get_db)):
     """Get job details"""
-    job = db.query(Job).filter(Job.id == job_id, Job.user_address == address).first()
+    job = find_job(db, address, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return {"id": job.id, "c3_job_id": job.c3_job_id, "gpu_type": job.gpu_type, "image": job.image,
+    return {"id": job.id, "c3_job_id": job.c3_job_id, "gpu_type": job.gpu_type, "region": job.region, "image": job.image,
             "duration_seconds": job.duration_seconds, "cost_usd": job.cost_usd, "cost_bnb": job.cost_bnb, "created_at": job.created_at}
 
 
-@router.get("/metrics/{job_id}")
+@router.get("/metrics/{job_id}", dependencies=[Depends(rate_limit(2))])
 async def get_job_metrics(job_id: str, address: str = Depends(require_auth), db: Session = Depends(get_db)):
     """Get job metrics from C3"""
-    job = db.query(Job).filter(Job.id == job_id, Job.user_address == address).first()
+    job = find_job(db, address, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    c3 = C3(api_key=get_c3_api_key())
+    await quota("c3")
+    c3 = get_c3()
     try:
-        metrics = c3.jobs.metrics(job.c3_job_id)
+        async with C3_BREAKER.call(), track_upstream("c3", "metrics"):
+            metrics = await asyncio.to_thread(c3.jobs.metrics, job.c3_job_id)
         return {
             "gpus": [{"index": g.index, "name": g.name, "utilization": g.utilization,
                       "memory_used": g.memory_used, "memory_total": g.memory_total,
@@ -175,5 +283,7 @@ async def get_job_metrics(job_id: str, address: str = Depends(require_auth), db:
             "system": {"cpu_percent": metrics.system.cpu_percent, "memory_used": metrics.system.memory_used,
                        "memory_limit": metrics.system.memory_limit} if metrics.system else None
         }
+    except CircuitOpen:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get metrics: {e}")
@@ -0,0 +1,71 @@
+"""
+Startup warm-up - pay cold-start costs before readiness instead of on the first requests
+"""
+import asyncio
+import logging
+import time
+from sqlalchemy import text
+import dependencies
+import partitions
+import pricing
+import railgun
+from database import engine
+from env_config import WARMUP_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Step name -> seconds (or error string), exposed via /admin/startup
+TIMINGS: dict[str, float | str] = {}
+
+
+def prefill_pool():
+    """Open pool_size connections so the first requests don't each pay connect + TLS"""
+    conns = []
+    try:
+        for _ in range(engine.pool.size()):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            conns.append(conn)
+    finally:
+        for conn in conns:
+            conn.close()
+
+
+def load_keys():
+    dependencies.signing_key()
+    dependencies.verifying_key()
+
+
+async def timed(name: str, step):
+    start = time.perf_counter()
+    try:
+        if asyncio.iscoroutinefunction(step):
+            await step()
+        else:
+            await asyncio.to_thread(step)
+        TIMINGS[name] = round(time.perf_counter() - start, 4)
+    except Exception as e:
+        TIMINGS[name] = f"failed: {e}"
+        logger.warning(f"Warm-up step {name} failed: {e}")
+
+
+async def warm_up():
+    """Run warm-up steps concurrently; failures are logged, the service still starts"""
+    start = time.perf_counter()
+    steps = {
+        "db_pool": prefill_pool,
+        "partitions": partitions.ensure,  # months created since the last deploy
+        "jwt_keys": load_keys,
+        "c3_pricing": pricing.get_gpu_prices,  # also imports the C3 SDK
+        "railgun": railgun.ping,
+        "bnb_price": pricing.get_bnb_price,
+    }
+    try:
+        await asyncio.wait_for(asyncio.gather(*(timed(n, s) for n, s in steps.items())), WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        for name in steps:
+            TIMINGS.setdefault(name, "timed out")
+        logger.warning(f"Warm-up timed out after {WARMUP_TIMEOUT}s")
+    TIMINGS["warm_up"] = round(time.perf_counter() - start, 4)
+    logger.info("Startup timings: " + ", ".join(
+        f"{k}={v}s" if isinstance(v, float) else f"{k}={v}" for k, v in TIMINGS.items()))
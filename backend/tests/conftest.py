@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Backend modules import each other as top-level modules (as under uvicorn main:app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.py builds its engine at import; these tests never connect
+for name, value in {"DB_HOST": "localhost", "DB_PORT": "5432", "DB_USER": "test", "DB_PASSWORD": "test",
+                    "DB_NAME": "test"}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,118 @@
+"""CircuitBreaker state machine, driven through before()/after() and the call() context manager"""
+import asyncio
+import pytest
+import breaker
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+@pytest.fixture
+def cb():
+    b = CircuitBreaker("test", slow_seconds=1.0)
+    yield b
+    breaker.breakers.pop("test", None)
+
+
+def record(b, failed=False, duration=0.0, n=1):
+    for _ in range(n):
+        b.after(b.before(), failed, duration)
+
+
+def reopen_now(monkeypatch):
+    monkeypatch.setattr(breaker, "BREAKER_OPEN_SECONDS", 0)
+
+
+def test_stays_closed_below_min_calls(cb):
+    record(cb, failed=True, n=breaker.BREAKER_MIN_CALLS - 1)
+    assert cb.state == CLOSED
+
+
+def test_opens_on_error_rate(cb):
+    record(cb, n=breaker.BREAKER_MIN_CALLS // 2)
+    record(cb, failed=True, n=breaker.BREAKER_MIN_CALLS // 2)
+    assert cb.state == OPEN
+    with pytest.raises(CircuitOpen) as e:
+        cb.before()
+    assert e.value.upstream == "test" and 0 < e.value.retry_after <= breaker.BREAKER_OPEN_SECONDS
+
+
+def test_opens_on_slow_rate(cb):
+    record(cb, duration=5.0, n=breaker.BREAKER_MIN_CALLS)
+    assert cb.state == OPEN
+
+
+def test_half_open_allows_one_probe(cb, monkeypatch):
+    record(cb, failed=True, n=breaker.BREAKER_MIN_CALLS)
+    reopen_now(monkeypatch)
+    assert cb.before() is True
+    assert cb.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        cb.before()
+
+
+def test_successful_probe_closes(cb, monkeypatch):
+    record(cb, failed=True, n=breaker.BREAKER_MIN_CALLS)
+    reopen_now(monkeypatch)
+    record(cb)
+    assert cb.state == CLOSED
+    assert cb.snapshot()["calls"] == 0
+
+
+def test_failed_or_slow_probe_reopens(cb, monkeypatch):
+    record(cb, failed=True, n=breaker.BREAKER_MIN_CALLS)
+    reopen_now(monkeypatch)
+    record(cb, failed=True)
+    assert cb.state == OPEN
+    record(cb, duration=5.0)
+    assert cb.state == OPEN
+
+
+def test_cancelled_probe_frees_the_slot(cb, monkeypatch):
+    record(cb, failed=True, n=breaker.BREAKER_MIN_CALLS)
+    reopen_now(monkeypatch)
+    cb.after(cb.before(), None, 0.0)
+    assert cb.state == HALF_OPEN
+    assert cb.before() is True
+
+
+def test_calls_finishing_after_open_are_ignored(cb):
+    started = [cb.before() for _ in range(breaker.BREAKER_MIN_CALLS)]
+    for probe in started:
+        cb.after(probe, True, 0.0)
+    assert cb.state == OPEN
+    cb.after(False, False, 0.0)
+    assert cb.snapshot()["calls"] == 0
+
+
+def test_call_counts_exceptions_by_is_failure():
+    b = CircuitBreaker("test-filter", slow_seconds=1.0, is_failure=lambda exc: not isinstance(exc, KeyError))
+    try:
+        for _ in range(breaker.BREAKER_MIN_CALLS):
+            with pytest.raises(KeyError), b.call():
+                raise KeyError("not an upstream failure")
+        assert b.state == CLOSED and b.snapshot()["error_rate"] == 0
+        for _ in range(breaker.BREAKER_MIN_CALLS):
+            with pytest.raises(ValueError), b.call():
+                raise ValueError("upstream down")
+        assert b.state == OPEN
+    finally:
+        breaker.breakers.pop("test-filter", None)
+
+
+def test_async_call_ignores_cancellation(cb):
+    async def cancelled():
+        async with cb.call():
+            raise asyncio.CancelledError
+
+    async def ok():
+        async with cb.call():
+            pass
+
+    async def run():
+        for _ in range(breaker.BREAKER_MIN_CALLS):
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled()
+        await ok()
+
+    asyncio.run(run())
+    assert cb.snapshot()["calls"] == 1
+    assert cb.state == CLOSED
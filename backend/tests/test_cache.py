@@ -0,0 +1,123 @@
+"""cache.cached(): single-flight refresh, ttl, invalidation, stale-if-error, waiting on other processes"""
+import asyncio
+import os
+import time
+import uuid
+import pytest
+import cache
+
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", cache.MemoryCache())
+    cache._inflight.clear()
+
+
+class Loader:
+    def __init__(self, value="v", delay=0.0, error=None):
+        self.value, self.delay, self.error = value, delay, error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"{self.value}{self.calls}"
+
+
+def test_concurrent_misses_share_one_load():
+    load = Loader(delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(cache.cached("t", "k", 10, load) for _ in range(20)))
+
+    assert asyncio.run(run()) == ["v1"] * 20
+    assert load.calls == 1
+
+
+def test_value_kept_for_ttl_and_dropped_by_invalidate():
+    load = Loader()
+
+    async def run():
+        first = await cache.cached("t", "k", 10, load)
+        second = await cache.cached("t", "k", 10, load)
+        await cache.invalidate("k")
+        third = await cache.cached("t", "k", 10, load)
+        return first, second, third
+
+    assert asyncio.run(run()) == ("v1", "v1", "v2")
+
+
+def test_expired_value_served_when_refresh_fails():
+    async def run():
+        await cache.cached("t", "k", 0.01, Loader())
+        await asyncio.sleep(0.02)
+        return await cache.cached("t", "k", 0.01, Loader(error=RuntimeError("down")), stale_if_error=60)
+
+    assert asyncio.run(run()) == "v1"
+
+
+def test_refresh_error_reaches_every_waiter():
+    load = Loader(delay=0.05, error=RuntimeError("down"))
+
+    async def run():
+        return await asyncio.gather(*(cache.cached("t", "k", 10, load) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert load.calls == 1
+
+
+class Refreshing(cache.MemoryCache):
+    """Another process holds the lease and stores the value after `delay` seconds"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.ready_at = time.monotonic() + delay
+        self.gets = 0
+
+    async def get(self, key):
+        self.gets += 1
+        return ("theirs", 10) if time.monotonic() >= self.ready_at else None
+
+    async def acquire(self, key, lease):
+        return False
+
+
+def test_waiters_back_off_while_another_process_refreshes(monkeypatch):
+    store = Refreshing(delay=0.6)
+    monkeypatch.setattr(cache, "_backend", store)
+    load = Loader()
+    assert asyncio.run(cache.cached("t", "k", 10, load)) == "theirs"
+    assert load.calls == 0
+    assert store.gets <= 7  # 50ms polling would take ~13
+
+
+@pytest.fixture
+def postgres_cache():
+    if os.getenv("DB_TESTS", "false").lower() != "true":
+        pytest.skip("set DB_TESTS=true to run against the configured database")
+    from sqlalchemy import text
+    from database import engine
+    prefix = f"test:{uuid.uuid4().hex}:"
+    yield cache.PostgresCache(), prefix
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM cache_entries WHERE key LIKE :p"), {"p": prefix + "%"})
+
+
+def test_postgres_sweeps_entries_past_retention(postgres_cache, monkeypatch):
+    store, prefix = postgres_cache
+    monkeypatch.setattr(cache, "CACHE_RETAIN_SECONDS", 60)
+    monkeypatch.setattr(cache, "CACHE_SWEEP_SECONDS", 0)
+
+    async def run():
+        await store.set(prefix + "old", 1, -120)
+        await store.set(prefix + "stale", 2, -30)
+        await store.set(prefix + "fresh", 3, 30)
+        return [await store.get(prefix + k) for k in ("old", "stale", "fresh")]
+
+    old, stale, fresh = asyncio.run(run())
+    assert old is None
+    assert stale[0] == 2 and stale[1] < 0
+    assert fresh[0] == 3
@@ -0,0 +1,73 @@
+"""JobWatcher polls against a stubbed C3 list and job table: ownership lookups and the events they unlock"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+import job_events
+from job_events import JobWatcher
+
+
+class Env:
+    def __init__(self, monkeypatch):
+        self.listed = []  # what C3 lists
+        self.rows = {}  # c3_job_id -> job info committed to the database
+        self.lookups = []
+        self.watcher = JobWatcher()
+        self.events = asyncio.Queue(100)
+        self.watcher.streams["0zkowner"].add(self.events)
+        monkeypatch.setattr(self.watcher, "_lookup", self.lookup)
+        monkeypatch.setattr(job_events, "get_c3", lambda: SimpleNamespace(jobs=SimpleNamespace(list=lambda: self.listed)))
+        monkeypatch.setattr(job_events.lifecycle, "save", lambda updates: None)
+
+        async def quota(upstream, cost=1):
+            pass
+        monkeypatch.setattr(job_events, "quota", quota)
+
+    def lookup(self, c3_job_ids):
+        self.lookups.append(sorted(c3_job_ids))
+        return {i: self.rows[i] for i in c3_job_ids if i in self.rows}
+
+    def list(self, **states):
+        self.listed = [SimpleNamespace(job_id=i, state=s, hostname="h" if s == "running" else None)
+                       for i, s in states.items()]
+
+    def commit(self, c3_job_id):
+        self.rows[c3_job_id] = {"job_id": f"job-{c3_job_id}", "c3_job_id": c3_job_id, "address": "0zkowner",
+                                "gpu_type": "l4", "cost_bnb": 0.1, "billed": True}
+
+    def poll(self):
+        asyncio.run(self.watcher.poll())
+        events = []
+        while not self.events.empty():
+            events.append(self.events.get_nowait()["type"])
+        return events
+
+
+@pytest.fixture
+def env(monkeypatch):
+    return Env(monkeypatch)
+
+
+def test_job_listed_before_its_row_commits_is_looked_up_again(env, monkeypatch):
+    env.list(other="running")
+    env.poll()  # seeding poll
+    env.list(other="running", c1="queued")
+    assert env.poll() == []  # another worker's launch, row not committed yet
+    env.commit("c1")
+    assert env.poll() == []  # negative lookup still fresh
+    monkeypatch.setattr(job_events, "JOB_OWNER_RETRY_SECONDS", 0)
+    assert env.poll() == ["queued", "billed"]
+    env.list(other="running", c1="running")
+    assert env.poll() == ["running"]
+    # "other" is nobody's but still active, so it keeps being retried; c1 stops once found
+    assert env.lookups == [["other"], ["c1"], ["c1", "other"], ["other"]]
+
+
+def test_finished_unknown_jobs_are_not_looked_up_again(env, monkeypatch):
+    monkeypatch.setattr(job_events, "JOB_OWNER_RETRY_SECONDS", 0)
+    env.list(c1="completed")
+    env.poll()
+    env.poll()
+    assert env.lookups == [["c1"]]
+    env.list()
+    env.poll()
+    assert env.watcher.misses == {}
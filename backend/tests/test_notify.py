@@ -0,0 +1,62 @@
+"""Dispatcher delivery: batching, concurrent per-event POSTs and flush"""
+import asyncio
+import pytest
+import notify
+from notify import Category, Dispatcher, Severity, build_payload
+
+
+class FakePost:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.bodies = []
+        self.active = self.peak = 0
+
+    async def __call__(self, url, body):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.bodies.append((url, body))
+        return body.get("message") not in self.fail
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    monkeypatch.setattr(notify, "NOTIFY_URL", "http://notify/notify")
+    monkeypatch.setattr(notify, "NOTIFY_BATCH_URL", None)
+    monkeypatch.setattr(notify, "NOTIFY_LINGER", 0)
+    monkeypatch.setattr(notify, "DIGEST_WINDOWS", {})
+
+
+def burst(dispatcher, n):
+    async def run():
+        for i in range(n):
+            dispatcher.submit(build_payload(Category.JOBS, Severity.INFO, f"event {i}", {}))
+        await dispatcher.flush()
+    asyncio.run(run())
+
+
+def test_per_event_posts_run_concurrently(monkeypatch):
+    dispatcher = Dispatcher(batch_size=5)
+    post = FakePost(fail={"event 3"})
+    monkeypatch.setattr(dispatcher, "_post", post)
+    burst(dispatcher, 12)
+    assert len(post.bodies) == 12 and 1 < post.peak <= 5
+    assert {url for url, _ in post.bodies} == {"http://notify/notify"}
+    assert dispatcher.stats["sent"] == 11 and dispatcher.stats["failed"] == 1
+
+
+def test_batch_url_gets_one_post_per_batch(monkeypatch):
+    monkeypatch.setattr(notify, "NOTIFY_BATCH_URL", "http://notify/batch")
+    dispatcher = Dispatcher(batch_size=5)
+    post = FakePost()
+    monkeypatch.setattr(dispatcher, "_post", post)
+    burst(dispatcher, 11)
+    assert [url for url, _ in post.bodies] == ["http://notify/batch"] * 2 + ["http://notify/notify"]
+    assert [len(body["events"]) for _, body in post.bodies[:2]] == [5, 5]
+    assert dispatcher.stats["sent"] == 11
+
+
+def test_digests_are_off_by_default():
+    assert notify.parse_windows(notify.NOTIFY_DIGEST) == {}
+    assert notify.parse_windows("jobs=30, billing=60") == {"jobs": 30.0, "billing": 60.0}
@@ -0,0 +1,94 @@
+"""Partition naming, plus spend totals and job-history windows read from rollups and the hot partition
+
+The database tests need a migrated Postgres (DB_* settings) and DB_TESTS=true; they run inside a
+transaction that is rolled back, so they leave no rows behind.
+"""
+import os
+import uuid
+from datetime import date, timedelta
+import pytest
+from sqlalchemy.orm import Session
+import partitions
+from partitions import add_months, partition_month, partition_name
+
+
+def test_add_months_crosses_years():
+    assert add_months(date(2024, 11, 1), 2) == date(2025, 1, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert add_months(date(2024, 5, 1), -17) == date(2022, 12, 1)
+
+
+def test_partition_names_round_trip():
+    assert partition_name(date(2024, 3, 1)) == "jobs_y2024m03"
+    assert partition_month("jobs_y2024m03") == date(2024, 3, 1)
+    assert partition_month("archived_jobs_y2024m03") is None
+    assert partition_month("jobs_default") is None
+
+
+@pytest.fixture
+def db():
+    if os.getenv("DB_TESTS", "false").lower() != "true":
+        pytest.skip("set DB_TESTS=true to run against the configured database")
+    from database import engine
+    with engine.connect() as conn:
+        outer = conn.begin()
+        session = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            yield session
+        finally:
+            session.close()
+            outer.rollback()
+
+
+def rollup(db, address, day, jobs=1, cost_bnb=0.0, billed=True):
+    from models import BillingUserDaily
+    db.add(BillingUserDaily(day=day, user_address=address, billed=billed, jobs=jobs, gpu_seconds=0,
+                            cost_usd=0, cost_bnb=cost_bnb))
+
+
+def job(db, address, cost_bnb, billed=True):
+    from models import Job
+    db.add(Job(user_address=address, c3_job_id="test", gpu_type="test", image="test", duration_seconds=60,
+               cost_usd=0, cost_bnb=cost_bnb, bnb_price_usd=1, billed=billed))
+
+
+def test_spend_is_closed_rollups_plus_live_partition(db):
+    address, other = f"0ztest{uuid.uuid4().hex}", f"0ztest{uuid.uuid4().hex}"
+    month = partitions.current_month()
+    last_month = add_months(month, -1)
+    rollup(db, address, last_month, cost_bnb=2.0)
+    rollup(db, address, last_month + timedelta(days=3), cost_bnb=0.5)
+    rollup(db, address, last_month, cost_bnb=7.0, billed=False)
+    rollup(db, address, month, cost_bnb=100.0)  # the current month is read from the jobs partition instead
+    rollup(db, other, last_month, cost_bnb=50.0)
+    job(db, address, 1.5)
+    job(db, address, 9.0, billed=False)
+    db.flush()
+    assert partitions.user_spent_bnb(db, address) == pytest.approx(4.0)
+    assert partitions.user_spent_bnb(db, f"0ztest{uuid.uuid4().hex}") == 0
+
+
+def test_recent_since_covers_limit_newest_jobs(db):
+    address = f"0ztest{uuid.uuid4().hex}"
+    month = partitions.current_month()
+    rollup(db, address, month, jobs=1)
+    rollup(db, address, add_months(month, -1), jobs=2)
+    rollup(db, address, add_months(month, -1) + timedelta(days=5), jobs=1, billed=False)
+    rollup(db, address, add_months(month, -3), jobs=5)
+    db.flush()
+    assert partitions.recent_since(db, address, 1) == partitions._start(month)
+    assert partitions.recent_since(db, address, 4) == partitions._start(add_months(month, -1))
+    assert partitions.recent_since(db, address, 5) == partitions._start(add_months(month, -3))
+    assert partitions.recent_since(db, address, 100) == partitions._start(add_months(month, -3))
+    assert partitions.recent_since(db, f"0ztest{uuid.uuid4().hex}", 10) is None
+
+
+def test_find_job_by_id_and_owner(db):
+    address = f"0ztest{uuid.uuid4().hex}"
+    job(db, address, 1.0)
+    db.flush()
+    from models import Job
+    job_id = db.query(Job.id).filter(Job.user_address == address).scalar()
+    assert partitions.find_job(db, address, job_id).id == job_id
+    assert partitions.find_job(db, f"0ztest{uuid.uuid4().hex}", job_id) is None
+    assert partitions.find_job(db, address, str(uuid.uuid4())) is None
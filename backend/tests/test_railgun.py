@@ -0,0 +1,67 @@
+"""Hedged railgun GETs: first answer wins, and no attempt outlives its caller"""
+import asyncio
+import pytest
+import railgun
+
+
+class FakeRequests:
+    def __init__(self, *delays, fail=()):
+        self.delays = list(delays)
+        self.fail = set(fail)
+        self.started = self.cancelled = 0
+
+    async def __call__(self, method, url, **kwargs):
+        n = self.started
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delays[n])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if n in self.fail:
+            raise RuntimeError(f"attempt {n} failed")
+        return f"attempt {n}"
+
+
+@pytest.fixture
+def hedged(monkeypatch):
+    monkeypatch.setattr(railgun, "hedger", railgun.Hedger())
+    monkeypatch.setattr(railgun.hedger, "delay", lambda: 0.02)
+
+    async def quota(upstream, cost=1):
+        return True
+    monkeypatch.setattr(railgun, "try_quota", quota)
+
+
+def test_unhedged_get_returns_first_attempt(monkeypatch):
+    monkeypatch.setattr(railgun, "request", FakeRequests(0))
+    monkeypatch.setattr(railgun.hedger, "delay", lambda: None)
+    assert asyncio.run(railgun.get("/x")) == "attempt 0"
+
+
+def test_hedge_wins_and_loser_is_cancelled(hedged, monkeypatch):
+    fake = FakeRequests(1.0, 0.01)
+    monkeypatch.setattr(railgun, "request", fake)
+    assert asyncio.run(railgun.get("/x")) == "attempt 1"
+    assert fake.started == 2 and fake.cancelled == 1
+
+
+def test_failed_attempt_falls_back_to_the_other(hedged, monkeypatch):
+    monkeypatch.setattr(railgun, "request", FakeRequests(0.05, 0.01, fail={1}))
+    assert asyncio.run(railgun.get("/x")) == "attempt 0"
+
+
+def test_cancelled_caller_cancels_every_attempt(hedged, monkeypatch):
+    fake = FakeRequests(1.0, 1.0)
+
+    async def run():
+        monkeypatch.setattr(railgun, "request", fake)
+        caller = asyncio.ensure_future(railgun.get("/x"))
+        await asyncio.sleep(0.01)  # still waiting for the hedge delay
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert fake.started == 1 and fake.cancelled == 1
@@ -0,0 +1,133 @@
+"""Token buckets of both rate limit backends and the upstream quota helpers built on them"""
+import asyncio
+import os
+import uuid
+import pytest
+import ratelimit
+from ratelimit import MemoryRateLimit, RateLimited
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", c)
+    return c
+
+
+def take(limiter, key="k", cost=1, rate=2, burst=3):
+    return asyncio.run(limiter.take(key, cost, rate, burst))
+
+
+def test_burst_then_wait_for_refill(clock):
+    limiter = MemoryRateLimit()
+    assert [take(limiter) for _ in range(3)] == [0, 0, 0]
+    assert take(limiter) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert take(limiter) == 0
+
+
+def test_refill_is_capped_at_burst(clock):
+    limiter = MemoryRateLimit()
+    take(limiter)
+    clock.now += 3600
+    assert [take(limiter) for _ in range(3)] == [0, 0, 0]
+    assert take(limiter) > 0
+
+
+def test_rejected_take_costs_nothing(clock):
+    limiter = MemoryRateLimit()
+    assert take(limiter, cost=3) == 0
+    assert take(limiter, cost=2) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert take(limiter, cost=2) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert take(limiter, cost=2) == 0
+
+
+def test_keys_are_independent(clock):
+    limiter = MemoryRateLimit()
+    assert take(limiter, key="a", cost=3) == 0
+    assert take(limiter, key="a") > 0
+    assert take(limiter, key="b") == 0
+
+
+def test_full_buckets_pruned_past_max_keys(clock, monkeypatch):
+    monkeypatch.setattr(MemoryRateLimit, "MAX_KEYS", 3)
+    limiter = MemoryRateLimit()
+    for key in "abc":
+        take(limiter, key=key)
+    clock.now += 10  # a, b and c are full again
+    take(limiter, key="d")
+    assert set(limiter._buckets) == {"d"}
+
+
+@pytest.fixture
+def quota(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(ratelimit, "_backend", MemoryRateLimit())
+    monkeypatch.setitem(ratelimit.QUOTAS, "test", (100, 1))  # one token, refilled every 10ms
+
+
+def test_quota_waits_within_budget(quota, monkeypatch):
+    monkeypatch.setattr(ratelimit, "QUOTA_MAX_WAIT", 1)
+
+    async def run():
+        await ratelimit.quota("test")
+        await ratelimit.quota("test")
+
+    asyncio.run(run())
+
+
+def test_quota_raises_past_budget(quota, monkeypatch):
+    monkeypatch.setattr(ratelimit, "QUOTA_MAX_WAIT", 0)
+
+    async def run():
+        await ratelimit.quota("test")
+        await ratelimit.quota("test")
+
+    with pytest.raises(RateLimited) as e:
+        asyncio.run(run())
+    assert e.value.scope == "test" and e.value.retry_after > 0
+
+
+def test_try_quota_never_waits(quota):
+    async def run():
+        return [await ratelimit.try_quota("test") for _ in range(2)]
+
+    assert asyncio.run(run()) == [True, False]
+
+
+@pytest.fixture
+def postgres_limit():
+    if os.getenv("DB_TESTS", "false").lower() != "true":
+        pytest.skip("set DB_TESTS=true to run against the configured database")
+    from sqlalchemy import text
+    from database import engine
+    prefix = f"test:{uuid.uuid4().hex}:"
+    yield ratelimit.PostgresRateLimit(), prefix
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM rate_limits WHERE key LIKE :p"), {"p": prefix + "%"})
+
+
+def test_postgres_sweeps_buckets_that_refilled(postgres_limit, monkeypatch):
+    from sqlalchemy import text
+    from database import engine
+    limiter, prefix = postgres_limit
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_SWEEP_SECONDS", 0)
+    assert asyncio.run(limiter.take(prefix + "idle", 1, 2, 3)) == 0
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE rate_limits SET updated_at = updated_at - make_interval(secs => :s) WHERE key = :k"),
+                     {"s": ratelimit.FULL_AFTER + 1, "k": prefix + "idle"})
+    assert asyncio.run(limiter.take(prefix + "busy", 3, 2, 3)) == 0
+    assert asyncio.run(limiter.take(prefix + "busy", 1, 2, 3)) > 0  # kept: not refilled yet
+    with engine.begin() as conn:
+        keys = set(conn.scalars(text("SELECT key FROM rate_limits WHERE key LIKE :p"), {"p": prefix + "%"}))
+    assert keys == {prefix + "busy"}
@@ -0,0 +1,114 @@
+"""RegionSelector against the load-test fake C3 SDK: ranking, failure penalties, probes and fallback"""
+import asyncio
+import importlib.util
+import os
+import time
+import pytest
+import cache
+import regions
+from regions import RegionSelector
+
+FAKE_C3 = os.path.join(os.path.dirname(__file__), "..", "..", "scripts", "loadtest", "fake_c3", "c3", "__init__.py")
+
+
+def load_fake_c3():
+    spec = importlib.util.spec_from_file_location("fake_c3", FAKE_C3)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def c3(monkeypatch):
+    fake = load_fake_c3()
+    monkeypatch.setattr(fake, "LATENCY_MS", 0)
+    monkeypatch.setattr(fake, "JITTER_MS", 0)
+    client = fake.C3()
+    monkeypatch.setattr(regions, "get_c3", lambda: client)
+    monkeypatch.setattr(cache, "_backend", cache.MemoryCache())
+    cache._inflight.clear()
+    monkeypatch.setattr(regions, "REGION_EXPLORE", 0)
+    return fake
+
+
+@pytest.fixture
+def selector():
+    return RegionSelector()
+
+
+def ran(selector, gpu_type, region, seconds):
+    selector.observe_running(gpu_type, region, selector.launched(gpu_type, region) - seconds)
+
+
+def choose(selector, gpu_type="l4"):
+    return asyncio.run(selector.choose(gpu_type))
+
+
+def test_candidates_come_from_the_catalog(c3, monkeypatch):
+    monkeypatch.setitem(c3.REGION_BOOT, "kr", "down")
+    assert asyncio.run(regions.candidate_regions("l4")) == ["us", "eu"]
+    assert asyncio.run(regions.candidate_regions("unknown")) == []
+
+
+def test_unobserved_regions_keep_catalog_order(c3, selector):
+    assert choose(selector) == "us"
+
+
+def test_fastest_observed_region_wins(c3, selector):
+    ran(selector, "l4", "us", 100)
+    ran(selector, "l4", "eu", 20)
+    assert choose(selector) == "eu"
+    assert choose(selector, "h100") == "us"  # stats are per GPU type
+
+
+def test_failures_outweigh_a_fast_time_to_running(c3, selector):
+    ran(selector, "l4", "us", 30)
+    ran(selector, "l4", "eu", 20)
+    for _ in range(5):
+        selector.observe_failure("l4", "eu")
+    assert choose(selector) == "us"
+    stats = {(s["gpu_type"], s["region"]): s for s in selector.snapshot()}
+    assert stats[("l4", "eu")]["failures"] == 5 and stats[("l4", "eu")]["success_rate"] < 0.4
+
+
+def test_probe_drops_regions_that_stopped_offering_the_gpu(c3, selector, monkeypatch):
+    ran(selector, "l4", "us", 30)
+    ran(selector, "l4", "eu", 20)
+    asyncio.run(regions.candidate_regions("l4"))  # cached while eu still had capacity
+    monkeypatch.setitem(c3.REGION_BOOT, "eu", "down")
+    assert choose(selector) == "us"
+
+
+def test_slow_probe_falls_back_to_cached_candidates(c3, selector, monkeypatch):
+    ran(selector, "l4", "us", 100)
+    ran(selector, "l4", "eu", 20)
+    asyncio.run(regions.candidate_regions("l4"))
+    monkeypatch.setitem(c3.REGION_BOOT, "eu", "down")
+    monkeypatch.setattr(c3, "LATENCY_MS", 300)
+    monkeypatch.setattr(regions, "REGION_PROBE_TIMEOUT", 0.05)
+
+    async def timed():
+        start = time.monotonic()
+        return await selector.choose("l4"), time.monotonic() - start
+
+    region, seconds = asyncio.run(timed())
+    assert region == "eu" and seconds < 0.25
+
+
+def test_exploration_tries_a_non_best_region(c3, selector, monkeypatch):
+    ran(selector, "l4", "eu", 20)
+    monkeypatch.setattr(regions, "REGION_EXPLORE", 1)
+    assert {choose(selector) for _ in range(20)} <= {"us", "kr"}
+
+
+def test_single_or_no_candidate_skips_the_probe(c3, selector, monkeypatch):
+    monkeypatch.setitem(c3.REGION_BOOT, "eu", "down")
+    monkeypatch.setitem(c3.REGION_BOOT, "kr", "down")
+
+    async def probe(gpu_type):
+        raise AssertionError("probed")
+    monkeypatch.setattr(selector, "probe", probe)
+    assert choose(selector) == "us"
+    monkeypatch.setitem(c3.REGION_BOOT, "us", "down")
+    cache._backend = cache.MemoryCache()
+    assert choose(selector) is None
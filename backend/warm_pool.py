@@ -0,0 +1,344 @@
+"""
+Warm pool - pre-launched interruptible instances handed to create_job on demand
+
+WARM_POOL is a JSON list of pools, e.g.
+
+    [{"gpu_type": "l40s", "image": "c3-vllm", "region": "us", "size": 3}]
+
+Optional per pool: "min" instances kept however low demand is (default 1), and "command",
+"env", "ports", "auth" - a job gets a pooled instance only when its gpu_type, image, region
+(if it asks for one) and these launch options all match.
+
+Every WARM_POOL_INTERVAL seconds one worker (advisory lock) syncs the instances with C3,
+sizes each pool between min and size from recent demand (its jobs over WARM_POOL_WINDOW,
+times how long an instance takes to become ready), then launches or cancels instances to
+match. Launches stop while unclaimed instances already cost WARM_POOL_MAX_IDLE_USD per hour.
+
+Instances are tracked in warm_instances; a claim is one UPDATE ... SKIP LOCKED, so each
+instance goes to exactly one request across workers and pods. A claimed instance's runtime
+is extended by the job's duration and billing starts at handoff - the idle time before it
+is the operator's cost.
+
+    python warm_pool.py status
+    python warm_pool.py drain      # cancel every unclaimed instance
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from c3_client import BREAKER as C3_BREAKER, get_c3
+from database import engine
+from metrics import WARM_POOL_CLAIMS, WARM_POOL_INSTANCES, track_upstream
+from pricing import get_gpu_prices
+from ratelimit import quota
+
+logger = logging.getLogger(__name__)
+
+WARM_POOL_INTERVAL = float(os.getenv("WARM_POOL_INTERVAL", "30"))
+WARM_POOL_WINDOW = float(os.getenv("WARM_POOL_WINDOW", "3600"))  # demand is measured over this many seconds
+WARM_POOL_RUNTIME = int(os.getenv("WARM_POOL_RUNTIME", "3600"))  # runtime pooled instances are launched with
+WARM_POOL_MAX_IDLE_USD = float(os.getenv("WARM_POOL_MAX_IDLE_USD", "20"))  # per hour, all pools together
+WARM_POOL_LEAD = float(os.getenv("WARM_POOL_LEAD", "300"))  # assumed seconds to ready until measured
+
+LOCK_ID = 0x7761726D  # advisory lock: one worker maintains the pools at a time
+CLAIM_MARGIN = 120  # seconds of launch runtime left below which an instance is no longer handed out
+TERMINAL_STATES = {"completed", "cancelled", "failed", "terminated", "preempted", "expired"}
+
+
+@dataclass
+class Pool:
+    gpu_type: str
+    image: str
+    region: str | None = None
+    size: int = 1
+    min: int = 1
+    command: str | None = None
+    env: dict | None = None
+    ports: dict | None = None
+    auth: bool = False
+    key: str = field(init=False)
+
+    def __post_init__(self):
+        self.min = min(self.min, self.size)
+        self.key = f"{self.gpu_type}/{self.image}/{self.region or '*'}"
+
+    def matches(self, req) -> bool:
+        return (req.gpu_type, req.image, req.command, req.env or None, req.ports or None, req.auth) == \
+            (self.gpu_type, self.image, self.command, self.env or None, self.ports or None, self.auth) \
+            and (req.region is None or self.region in (None, req.region))
+
+
+def load_pools(raw: str) -> list[Pool]:
+    try:
+        return [Pool(**p) for p in json.loads(raw or "[]")]
+    except (TypeError, ValueError) as e:
+        raise RuntimeError(f"Invalid WARM_POOL: {e}")
+
+
+POOLS = load_pools(os.getenv("WARM_POOL", ""))
+
+
+# --- Handoff (create_job) ---
+
+CLAIM = text("UPDATE warm_instances SET state = 'claimed', claimed_at = :now WHERE c3_job_id = ("
+             "SELECT c3_job_id FROM warm_instances WHERE pool = ANY(:pools) AND state = 'ready' "
+             "AND launched_at > :fresh AND (CAST(:region AS varchar) IS NULL OR region = :region) "
+             "ORDER BY launched_at LIMIT 1 FOR UPDATE SKIP LOCKED) RETURNING c3_job_id, launched_at")
+
+
+def _claim(pools: list[str], region: str | None):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        return conn.execute(CLAIM, {"now": now, "pools": pools, "region": region,
+                                    "fresh": now - timedelta(seconds=WARM_POOL_RUNTIME - CLAIM_MARGIN)}).first()
+
+
+async def handoff(req):
+    """A ready instance matching the job request, running for its duration from now; None on a miss"""
+    pools = [p.key for p in POOLS if p.matches(req)]
+    if not pools:
+        return None
+    row = await asyncio.to_thread(_claim, pools, req.region)
+    if row is None:
+        WARM_POOL_CLAIMS.labels(req.gpu_type, "miss").inc()
+        return None
+    c3_job_id, launched_at = row
+
+    # Runtime counts from launch, so extend by the time already spent warm
+    runtime = math.ceil((datetime.utcnow() - launched_at).total_seconds()) + req.duration_seconds
+    try:
+        await quota("c3")
+        async with C3_BREAKER.call(), track_upstream("c3", "extend"):
+            c3_job = await asyncio.to_thread(get_c3().jobs.extend, c3_job_id, runtime)
+        if c3_job.state != "running":
+            raise RuntimeError(f"instance is {c3_job.state}")
+    except Exception as e:
+        logger.warning(f"Warm instance {c3_job_id} handoff failed, launching instead: {e!r}")
+        WARM_POOL_CLAIMS.labels(req.gpu_type, "failed").inc()
+        await asyncio.to_thread(_forget, c3_job_id)
+        await cancel(c3_job_id)
+        return None
+    WARM_POOL_CLAIMS.labels(req.gpu_type, "hit").inc()
+    WARM_POOL_INSTANCES.labels("claimed").inc()
+    return c3_job
+
+
+def assign(db, c3_job_id: str, job_id: str):
+    """Link a claimed instance to its job (in the caller's transaction)"""
+    db.execute(text("UPDATE warm_instances SET job_id = :job_id WHERE c3_job_id = :c3_job_id"),
+               {"job_id": job_id, "c3_job_id": c3_job_id})
+
+
+def _forget(c3_job_id: str):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM warm_instances WHERE c3_job_id = :id"), {"id": c3_job_id})
+
+
+async def cancel(c3_job_id: str):
+    try:
+        await quota("c3")
+        async with C3_BREAKER.call(), track_upstream("c3", "cancel"):
+            await asyncio.to_thread(get_c3().jobs.cancel, c3_job_id)
+        WARM_POOL_INSTANCES.labels("cancelled").inc()
+    except Exception as e:
+        logger.warning(f"Failed to cancel warm instance {c3_job_id}: {e!r}")
+
+
+# --- Sizing ---
+
+def _demand(conn, pool: Pool, since: datetime) -> int:
+    """Jobs launched for this pool's gpu_type/image (and region) since `since`"""
+    return conn.execute(text(
+        "SELECT count(*) FROM jobs WHERE gpu_type = :gpu_type AND image = :image AND created_at >= :since "
+        "AND (CAST(:region AS varchar) IS NULL OR region = :region)"),
+        {"gpu_type": pool.gpu_type, "image": pool.image, "region": pool.region, "since": since}).scalar()
+
+
+def _lead_seconds(conn, pool: Pool, since: datetime) -> float:
+    """Average launch-to-ready time of this pool's recent instances"""
+    lead = conn.execute(text(
+        "SELECT avg(EXTRACT(EPOCH FROM ready_at - launched_at)) FROM warm_instances "
+        "WHERE pool = :pool AND ready_at IS NOT NULL AND launched_at >= :since"),
+        {"pool": pool.key, "since": since}).scalar()
+    return float(lead) if lead is not None else WARM_POOL_LEAD
+
+
+def target(conn, pool: Pool) -> int:
+    """Instances to keep: enough to cover the requests expected while a replacement warms up, plus one"""
+    since = datetime.utcnow() - timedelta(seconds=WARM_POOL_WINDOW)
+    demand = _demand(conn, pool, since)
+    if not demand:
+        return pool.min
+    expected = demand * _lead_seconds(conn, pool, since) / WARM_POOL_WINDOW
+    return min(pool.size, max(pool.min, math.ceil(expected) + 1))
+
+
+def _instances(conn) -> list:
+    return conn.execute(text("SELECT c3_job_id, pool, state, price_per_hour, launched_at FROM warm_instances "
+                             "WHERE state IN ('warming', 'ready') ORDER BY launched_at")).all()
+
+
+# --- Maintenance ---
+
+async def tick():
+    """Sync instance states with C3, then launch or cancel to reach each pool's target"""
+    conn = await asyncio.to_thread(engine.connect)
+
+    def lock(fn: str):
+        result = conn.execute(text(f"SELECT {fn}(:id)"), {"id": LOCK_ID}).scalar()
+        conn.commit()  # session-level lock, no transaction left open across C3 calls
+        return result
+
+    try:
+        if not await asyncio.to_thread(lock, "pg_try_advisory_lock"):
+            return  # another worker is on it
+        try:
+            await _maintain(conn)
+        finally:
+            await asyncio.to_thread(lock, "pg_advisory_unlock")
+    finally:
+        await asyncio.to_thread(conn.close)
+
+
+async def _maintain(conn):
+    def run(fn, *args):
+        def call():
+            try:
+                return fn(conn, *args)
+            finally:
+                conn.commit()
+        return asyncio.to_thread(call)
+
+    await quota("c3")
+    async with C3_BREAKER.call(), track_upstream("c3", "list"):
+        c3_jobs = {j.job_id: j for j in await asyncio.to_thread(get_c3().jobs.list)}
+
+    # Preempted or expired instances are gone; warming ones that came up are ready to hand out
+    keys = {p.key for p in POOLS}
+    for c3_job_id, key, state, _, _ in await run(_instances):
+        j = c3_jobs.get(c3_job_id)
+        if j is None or j.state in TERMINAL_STATES:
+            await run(_delete, c3_job_id)
+            WARM_POOL_INSTANCES.labels("lost").inc()
+        elif key not in keys:
+            await run(_delete, c3_job_id)  # pool no longer configured
+            await cancel(c3_job_id)
+        elif state == "warming" and j.state == "running" and j.hostname:
+            await run(_mark_ready, c3_job_id, j.region)
+            WARM_POOL_INSTANCES.labels("ready").inc()
+
+    instances = await run(_instances)
+    idle_usd = sum(row.price_per_hour for row in instances)
+    prices = await get_gpu_prices()
+    for pool in POOLS:
+        want = await run(target, pool)
+        mine = [row for row in instances if row.pool == pool.key]
+        have = len(mine)
+        if have > want:
+            # Cancel warming instances first (newest first), then the oldest ready ones
+            warming = [r for r in reversed(mine) if r.state == "warming"]
+            ready = [r for r in mine if r.state == "ready"]
+            for row in (warming + ready)[:have - want]:
+                await run(_delete, row.c3_job_id)
+                await cancel(row.c3_job_id)
+                idle_usd -= row.price_per_hour
+        while have < want:
+            if idle_usd + prices.get(pool.gpu_type, 0) > WARM_POOL_MAX_IDLE_USD:
+                logger.info(f"Warm pool {pool.key} below target ({have}/{want}): idle cost cap reached")
+                break
+            c3_job = await launch(pool)
+            await run(_insert, pool, c3_job)
+            idle_usd += c3_job.price_per_hour
+            have += 1
+
+    await run(_prune)
+
+
+async def launch(pool: Pool):
+    await quota("c3")
+    async with C3_BREAKER.call(), track_upstream("c3", "create"):
+        c3_job = await asyncio.to_thread(
+            get_c3().jobs.create, image=pool.image, gpu_type=pool.gpu_type, runtime=WARM_POOL_RUNTIME,
+            region=pool.region, command=pool.command, env=pool.env, ports=pool.ports, auth=pool.auth,
+            interruptible=True)
+    WARM_POOL_INSTANCES.labels("launched").inc()
+    return c3_job
+
+
+def _insert(conn, pool: Pool, c3_job):
+    ready = c3_job.state == "running" and c3_job.hostname
+    now = datetime.utcnow()
+    conn.execute(text("INSERT INTO warm_instances (c3_job_id, pool, region, state, price_per_hour, launched_at, "
+                      "ready_at) VALUES (:id, :pool, :region, :state, :price, :now, :ready_at)"),
+                 {"id": c3_job.job_id, "pool": pool.key, "region": c3_job.region, "state": "ready" if ready else "warming",
+                  "price": c3_job.price_per_hour, "now": now, "ready_at": now if ready else None})
+
+
+def _mark_ready(conn, c3_job_id: str, region: str | None):
+    conn.execute(text("UPDATE warm_instances SET state = 'ready', ready_at = :now, region = :region "
+                      "WHERE c3_job_id = :id AND state = 'warming'"),
+                 {"now": datetime.utcnow(), "region": region, "id": c3_job_id})
+
+
+def _delete(conn, c3_job_id: str):
+    conn.execute(text("DELETE FROM warm_instances WHERE c3_job_id = :id AND state <> 'claimed'"), {"id": c3_job_id})
+
+
+def _prune(conn):
+    """Claimed rows are kept one demand window for the lead-time estimate, then dropped"""
+    conn.execute(text("DELETE FROM warm_instances WHERE state = 'claimed' AND claimed_at < :before"),
+                 {"before": datetime.utcnow() - timedelta(seconds=WARM_POOL_WINDOW)})
+
+
+async def maintain():
+    """Background loop (started only when WARM_POOL is configured)"""
+    while True:
+        try:
+            await tick()
+        except Exception as e:
+            logger.error(f"Warm pool maintenance failed: {e!r}")
+        await asyncio.sleep(WARM_POOL_INTERVAL)
+
+
+def status() -> list[dict]:
+    """Per pool: target, warming/ready instances, claims over the demand window, idle cost"""
+    since = datetime.utcnow() - timedelta(seconds=WARM_POOL_WINDOW)
+    with engine.connect() as conn:
+        counts = {(pool, state): (n, usd) for pool, state, n, usd in conn.execute(text(
+            "SELECT pool, state, count(*), sum(price_per_hour) FROM warm_instances "
+            "WHERE state <> 'claimed' OR claimed_at >= :since GROUP BY pool, state"), {"since": since})}
+        return [{
+            "pool": pool.key, "size": pool.size, "min": pool.min, "target": target(conn, pool),
+            "warming": counts.get((pool.key, "warming"), (0, 0))[0],
+            "ready": counts.get((pool.key, "ready"), (0, 0))[0],
+            "claimed": counts.get((pool.key, "claimed"), (0, 0))[0],
+            "idle_usd_per_hour": round(sum(counts.get((pool.key, s), (0, 0))[1] or 0 for s in ("warming", "ready")), 4),
+            "lead_seconds": round(_lead_seconds(conn, pool, since), 1),
+        } for pool in POOLS]
+
+
+async def drain() -> int:
+    """Cancel every unclaimed instance"""
+    with engine.begin() as conn:
+        ids = [r[0] for r in conn.execute(text(
+            "DELETE FROM warm_instances WHERE state <> 'claimed' RETURNING c3_job_id"))]
+    for c3_job_id in ids:
+        await cancel(c3_job_id)
+    return len(ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm pool of pre-launched GPU instances")
+    parser.add_argument("cmd", choices=["status", "drain"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.cmd == "status":
+        print(json.dumps(status(), indent=2))
+    else:
+        print(f"Drained {asyncio.run(drain())} warm instances")
@@ -1,107 +1,254 @@
 import os
 import json
-import requests
-from datetime import datetime
-from flask import Flask, request, Response
+import time
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 
-app = Flask(__name__)
+import anyio
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from log_writer import LogWriter
+from response_cache import RESPONSE_CACHE, ResponseCache
 
 OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1")
 LOG_DIR = os.path.join(os.path.dirname(__file__), "logs")
 
-os.makedirs(LOG_DIR, exist_ok=True)
+# Upstream client pool (one per worker, shared by all requests)
+UPSTREAM_TIMEOUT = float(os.environ.get("UPSTREAM_TIMEOUT", "120"))  # per read, like requests' timeout
+UPSTREAM_HTTP2 = os.environ.get("UPSTREAM_HTTP2", "true").lower() == "true"
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get("UPSTREAM_MAX_CONNECTIONS", "1000"))
+UPSTREAM_MAX_KEEPALIVE = int(os.environ.get("UPSTREAM_MAX_KEEPALIVE", "200"))
+# Connections per client: httpcore matches queued requests to connections in O(requests x connections),
+# so the pool is split across several clients instead of one client with thousands of connections
+UPSTREAM_SHARD_SIZE = int(os.environ.get("UPSTREAM_SHARD_SIZE", "100"))
 
+# Requests proxied at once per worker; past that they queue up to PROXY_QUEUE_TIMEOUT, then get a 503.
+# Defaults to one per upstream connection (an HTTP/1.1 upstream such as vLLM serves one request per
+# connection); raise it for HTTP/2 upstreams, which multiplex many requests per connection
+PROXY_MAX_CONCURRENCY = int(os.environ.get("PROXY_MAX_CONCURRENCY", str(UPSTREAM_MAX_CONNECTIONS)))
+PROXY_QUEUE_TIMEOUT = float(os.environ.get("PROXY_QUEUE_TIMEOUT", "10"))
 
-def log_request_response(req_data, resp_data, status_code):
-    """Write request/response to datetime.json file."""
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")
-    log_entry = {
-        "request": req_data,
-        "response": resp_data
-    }
-    log_path = os.path.join(LOG_DIR, f"{timestamp}.json")
+# Hop-by-hop and encoding headers (httpx negotiates its own encoding and hands us decoded bodies)
+REQUEST_EXCLUDED = {"host", "content-length", "connection", "accept-encoding", "transfer-encoding"}
+RESPONSE_EXCLUDED = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+clients: list[httpx.AsyncClient] = []
+slots: asyncio.Semaphore = None
+_next_client = itertools.count()
+writer = LogWriter(LOG_DIR)
+cache = ResponseCache() if RESPONSE_CACHE else None
+
+
+def overloaded(detail):
+    return JSONResponse({"error": "Proxy overloaded", "detail": detail}, status_code=503, headers={"Retry-After": "1"})
+
+
+def log(req_data, resp_data):
+    """Queue the request/response record for the background writer"""
+    writer.write({"time": datetime.now(timezone.utc).isoformat(), "request": req_data, "response": resp_data})
+
+
+class SSELog:
+    """Builds the log body of an event stream as chunks pass through: parsed `data:` events and their text"""
+
+    def __init__(self):
+        self.buffer = b""
+        self.events = []
+        self.content = []
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        *lines, self.buffer = self.buffer.split(b"\n")
+        for line in lines:
+            self._line(line.rstrip(b"\r").decode("utf-8", errors="replace"))
+
+    def _line(self, line):
+        if not line.startswith("data:"):
+            return
+        data = line[5:].strip()
+        try:
+            event = json.loads(data)
+        except ValueError:
+            self.events.append(data)  # [DONE]
+            return
+        self.events.append(event)
+        for choice in event.get("choices") or []:
+            if choice.get("index", 0) == 0:
+                # chat: delta.content, legacy completions: text
+                self.content.append((choice.get("delta") or {}).get("content") or choice.get("text") or "")
+
+    def body(self):
+        if self.buffer:
+            self._line(self.buffer.decode("utf-8", errors="replace"))
+            self.buffer = b""
+        return {"events": self.events, "content": "".join(self.content)}
+
+
+def parse_body(raw, content_type):
+    if not raw:
+        return None
+    if content_type.startswith("application/json"):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            pass
+    return raw.decode("utf-8", errors="replace")
+
+
+async def acquire_slot():
     try:
-        with open(log_path, "w") as f:
-            json.dump(log_entry, f, indent=2, default=str)
-    except Exception as e:
-        print(f"Failed to write log: {e}")
+        await asyncio.wait_for(slots.acquire(), PROXY_QUEUE_TIMEOUT)
+        return True
+    except asyncio.TimeoutError:
+        return False
 
 
-@app.route("/v1/<path:path>", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
-def proxy(path):
+async def proxy(request):
+    path = request.path_params["path"]
     # Build upstream URL (OPENAI_BASE_URL already contains /v1)
     upstream_url = f"{OPENAI_BASE_URL.rstrip('/')}/{path}"
+    raw = await request.body()
 
     # Capture request data
     req_data = {
         "method": request.method,
         "url": upstream_url,
         "headers": dict(request.headers),
-        "body": None
+        "body": parse_body(raw, request.headers.get("content-type", ""))
     }
 
-    try:
-        req_data["body"] = request.get_json(silent=True) or request.data.decode("utf-8", errors="replace")
-    except:
-        req_data["body"] = None
-
     # Forward headers, including Authorization
-    headers = {}
-    for key, value in request.headers:
-        if key.lower() not in ("host", "content-length"):
-            headers[key] = value
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in REQUEST_EXCLUDED}
 
-    resp_data = {"status_code": None, "headers": None, "body": None, "error": None}
+    key = cache.key(request.method, path, upstream_url, req_data["body"], request.headers) if cache else None
+    if key:
+        hit = await cache.get(key, request.headers)
+        if hit:
+            content_type, content = hit
+            log(req_data, {"status_code": 200, "headers": {"content-type": content_type},
+                           "body": parse_body(content, content_type), "error": None, "cache": "hit"})
+            return Response(content, headers={"content-type": content_type, "x-cache": "HIT"})
 
-    try:
-        # Make upstream request
-        upstream_resp = requests.request(
-            method=request.method,
-            url=upstream_url,
-            headers=headers,
-            json=request.get_json(silent=True) if request.is_json else None,
-            data=request.data if not request.is_json else None,
-            params=request.args,
-            timeout=120
-        )
+    if not await acquire_slot():
+        return overloaded(f"{PROXY_MAX_CONCURRENCY} requests in flight")
 
+    resp_data = {"status_code": None, "headers": None, "body": None, "error": None}
+    start = time.monotonic()
+    streaming = False
+    try:
+        # Make upstream request (streamed, so SSE chunks can be passed on as they arrive)
+        client = clients[next(_next_client) % len(clients)]
+        upstream_req = client.build_request(request.method, upstream_url, headers=headers, content=raw,
+                                            params=request.query_params)
+        upstream_resp = await client.send(upstream_req, stream=True)
+        headers_at = time.monotonic()
         resp_data["status_code"] = upstream_resp.status_code
         resp_data["headers"] = dict(upstream_resp.headers)
+        resp_headers = {k: v for k, v in upstream_resp.headers.items() if k.lower() not in RESPONSE_EXCLUDED}
+
+        if upstream_resp.headers.get("content-type", "").startswith("text/event-stream"):
+            streaming = True  # the slot is released when the stream ends
+            return StreamingResponse(stream(upstream_resp, req_data, resp_data, start),
+                                     status_code=upstream_resp.status_code, headers=resp_headers)
 
         try:
-            resp_data["body"] = upstream_resp.json()
-        except:
-            resp_data["body"] = upstream_resp.text
+            content = await upstream_resp.aread()
+        finally:
+            await upstream_resp.aclose()
+        resp_data["timing"] = {"ttfb_ms": round((headers_at - start) * 1000, 1),
+                               "total_ms": round((time.monotonic() - start) * 1000, 1)}
+        resp_data["body"] = parse_body(content, upstream_resp.headers.get("content-type", "application/json"))
 
-        # Log request/response
-        log_request_response(req_data, resp_data, upstream_resp.status_code)
+        if key:
+            cache.put(key, upstream_resp.status_code, upstream_resp.headers, content)
+            resp_headers["x-cache"] = "MISS"
 
-        # Build response, excluding hop-by-hop headers
-        excluded = {"content-encoding", "transfer-encoding", "connection"}
-        resp_headers = {k: v for k, v in upstream_resp.headers.items() if k.lower() not in excluded}
+        # Log request/response
+        log(req_data, resp_data)
 
-        return Response(
-            upstream_resp.content,
-            status=upstream_resp.status_code,
-            headers=resp_headers
-        )
+        return Response(content, status_code=upstream_resp.status_code, headers=resp_headers)
 
+    except httpx.PoolTimeout:
+        # Every upstream connection stayed busy for PROXY_QUEUE_TIMEOUT: our overload, not an upstream failure
+        resp_data["error"] = "no free upstream connection"
+        log(req_data, resp_data)
+        return overloaded(f"all {UPSTREAM_MAX_CONNECTIONS} upstream connections busy")
     except Exception as e:
-        resp_data["error"] = str(e)
+        resp_data["error"] = str(e) or repr(e)
         # Best effort: still log even on error
-        log_request_response(req_data, resp_data, 502)
+        log(req_data, resp_data)
 
-        return Response(
-            json.dumps({"error": "Upstream request failed", "detail": str(e)}),
-            status=502,
-            content_type="application/json"
-        )
+        return JSONResponse({"error": "Upstream request failed", "detail": resp_data["error"]}, status_code=502)
+    finally:
+        if not streaming:
+            slots.release()
 
 
-@app.route("/health")
-def health():
-    return {"status": "ok"}
+async def stream(upstream_resp, req_data, resp_data, start):
+    """Pass SSE chunks through as they arrive; log once the stream closes (or the client goes away)"""
+    sse = SSELog()
+    ttfb = None
+    try:
+        async for chunk in upstream_resp.aiter_bytes():
+            if ttfb is None:
+                ttfb = time.monotonic() - start
+            sse.feed(chunk)
+            yield chunk
+    except Exception as e:
+        resp_data["error"] = str(e) or repr(e)
+    finally:
+        with anyio.CancelScope(shield=True):  # a client disconnect cancels us, the upstream must still be closed
+            await upstream_resp.aclose()
+        slots.release()
+        resp_data["body"] = sse.body()
+        resp_data["timing"] = {
+            "ttfb_ms": round(ttfb * 1000, 1) if ttfb is not None else None,
+            "total_ms": round((time.monotonic() - start) * 1000, 1),
+        }
+        log(req_data, resp_data)
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def stats(request):
+    return JSONResponse({"log": writer.snapshot(), "cache": cache.snapshot() if cache else {"enabled": False}})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global slots
+    shards = max(1, -(-UPSTREAM_MAX_CONNECTIONS // UPSTREAM_SHARD_SIZE))
+    limits = httpx.Limits(max_connections=-(-UPSTREAM_MAX_CONNECTIONS // shards),
+                          max_keepalive_connections=-(-UPSTREAM_MAX_KEEPALIVE // shards))
+    timeout = httpx.Timeout(UPSTREAM_TIMEOUT, connect=10, pool=PROXY_QUEUE_TIMEOUT)
+    clients[:] = [httpx.AsyncClient(http2=UPSTREAM_HTTP2, limits=limits, timeout=timeout) for _ in range(shards)]
+    slots = asyncio.Semaphore(PROXY_MAX_CONCURRENCY)
+    writer.start()
+    if cache:
+        await asyncio.to_thread(cache.start)
+    yield
+    await asyncio.gather(*(c.aclose() for c in clients))
+    await asyncio.to_thread(writer.close)
+
+
+app = Starlette(
+    routes=[
+        Route("/v1/{path:path}", proxy, methods=["GET", "POST", "PUT", "DELETE", "PATCH"]),
+        Route("/health", health),
+        Route("/stats", stats),
+    ],
+    lifespan=lifespan,
+)
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    import uvicorn
+    # Same settings as the Docker image; WEB_CONCURRENCY sets the worker count
+    uvicorn.run("app:app", host="0.0.0.0", port=5000, timeout_keep_alive=75, access_log=False)
@@ -0,0 +1,189 @@
+"""
+Background request log writer
+
+Records are queued by the request handlers and written by one thread per worker into
+append-only JSONL segments, a batch per write. A segment is closed once it reaches
+LOG_SEGMENT_BYTES or LOG_SEGMENT_SECONDS and compressed (zstd when `zstandard` is installed,
+gzip otherwise) by a second thread, so a slow disk only ever fills the queue. When the queue
+is full new records are dropped and counted - requests never wait on the log.
+"""
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.environ.get("LOG_BATCH_SIZE", "500"))
+LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", "1"))  # seconds a record may wait for its batch
+LOG_SEGMENT_BYTES = int(os.environ.get("LOG_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+LOG_SEGMENT_SECONDS = float(os.environ.get("LOG_SEGMENT_SECONDS", "3600"))
+LOG_COMPRESSION = os.environ.get("LOG_COMPRESSION", "zstd" if zstandard else "gzip")  # zstd, gzip or none
+
+SUFFIXES = {"zstd": ".zst", "gzip": ".gz", "none": ""}
+_STOP = object()
+
+
+def compress(path, method):
+    """Compress a closed segment next to itself, then remove the original"""
+    if method == "none":
+        return
+    target = path + SUFFIXES[method]
+    with open(path, "rb") as src:
+        if method == "zstd":
+            with open(target + ".tmp", "wb") as dst:
+                zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+        else:
+            with gzip.open(target + ".tmp", "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(target + ".tmp", target)
+    os.remove(path)
+
+
+def _segment_pid(name):
+    try:
+        return int(name[:-len(".jsonl")].rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _alive(pid):
+    """Whether another process with this pid is running (this one has no open segment yet)"""
+    if pid is None or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class LogWriter:
+    def __init__(self, directory, compression=LOG_COMPRESSION):
+        if compression not in SUFFIXES:
+            raise ValueError(f"LOG_COMPRESSION must be one of {', '.join(SUFFIXES)}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("LOG_COMPRESSION=zstd needs the zstandard package")
+        self.directory = directory
+        self.compression = compression
+        self.queue = queue.Queue(LOG_QUEUE_SIZE)
+        self.stats = {"written": 0, "dropped": 0, "errors": 0, "bytes": 0, "segments": 0}
+        self._file = None
+        self._path = None
+        self._opened = 0.0
+        self._thread = None
+        self._compressor = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._compressor = ThreadPoolExecutor(1, thread_name_prefix="log-compress")
+        # Segments left open by a previous run (crash, kill -9) are finished first. Sibling
+        # workers share the directory, so segments of a pid that is still alive are theirs.
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".jsonl") and not _alive(_segment_pid(name)):
+                self._compress(os.path.join(self.directory, name))
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        """Queue a record (never blocks; counted as dropped when the queue is full)"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            if self.stats["dropped"] % 1000 == 1:
+                print(f"Log queue full, {self.stats['dropped']} records dropped so far")
+
+    def close(self, timeout=10):
+        """Write what is queued, close and compress the last segment"""
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+        self._compressor.shutdown(wait=True)
+
+    def snapshot(self):
+        return {**self.stats, "queued": self.queue.qsize(), "compression": self.compression,
+                "segment": os.path.basename(self._path) if self._path else None}
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    record = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            if batch:
+                self._write(batch)
+            if self._file and (stopping or self._file.tell() >= LOG_SEGMENT_BYTES
+                               or time.monotonic() - self._opened >= LOG_SEGMENT_SECONDS):
+                self._rotate()
+
+    def _write(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, default=str, ensure_ascii=False))
+            except (TypeError, ValueError) as e:
+                self.stats["errors"] += 1
+                print(f"Failed to serialize log record: {e}")
+        data = ("\n".join(lines) + "\n").encode()
+        try:
+            if self._file is None:
+                self._open()
+            self._file.write(data)
+            self._file.flush()
+        except OSError as e:
+            self.stats["errors"] += len(lines)
+            print(f"Failed to write log: {e}")
+            return
+        self.stats["written"] += len(lines)
+        self.stats["bytes"] += len(data)
+
+    def _open(self):
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S-%f")
+        # pid keeps segments of several workers apart
+        self._path = os.path.join(self.directory, f"{timestamp}-{os.getpid()}.jsonl")
+        self._file = open(self._path, "ab")
+        self._opened = time.monotonic()
+        self.stats["segments"] += 1
+
+    def _rotate(self):
+        try:
+            self._file.close()
+        except OSError as e:
+            print(f"Failed to close log segment: {e}")
+        self._compress(self._path)
+        self._file = None
+        self._path = None
+
+    def _compress(self, path):
+        def run():
+            try:
+                compress(path, self.compression)
+            except OSError as e:
+                self.stats["errors"] += 1
+                print(f"Failed to compress {path}: {e}")
+        self._compressor.submit(run)
@@ -0,0 +1,190 @@
+"""
+Response cache for deterministic calls (opt-in, RESPONSE_CACHE=true)
+
+Only requests whose answer can't change between calls are cached:
+- `/v1/embeddings`
+- `/v1/chat/completions` and `/v1/completions` with an explicit `"temperature": 0`, one
+  choice (`n` unset or 1) and no streaming
+
+Entries are keyed by a hash of the method, upstream URL, model, canonical (key-sorted) JSON
+body and the caller's Authorization header, so different credentials never share an entry.
+Only 200 JSON responses are stored. `Cache-Control: no-store` on the request or the response
+skips the cache; `no-cache` on the request skips the lookup but still stores the fresh answer.
+
+Hits are served from an in-memory LRU bounded by RESPONSE_CACHE_MEMORY_BYTES, then from
+RESPONSE_CACHE_DIR (shared by all workers, oldest files removed past RESPONSE_CACHE_DISK_BYTES).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RESPONSE_CACHE = os.environ.get("RESPONSE_CACHE", "false").lower() == "true"
+RESPONSE_CACHE_DIR = os.environ.get("RESPONSE_CACHE_DIR", os.path.join(os.path.dirname(__file__), "cache"))
+RESPONSE_CACHE_MEMORY_BYTES = int(os.environ.get("RESPONSE_CACHE_MEMORY_BYTES", str(256 * 1024 * 1024)))
+RESPONSE_CACHE_DISK_BYTES = int(os.environ.get("RESPONSE_CACHE_DISK_BYTES", str(4 * 1024 * 1024 * 1024)))
+
+DETERMINISTIC_PATHS = {"embeddings", "chat/completions", "completions"}
+ENTRY_OVERHEAD = 200  # rough bytes of key, headers and bookkeeping per memory entry
+
+
+def directives(headers) -> set[str]:
+    value = headers.get("cache-control", "")
+    return {d.strip().split("=")[0].lower() for d in value.split(",") if d.strip()}
+
+
+def deterministic(path, body) -> bool:
+    if not isinstance(body, dict) or path not in DETERMINISTIC_PATHS:
+        return False
+    if path == "embeddings":
+        return True
+    # No temperature means the provider default (1 for OpenAI), which samples
+    return body.get("temperature") == 0 and not body.get("stream") and body.get("n", 1) == 1
+
+
+class ResponseCache:
+    def __init__(self, directory=RESPONSE_CACHE_DIR, memory_bytes=RESPONSE_CACHE_MEMORY_BYTES,
+                 disk_bytes=RESPONSE_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.entries: OrderedDict[str, tuple[str, bytes]] = OrderedDict()  # key -> (content-type, content)
+        self.used = 0
+        self.disk_used = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "stored": 0,
+                      "evicted": 0, "disk_pruned": 0, "errors": 0}
+        # Disk reads and writes run in the default executor; this serializes the writes, the
+        # disk_used bookkeeping and pruning, and the error count shared with reads
+        self._disk_lock = threading.Lock()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.disk_used = sum(size for _, size, _ in self._files())
+
+    def key(self, method, path, url, body, headers) -> str | None:
+        """Cache key of a request (path relative to /v1/), None when it must not be cached"""
+        if method != "POST" or "no-store" in directives(headers) or not deterministic(path, body):
+            self.stats["bypassed"] += 1
+            return None
+        canonical = json.dumps({"method": method, "url": url, "model": body.get("model"), "body": body,
+                                "authorization": headers.get("authorization")},
+                               sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    async def get(self, key, headers) -> tuple[str, bytes] | None:
+        """(content-type, content) of a cached response"""
+        if "no-cache" in directives(headers):
+            self.stats["misses"] += 1
+            return None
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return entry
+        entry = await asyncio.to_thread(self._read, key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["disk_hits"] += 1
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, status_code, headers, content):
+        """Store an upstream response if it may be reused; the disk write happens in the background"""
+        if status_code != 200 or "no-store" in directives(headers) or \
+                not headers.get("content-type", "").startswith("application/json"):
+            return
+        entry = (headers["content-type"], content)
+        self._remember(key, entry)
+        self.stats["stored"] += 1
+        asyncio.get_running_loop().run_in_executor(None, self._write, key, entry)
+
+    def snapshot(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {"enabled": True, **self.stats, "hit_rate": round(hits / lookups, 4) if lookups else None,
+                "entries": len(self.entries), "memory_bytes": self.used, "disk_bytes": self.disk_used}
+
+    def _remember(self, key, entry):
+        size = len(entry[1]) + ENTRY_OVERHEAD
+        if size > self.memory_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.used -= len(old[1]) + ENTRY_OVERHEAD
+        self.entries[key] = entry
+        self.used += size
+        while self.used > self.memory_bytes:
+            _, (_, content) = self.entries.popitem(last=False)
+            self.used -= len(content) + ENTRY_OVERHEAD
+            self.stats["evicted"] += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                content_type = f.readline().decode().strip()
+                content = f.read()
+            os.utime(path)  # recently used files are pruned last
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            with self._disk_lock:
+                self.stats["errors"] += 1
+            print(f"Failed to read cache entry {key}: {e}")
+            return None
+        return content_type, content
+
+    def _write(self, key, entry):
+        with self._disk_lock:
+            self._write_locked(key, entry)
+
+    def _write_locked(self, key, entry):
+        # File layout: content-type line, then the response body as received
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(entry[0].encode() + b"\n")
+                f.write(entry[1])
+            os.replace(tmp, path)
+        except OSError as e:
+            self.stats["errors"] += 1
+            print(f"Failed to write cache entry {key}: {e}")
+            return
+        self.disk_used += len(entry[0]) + 1 + len(entry[1])
+        if self.disk_used > self.disk_bytes:
+            self._prune()
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue  # removed by another worker
+                yield os.path.join(root, name), st.st_size, st.st_mtime
+
+    def _prune(self):
+        """Remove the least recently used files down to 90% of the disk budget (also counts other workers' files)"""
+        files = sorted(self._files(), key=lambda f: f[2])
+        self.disk_used = sum(size for _, size, _ in files)
+        cutoff = time.time() - 60  # leave files other workers are still writing
+        for path, size, mtime in files:
+            if self.disk_used <= self.disk_bytes * 0.9:
+                break
+            if path.endswith(".tmp") and mtime > cutoff:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.disk_used -= size
+            self.stats["disk_pruned"] += 1
@@ -0,0 +1,43 @@
+"""Proxy error mapping: upstream failures are 502s, running out of upstream connections is a 503"""
+import asyncio
+import httpx
+import pytest
+import app
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    logged = []
+    monkeypatch.setattr(app, "log", lambda req, resp: logged.append(resp))
+
+    def serve(handler):
+        async def run():
+            monkeypatch.setattr(app, "slots", asyncio.Semaphore(10))
+            monkeypatch.setattr(app, "clients", [httpx.AsyncClient(transport=httpx.MockTransport(handler))])
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://proxy") as c:
+                return await c.post("/v1/chat/completions", json={"model": "m", "messages": []})
+        return asyncio.run(run()), logged
+    return serve
+
+
+def test_upstream_response_passed_through(upstream):
+    r, logged = upstream(lambda request: httpx.Response(200, json={"ok": True}))
+    assert r.status_code == 200 and r.json() == {"ok": True}
+    assert logged[0]["status_code"] == 200
+
+
+def test_upstream_failure_is_502(upstream):
+    def refuse(request):
+        raise httpx.ConnectError("connection refused")
+    r, logged = upstream(refuse)
+    assert r.status_code == 502
+    assert logged[0]["error"] == "connection refused"
+
+
+def test_no_free_upstream_connection_is_503(upstream):
+    def busy(request):
+        raise httpx.PoolTimeout("no connection available")
+    r, logged = upstream(busy)
+    assert r.status_code == 503 and r.headers["retry-after"] == "1"
+    assert r.json()["error"] == "Proxy overloaded"
+    assert logged[0]["error"] == "no free upstream connection"
@@ -0,0 +1,60 @@
+"""Segment rotation, compression and startup recovery of LogWriter"""
+import gzip
+import json
+import os
+import subprocess
+import sys
+import log_writer
+from log_writer import LogWriter
+
+
+def records(path):
+    with gzip.open(path, "rt") as f:
+        return [json.loads(line) for line in f]
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_rotates_and_compresses_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_writer, "LOG_SEGMENT_BYTES", 100)
+    monkeypatch.setattr(log_writer, "LOG_BATCH_SIZE", 1)
+    writer = LogWriter(str(tmp_path), compression="gzip")
+    writer.start()
+    for i in range(5):
+        writer.write({"i": i, "pad": "x" * 100})
+    writer.close()
+
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == 5 and all(n.endswith(f"-{os.getpid()}.jsonl.gz") for n in names)
+    assert [r["i"] for n in names for r in records(tmp_path / n)] == list(range(5))
+    assert writer.stats["written"] == 5 and writer.stats["segments"] == 5
+
+
+def test_close_compresses_the_open_segment(tmp_path):
+    writer = LogWriter(str(tmp_path), compression="gzip")
+    writer.start()
+    writer.write({"i": 1})
+    writer.write({"i": 2})
+    writer.close()
+
+    [name] = os.listdir(tmp_path)
+    assert [r["i"] for r in records(tmp_path / name)] == [1, 2]
+
+
+def test_start_recovers_only_segments_of_dead_workers(tmp_path):
+    dead = tmp_path / f"2025-01-01_00-00-00-000000-{dead_pid()}.jsonl"
+    own = tmp_path / f"2025-01-01_00-00-00-000001-{os.getpid()}.jsonl"
+    live = tmp_path / f"2025-01-01_00-00-00-000002-{os.getppid()}.jsonl"
+    for path in (dead, own, live):
+        path.write_text('{"i": 1}\n')
+
+    writer = LogWriter(str(tmp_path), compression="gzip")
+    writer.start()
+    writer.close()
+
+    assert sorted(os.listdir(tmp_path)) == sorted([dead.name + ".gz", own.name + ".gz", live.name])
+    assert records(str(dead) + ".gz") == [{"i": 1}]
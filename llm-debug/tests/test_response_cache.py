@@ -0,0 +1,144 @@
+"""What ResponseCache considers cacheable, how it keys requests, and its memory/disk tiers"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from response_cache import ENTRY_OVERHEAD, ResponseCache, deterministic
+
+URL = "https://api.openai.com/v1/chat/completions"
+AUTH = {"authorization": "Bearer a"}
+JSON = {"content-type": "application/json"}
+
+
+def chat(**fields):
+    return {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "temperature": 0, **fields}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = ResponseCache(directory=str(tmp_path), memory_bytes=10_000, disk_bytes=10_000)
+    c.start()
+    return c
+
+
+@pytest.mark.parametrize("path,body,expected", [
+    ("embeddings", {"model": "e", "input": "x"}, True),
+    ("chat/completions", chat(), True),
+    ("completions", chat(n=1), True),
+    ("chat/completions", chat(temperature=0.0), True),
+    ("chat/completions", {k: v for k, v in chat().items() if k != "temperature"}, False),
+    ("chat/completions", chat(temperature=0.2), False),
+    ("chat/completions", chat(stream=True), False),
+    ("chat/completions", chat(n=2), False),
+    ("models", chat(), False),
+    ("chat/completions", None, False),
+    ("chat/completions", [chat()], False),
+])
+def test_deterministic(path, body, expected):
+    assert deterministic(path, body) is expected
+
+
+def test_key_ignores_field_order(cache):
+    body = chat()
+    reordered = dict(reversed(list(body.items())))
+    assert cache.key("POST", "chat/completions", URL, body, AUTH) == \
+        cache.key("POST", "chat/completions", URL, reordered, AUTH)
+
+
+@pytest.mark.parametrize("change", [
+    {"url": "https://other.example/v1/chat/completions"},
+    {"headers": {"authorization": "Bearer b"}},
+    {"headers": {}},
+    {"body": chat(model="gpt-4o-mini")},
+    {"body": chat(messages=[{"role": "user", "content": "hello"}])},
+])
+def test_key_separates_requests(cache, change):
+    base = {"url": URL, "headers": AUTH, "body": chat()}
+    other = {**base, **change}
+    assert cache.key("POST", "chat/completions", base["url"], base["body"], base["headers"]) != \
+        cache.key("POST", "chat/completions", other["url"], other["body"], other["headers"])
+
+
+@pytest.mark.parametrize("method,path,body,headers", [
+    ("GET", "chat/completions", chat(), AUTH),
+    ("POST", "chat/completions", chat(temperature=1), AUTH),
+    ("POST", "chat/completions", chat(), {**AUTH, "cache-control": "max-age=0, No-Store"}),
+])
+def test_key_none_when_not_cacheable(cache, method, path, body, headers):
+    assert cache.key(method, path, URL, body, headers) is None
+    assert cache.stats["bypassed"] == 1
+
+
+def test_put_then_get_from_memory_and_disk(cache, tmp_path):
+    key = cache.key("POST", "chat/completions", URL, chat(), AUTH)
+    content = json.dumps({"choices": []}).encode()
+
+    async def store():
+        cache.put(key, 200, JSON, content)
+        return await cache.get(key, {})
+
+    from_memory = asyncio.run(store())  # asyncio.run waits for the executor's disk write
+    fresh = ResponseCache(directory=str(tmp_path))
+    from_disk = asyncio.run(fresh.get(key, {}))
+    assert from_memory == from_disk == ("application/json", content)
+    assert cache.stats["memory_hits"] == 1 and fresh.stats["disk_hits"] == 1
+
+
+@pytest.mark.parametrize("status,headers", [
+    (500, JSON),
+    (200, {"content-type": "text/event-stream"}),
+    (200, {**JSON, "cache-control": "no-store"}),
+])
+def test_put_skips_unreusable_responses(cache, status, headers):
+    async def run():
+        cache.put("k", status, headers, b"{}")
+        return await cache.get("k", {})
+
+    assert asyncio.run(run()) is None
+    assert cache.stats["stored"] == 0
+
+
+def test_no_cache_request_skips_lookup(cache):
+    async def run():
+        cache.put("k", 200, JSON, b"{}")
+        return await cache.get("k", {"cache-control": "no-cache"})
+
+    assert asyncio.run(run()) is None
+    assert cache.stats["misses"] == 1
+
+
+def test_memory_lru_evicts_least_recently_used(tmp_path):
+    size = 100
+    c = ResponseCache(directory=str(tmp_path), memory_bytes=2 * (size + ENTRY_OVERHEAD))
+    c._remember("a", ("application/json", b"x" * size))
+    c._remember("b", ("application/json", b"x" * size))
+    c.entries.move_to_end("a")
+    c._remember("c", ("application/json", b"x" * size))
+    assert list(c.entries) == ["a", "c"]
+    assert c.used == 2 * (size + ENTRY_OVERHEAD) and c.stats["evicted"] == 1
+
+
+def test_disk_pruned_oldest_first(tmp_path):
+    c = ResponseCache(directory=str(tmp_path), disk_bytes=10_000)
+    c.start()
+    keys = [f"{i:02d}" * 32 for i in range(3)]
+    for age, key in zip((30, 20, 10), keys):
+        c._write(key, ("application/json", b"x" * 300))
+        os.utime(c._path(key), (time.time() - age,) * 2)
+    c.disk_bytes = 700
+    c._prune()
+    assert [c._read(key) is not None for key in keys] == [False, False, True]
+    assert c.disk_used <= 700 * 0.9 and c.stats["disk_pruned"] == 2
+
+
+def test_concurrent_disk_writes_keep_bookkeeping(tmp_path):
+    c = ResponseCache(directory=str(tmp_path), disk_bytes=5_000)
+    c.start()
+    keys = [f"{i:04d}" * 16 for i in range(200)]
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(lambda key: c._write(key, ("application/json", b"x" * 200)), keys))
+    on_disk = sum(size for _, size, _ in c._files())
+    assert c.disk_used == on_disk <= 5_000
+    assert c.stats["disk_pruned"] == len(keys) - on_disk // 217 and c.stats["errors"] == 0
@@ -87,6 +87,11 @@ railgun_encryption_key = config.require_secret("railgun_encryption_key")
 railgun_rpc_url = config.require_secret("railgun_rpc_url")
 railgun_network_name = config.require("railgun_network_name")
 billing_enabled = config.get("billing_enabled") or "true"
+backend_replicas = config.get_int("backend_replicas") or 1
+backend_workers = config.get("backend_workers") or "1"
+# Several processes must share upstream caches, otherwise each one polls CoinGecko/C3/railgun on its own
+backend_cache = config.get("backend_cache_backend") or (
+    "postgres" if backend_replicas * int(backend_workers) > 1 else "memory")
 
 # Generate backend API key using pulumi_random
 backend_api_key_random = RandomString(
@@ -216,6 +221,9 @@ backend_deployment, backend_service, backend_port = backend.create_backend_deplo
     railgun_url=railgun_url,
     backend_api_key=backend_api_key,
     billing_enabled=billing_enabled,
+    replicas=backend_replicas,
+    web_concurrency=backend_workers,
+    cache_backend=backend_cache,
 )
 
 # Create ingress
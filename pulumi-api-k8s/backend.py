@@ -28,6 +28,9 @@ def create_backend_deployment(
     billing_enabled: str = "true",
     prefix: str = "/api",
     cpu_request: str = "500m",
+    replicas: int = 1,
+    web_concurrency: str = "1",
+    cache_backend: str = "memory",
 ):
     """Create a Kubernetes deployment for the Tamashii Backend service."""
 
@@ -92,6 +95,8 @@ def create_backend_deployment(
             "RAILGUN_URL": railgun_url,
             "PREFIX": prefix,
             "BILLING_ENABLED": billing_enabled,
+            "WEB_CONCURRENCY": web_concurrency,  # uvicorn workers per pod
+            "CACHE_BACKEND": cache_backend,  # "postgres" to share caches across workers/pods
         },
         opts=pulumi.ResourceOptions(provider=k8s_provider)
     )
@@ -104,7 +109,7 @@ def create_backend_deployment(
             "namespace": namespace_name,
         },
         spec={
-            "replicas": 1,
+            "replicas": replicas,
             "selector": {"matchLabels": {"app": f"{slug}"}},
             "template": {
                 "metadata": {"labels": {"app": f"{slug}"}},
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for CPU-bound backend hot paths.
+
+    python bench.py run --out baselines/main.json
+    python bench.py run --compare baselines/main.json        # exit 1 on regression
+    python bench.py compare baselines/main.json new.json --threshold 0.15
+
+Upstreams are not touched: the C3 catalog comes from the load-test fake SDK
+(with zero latency) and the in-memory price caches are pre-filled.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.join(HERE, "..", "..", "backend")
+FAKE_C3 = os.path.join(HERE, "..", "loadtest", "fake_c3")
+
+# Bench-only environment: fixed P-256 key pair, no network, no DB connection
+os.environ.update({
+    "FAKE_C3_LATENCY_MS": "0", "FAKE_C3_JITTER_MS": "0", "FAKE_C3_ERROR_RATE": "0",
+    "JWT_PRIVATE_KEY": "1111111111111111111111111111111111111111111111111111111111111111",
+    "JWT_PUBLIC_KEY": "040217e617f0b6443928278f96999e69a23a4f2c152bdf6d6cdf66e5b80282d4ed"
+                      "194a7debcb97712d2dda3ca85aa8765a56f45fc758599652f2897c65306e5794",
+})
+for var, default in (("DB_HOST", "localhost"), ("DB_PORT", "5432"), ("DB_USER", "bench"), ("DB_PASSWORD", "bench"),
+                     ("DB_NAME", "bench"), ("C3_API_KEY", "bench")):
+    os.environ.setdefault(var, default)
+os.environ["CACHE_BACKEND"] = "memory"
+sys.path[:0] = [FAKE_C3, BACKEND]
+
+import cache  # noqa: E402
+import dependencies  # noqa: E402
+import notify  # noqa: E402
+import pricing  # noqa: E402
+import railgun  # noqa: E402
+from models import Job  # noqa: E402
+from routes.jobs import job_summary  # noqa: E402
+
+ADDRESS = "0zk1qyk9nn28x0u3yytkvmfaqadnrgc7gj2ex2hwj3w2qwhfvxgxqhpqy9xsmsn"
+
+
+def run_coro(coro):
+    """Drive a coroutine that never actually suspends (no event loop overhead)"""
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("coroutine suspended")
+
+
+def make_transactions(n: int) -> list[dict]:
+    rng = random.Random(42)
+    return [{
+        "txid": f"0x{rng.getrandbits(256):064x}",
+        "blockNumber": 40_000_000 + i,
+        "timestamp": 1_733_000_000 + i,
+        "category": "TransferReceiveERC20",
+        "received": [{"token": "0xbb4cdb9cbd36b01bd1cbaebf2de08d9173bc095c",
+                      "amount": str(rng.randint(1, 50) * 10**17), "from": ADDRESS, "memo": None}
+                     for _ in range(rng.randint(1, 3))],
+    } for i in range(n)]
+
+
+def make_jobs(n: int) -> list[Job]:
+    now = datetime.utcnow()
+    return [Job(id=f"{i:08d}-0000-4000-8000-000000000000", user_address=ADDRESS, c3_job_id=f"c3-{i}",
+                gpu_type="l4", image="ghcr.io/compute3ai/images/c3-vllm", duration_seconds=600,
+                cost_usd=0.075, cost_bnb=0.0001, bnb_price_usd=650.0, created_at=now - timedelta(minutes=i),
+                billed=True) for i in range(n)]
+
+
+def benchmarks() -> dict:
+    token = dependencies.create_jwt(ADDRESS)
+    header = f"Bearer {token}"
+    run_coro(cache.backend().set("bnb_price", 650.0, float("inf")))
+    run_coro(cache.backend().set("gpu_prices", pricing.fetch_gpu_prices(), float("inf")))
+    txs = make_transactions(10_000)
+    jobs = make_jobs(50)
+    meta = {"job_id": "7f1c2d9e-0000-4000-8000-000000000000", "c3_job_id": "c3-123", "cost_bnb": 0.0123,
+            "address": ADDRESS[:20], "gpu_type": "l4"}
+
+    return {
+        "jwt.create": lambda: dependencies.create_jwt(ADDRESS),
+        "jwt.decode": lambda: dependencies.decode_jwt(token),
+        "jwt.require_auth": lambda: run_coro(dependencies.require_auth(header)),
+        "pricing.calc_cost": lambda: run_coro(pricing.calc_cost("l4", 3600)),
+        "railgun.sum_deposits[10k]": lambda: railgun.sum_deposits(txs),
+        "jobs.list_rows[50]": lambda: [job_summary(j) for j in jobs],
+        "notify.build_payload": lambda: notify.build_payload(notify.Category.JOBS, notify.Severity.INFO,
+                                                             "Job launched: l4 for 600s", meta),
+    }
+
+
+def measure(fn, repeat: int, min_time: float) -> dict:
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    loops = max(1, int(loops * min_time / 0.2))
+    runs = [t / loops * 1e9 for t in timer.repeat(repeat=repeat, number=loops)]
+    return {"ns_per_op": min(runs), "ns_per_op_median": statistics.median(runs), "loops": loops, "repeat": repeat}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    results = {}
+    for name, fn in benchmarks().items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(fn, args.repeat, args.min_time)
+        print(f"{name:<28} {results[name]['ns_per_op'] / 1000:>10.2f} us/op", file=sys.stderr)
+    return {
+        "meta": {"created": datetime.utcnow().isoformat(), "commit": git_commit(), "python": platform.python_version(),
+                 "machine": platform.machine(), "platform": platform.platform()},
+        "results": results,
+    }
+
+
+def compare(base: dict, new: dict, threshold: float) -> bool:
+    """Print per-benchmark change, returns True if any benchmark regressed beyond threshold"""
+    regressed = False
+    print(f"{'benchmark':<28} {'base us':>10} {'new us':>10} {'change':>8}")
+    for name, n in new["results"].items():
+        b = base["results"].get(name)
+        if b is None:
+            print(f"{name:<28} {'-':>10} {n['ns_per_op'] / 1000:>10.2f}      new")
+            continue
+        change = n["ns_per_op"] / b["ns_per_op"] - 1
+        flag = ""
+        if change > threshold:
+            flag, regressed = "  REGRESSION", True
+        print(f"{name:<28} {b['ns_per_op'] / 1000:>10.2f} {n['ns_per_op'] / 1000:>10.2f} {change:>+7.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="run benchmarks")
+    r.add_argument("--out", help="save results as a JSON baseline")
+    r.add_argument("--compare", help="baseline to compare against")
+    r.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown (0.10 = 10%%)")
+    r.add_argument("--repeat", type=int, default=5)
+    r.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    r.add_argument("--filter", help="only run benchmarks whose name contains this")
+
+    c = sub.add_parser("compare", help="compare two saved results")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10)
+
+    args = parser.parse_args()
+    if args.cmd == "compare":
+        with open(args.base) as fb, open(args.new) as fn:
+            sys.exit(1 if compare(json.load(fb), json.load(fn), args.threshold) else 0)
+
+    report = run(args)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            sys.exit(1 if compare(json.load(f), report, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
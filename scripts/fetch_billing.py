@@ -1,7 +1,30 @@
 #!/usr/bin/env python3
-"""Fetch billing data - jobs and transactions"""
+"""
+Reconcile billing for every depositing address - on-chain deposits vs. backend balance and jobs
+
+    python fetch_billing.py --out billing.csv
+    python fetch_billing.py --out billing.csv --resume          # skip addresses already reconciled
+    python fetch_billing.py --out billing.parquet --concurrency 64
+
+Addresses come from a single /railgun/transactions fetch (deposits grouped by sender).
+Balances and jobs are then fetched for all of them concurrently over one pooled client.
+Rows are appended to the CSV as they complete, so an interrupted run can be resumed;
+for .parquet output the CSV checkpoint is converted at the end (requires pyarrow).
+
+Flags:
+  deposits_mismatch    on-chain deposits differ from the backend's deposits_bnb
+  spend_exceeds_jobs   backend spent_bnb is more than the cost of all listed jobs
+  negative_balance     balance_bnb < 0
+"""
+import argparse
+import asyncio
+import csv
 import os
-import requests
+import random
+import sys
+import time
+from collections import defaultdict
+import httpx
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,83 +35,168 @@ BASE_URL = os.getenv("BASE_URL", "https://tamashii.compute3.ai")
 if not API_KEY:
     raise RuntimeError("BACKEND_API_KEY not set in .env")
 
-
-def main():
-    print(f"Fetching billing data from {BASE_URL}\n")
-
-    # 1. Get transactions
-    print("=== RAILGUN TRANSACTIONS ===")
-    r = requests.get(
-        f"{BASE_URL}/railgun/transactions",
-        headers={"X-BACKEND-API-KEY": API_KEY}
-    )
-    r.raise_for_status()
-    txs = r.json().get("transactions", [])
-
-    if not txs:
-        print("No transactions found")
-        return
-
-    total_deposits = 0
+JOBS_PAGE = 50  # /api/jobs returns at most this many, the job total is a lower bound beyond it
+RETRIES = 3
+
+COLUMNS = ["address", "deposit_txs", "deposits_bnb", "api_deposits_bnb", "spent_bnb", "balance_bnb",
+           "balance_usd", "jobs", "jobs_cost_bnb", "jobs_truncated", "flags", "error"]
+
+
+async def fetch(client: httpx.AsyncClient, method: str, path: str, **kw) -> dict | list:
+    """Request with retries on network errors, 429 and 5xx"""
+    for attempt in range(RETRIES + 1):
+        try:
+            r = await client.request(method, path, **kw)
+            if r.status_code != 429 and r.status_code < 500:
+                r.raise_for_status()
+                return r.json()
+            if attempt == RETRIES:
+                r.raise_for_status()
+            retry_after = r.headers.get("retry-after", "")
+            delay = float(retry_after) if retry_after.isdigit() else 0.5 * 2 ** attempt
+        except httpx.TransportError:
+            if attempt == RETRIES:
+                raise
+            delay = 0.5 * 2 ** attempt
+        await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+
+async def discover(client: httpx.AsyncClient) -> dict[str, tuple[int, int]]:
+    """Sender address -> (deposit tx count, total wei) from the full transaction history"""
+    txs = (await fetch(client, "GET", "/railgun/transactions")).get("transactions", [])
+    deposits = defaultdict(lambda: [0, 0])
     for tx in txs:
-        print(f"\nTx: {tx.get('txid', 'N/A')[:16]}...")
         for recv in tx.get("received", []):
-            amount_wei = int(recv.get("amount", 0))
-            amount_bnb = amount_wei / 1e18
-            total_deposits += amount_bnb
-            addr = recv.get("from", "")[:40]
-            print(f"  From: {addr}...")
-            print(f"  Amount: {amount_bnb:.6f} BNB")
-
-    print(f"\nTotal deposits: {total_deposits:.6f} BNB")
-
-    # Get address from first tx
-    received = txs[0].get("received", [])
-    if not received:
-        return
-    address = received[0].get("from")
-
-    # 2. Get admin JWT
-    r = requests.post(
-        f"{BASE_URL}/api/auth/admin",
-        headers={"X-BACKEND-API-KEY": API_KEY},
-        json={"address": address}
-    )
-    r.raise_for_status()
-    token = r.json()["token"]
-    auth_headers = {"Authorization": f"Bearer {token}"}
-
-    # 3. Get balance
-    print("\n=== BALANCE ===")
-    r = requests.get(f"{BASE_URL}/api/balance", headers=auth_headers)
-    r.raise_for_status()
-    balance = r.json()
-    print(f"Address: {address[:40]}...")
-    print(f"Deposits: {balance.get('deposits_bnb', 0):.6f} BNB")
-    print(f"Spent:    {balance.get('spent_bnb', 0):.6f} BNB")
-    print(f"Balance:  {balance.get('balance_bnb', 0):.6f} BNB (${balance.get('balance_usd', 0):.2f})")
-
-    # 4. Get jobs
-    print("\n=== JOBS ===")
-    r = requests.get(f"{BASE_URL}/api/jobs", headers=auth_headers)
-    r.raise_for_status()
-    jobs = r.json()
-
-    if not jobs:
-        print("No jobs found")
-        return
-
-    total_spent = 0
-    for job in jobs:
-        cost = job.get("cost_bnb", 0)
-        total_spent += cost
-        print(f"\nJob: {job.get('id', 'N/A')[:8]}...")
-        print(f"  C3 Job: {job.get('c3_job_id', 'N/A')}")
-        print(f"  GPU: {job.get('gpu_type', 'N/A')}")
-        print(f"  Cost: {cost:.6f} BNB")
-        print(f"  Created: {job.get('created_at', 'N/A')}")
-
-    print(f"\nTotal spent on jobs: {total_spent:.6f} BNB")
+            sender = recv.get("from")
+            if sender:
+                deposits[sender][0] += 1
+                deposits[sender][1] += int(recv.get("amount", 0))
+    return {a: (n, wei) for a, (n, wei) in deposits.items()}
+
+
+async def reconcile(client: httpx.AsyncClient, address: str, deposit_txs: int, deposits_wei: int,
+                    tolerance: float) -> dict:
+    row = {"address": address, "deposit_txs": deposit_txs, "deposits_bnb": deposits_wei / 1e18}
+    try:
+        token = (await fetch(client, "POST", "/api/auth/admin", json={"address": address},
+                             headers={"X-BACKEND-API-KEY": API_KEY}))["token"]
+        auth = {"Authorization": f"Bearer {token}"}
+        balance, jobs = await asyncio.gather(fetch(client, "GET", "/api/balance", headers=auth),
+                                             fetch(client, "GET", "/api/jobs", headers=auth))
+    except (httpx.HTTPError, KeyError, ValueError) as e:
+        return {**row, "error": repr(e)}
+
+    jobs_cost = sum(j.get("cost_bnb") or 0 for j in jobs)
+    row.update({
+        "api_deposits_bnb": balance["deposits_bnb"],
+        "spent_bnb": balance["spent_bnb"],
+        "balance_bnb": balance["balance_bnb"],
+        "balance_usd": balance["balance_usd"],
+        "jobs": len(jobs),
+        "jobs_cost_bnb": jobs_cost,
+        "jobs_truncated": len(jobs) >= JOBS_PAGE,
+    })
+    flags = []
+    if abs(row["deposits_bnb"] - balance["deposits_bnb"]) > tolerance:
+        flags.append("deposits_mismatch")
+    if not row["jobs_truncated"] and balance["spent_bnb"] > jobs_cost + tolerance:
+        flags.append("spend_exceeds_jobs")
+    if balance["balance_bnb"] < -tolerance:
+        flags.append("negative_balance")
+    row["flags"] = ";".join(flags)
+    return row
+
+
+def load_checkpoint(path: str) -> list[dict]:
+    """Rows reconciled by a previous run; failed rows are dropped so they are retried"""
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="") as f:
+        return [row for row in csv.DictReader(f) if not row.get("error")]
+
+
+class Progress:
+    def __init__(self, total: int, every: float = 0.5):
+        self.total, self.done, self.failed, self.flagged = total, 0, 0, 0
+        self.start = self.last = time.monotonic()
+        self.every = every
+
+    def update(self, row: dict):
+        self.done += 1
+        self.failed += bool(row.get("error"))
+        self.flagged += bool(row.get("flags"))
+        now = time.monotonic()
+        if now - self.last >= self.every or self.done == self.total:
+            self.last = now
+            rate = self.done / max(now - self.start, 1e-9)
+            eta = (self.total - self.done) / rate if rate else 0
+            print(f"\r{self.done}/{self.total}  {rate:.0f}/s  eta {eta:.0f}s  "
+                  f"flagged {self.flagged}  failed {self.failed}", end="", file=sys.stderr, flush=True)
+
+
+def write_parquet(csv_path: str, out: str):
+    try:
+        import pyarrow.csv as pv
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit(f"pyarrow is required for Parquet output (report kept at {csv_path})")
+    pq.write_table(pv.read_csv(csv_path), out)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=args.timeout) as client:
+        print(f"Fetching transactions from {BASE_URL}", file=sys.stderr)
+        deposits = await discover(client)
+
+        csv_path = args.out[:-len(".parquet")] + ".csv" if args.out.endswith(".parquet") else args.out
+        rows = load_checkpoint(csv_path) if args.resume else []
+        done = {row["address"] for row in rows}
+        todo = [a for a in deposits if a not in done]
+        print(f"{len(deposits)} depositing addresses, {len(done)} already reconciled, {len(todo)} to go",
+              file=sys.stderr)
+
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+            f.flush()
+
+            progress = Progress(len(todo))
+            sem = asyncio.Semaphore(args.concurrency)
+            flagged = failed = 0
+
+            async def one(address: str):
+                nonlocal flagged, failed
+                async with sem:
+                    row = await reconcile(client, address, *deposits[address], args.tolerance)
+                writer.writerow(row)
+                progress.update(row)
+                flagged += bool(row.get("flags"))
+                failed += bool(row.get("error"))
+
+            # Bounded fan-out: at most a few batches of tasks exist at a time
+            for i in range(0, len(todo), args.concurrency * 8):
+                await asyncio.gather(*(one(a) for a in todo[i:i + args.concurrency * 8]))
+                f.flush()
+        if todo:
+            print(file=sys.stderr)
+
+    if csv_path != args.out:
+        write_parquet(csv_path, args.out)
+    flagged += sum(bool(row.get("flags")) for row in rows)
+    print(f"Report written to {args.out}: {len(deposits)} addresses, {flagged} flagged, {failed} failed"
+          + (" (re-run with --resume to retry failures)" if failed else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="billing.csv", help="report path (.csv or .parquet)")
+    parser.add_argument("--resume", action="store_true", help="keep rows from an existing report, fetch the rest")
+    parser.add_argument("--concurrency", type=int, default=32, help="addresses reconciled in parallel")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout in seconds")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="BNB difference ignored when comparing")
+    asyncio.run(run(parser.parse_args()))
 
 
 if __name__ == "__main__":
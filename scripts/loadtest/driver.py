@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Concurrent load driver for the billing backend.
+
+    python driver.py run --users 100 --duration 60 --out results/baseline.json
+    python driver.py compare results/baseline.json results/candidate.json
+
+Each virtual user signs in (auth), then replays a weighted mix of balance polling,
+job launches and job status checks until the run ends.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+import httpx
+from stubs import load_address
+
+DEFAULT_MIX = "auth=5,balance=45,launch=5,running=35,jobs=10"
+
+LAUNCH = {
+    "gpu_type": "l4",
+    "image": "ghcr.io/compute3ai/images/c3-vllm",
+    "duration_seconds": 600,
+    "env": {"MODEL_NAME": "NousResearch/Hermes-3-Llama-3.2-3B", "SERVED_MODEL_NAME": "hermes3:3b"},
+    "ports": {"lb": 8000},
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+
+    async def timed(self, name: str, request):
+        start = time.perf_counter()
+        try:
+            r = await request
+        except httpx.HTTPError as e:
+            self.errors[name] += 1
+            self.statuses[name][type(e).__name__] += 1
+            return None
+        finally:
+            self.latencies[name].append(time.perf_counter() - start)
+        self.statuses[name][str(r.status_code)] += 1
+        # 402 (insufficient balance) is an expected business outcome, not an error
+        if r.status_code >= 400 and r.status_code != 402:
+            self.errors[name] += 1
+        return r
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(rec: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for name, values in sorted(rec.latencies.items()):
+        values = sorted(values)
+        endpoints[name] = {
+            "count": len(values),
+            "errors": rec.errors[name],
+            "error_rate": rec.errors[name] / len(values),
+            "throughput_rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": values[-1] * 1000,
+            "status": dict(rec.statuses[name]),
+        }
+    total = sum(e["count"] for e in endpoints.values())
+    return {
+        "elapsed_s": elapsed,
+        "total_requests": total,
+        "total_errors": sum(e["errors"] for e in endpoints.values()),
+        "throughput_rps": total / elapsed if elapsed else 0,
+        "endpoints": endpoints,
+    }
+
+
+async def virtual_user(i: int, client: httpx.AsyncClient, rec: Recorder, mix: dict, deadline: float, think: float):
+    address = load_address(i)
+    token = None
+    names, weights = list(mix), list(mix.values())
+
+    async def auth():
+        nonlocal token
+        body = {"message": f"Sign in to Tamashii {time.time()}", "signature": "0x" + "00" * 64, "address": address}
+        r = await rec.timed("auth", client.post("/auth/verify", json=body))
+        if r is not None and r.status_code == 200:
+            token = r.json()["token"]
+
+    await auth()
+    while time.monotonic() < deadline:
+        op = random.choices(names, weights)[0]
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        if op == "auth" or token is None:
+            await auth()
+        elif op == "balance":
+            await rec.timed("balance", client.get("/balance", headers=headers))
+        elif op == "launch":
+            await rec.timed("launch", client.post("/jobs", json=LAUNCH, headers=headers))
+        elif op == "running":
+            await rec.timed("running", client.get("/jobs/running", headers=headers))
+        elif op == "jobs":
+            await rec.timed("jobs", client.get("/jobs", headers=headers))
+        if think:
+            await asyncio.sleep(random.expovariate(1 / think))
+
+
+async def run(args) -> dict:
+    mix = {k: float(v) for k, v in (p.split("=") for p in args.mix.split(","))}
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        start = time.monotonic()
+        deadline = start + args.duration
+        users = [virtual_user(args.offset + i, client, rec, mix, deadline, args.think_ms / 1000)
+                 for i in range(args.users)]
+        await asyncio.gather(*users)
+        elapsed = time.monotonic() - start
+
+    return {
+        "run": {"started": datetime.utcnow().isoformat(), "base_url": args.base_url, "users": args.users,
+                "duration_s": args.duration, "mix": mix, "think_ms": args.think_ms, "label": args.label},
+        **summarize(rec, elapsed),
+    }
+
+
+def print_report(report: dict):
+    print(f"{report['total_requests']} requests, {report['total_errors']} errors, "
+          f"{report['throughput_rps']:.1f} req/s over {report['elapsed_s']:.1f}s")
+    print(f"{'endpoint':<10} {'count':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+    for name, e in report["endpoints"].items():
+        print(f"{name:<10} {e['count']:>7} {e['throughput_rps']:>8.1f} {e['p50_ms']:>7.0f}ms "
+              f"{e['p95_ms']:>6.0f}ms {e['p99_ms']:>6.0f}ms {e['errors']:>7}")
+
+
+def compare(base: dict, new: dict):
+    print(f"{'endpoint':<10} {'metric':<8} {'base':>10} {'new':>10} {'change':>8}")
+    for name in sorted(set(base["endpoints"]) | set(new["endpoints"])):
+        b, n = base["endpoints"].get(name), new["endpoints"].get(name)
+        if not b or not n:
+            print(f"{name:<10} only in {'new' if n else 'base'}")
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate"):
+            change = (n[metric] - b[metric]) / b[metric] * 100 if b[metric] else 0.0
+            print(f"{name:<10} {metric.removesuffix('_ms').removesuffix('_rps'):<8} "
+                  f"{b[metric]:>10.2f} {n[metric]:>10.2f} {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("run", help="drive load and write a JSON report")
+    p.add_argument("--base-url", default="http://127.0.0.1:8000/api")
+    p.add_argument("--users", type=int, default=50)
+    p.add_argument("--offset", type=int, default=0, help="first load-test address index")
+    p.add_argument("--duration", type=float, default=60)
+    p.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted operations (default: {DEFAULT_MIX})")
+    p.add_argument("--think-ms", type=float, default=250, help="mean pause between a user's requests")
+    p.add_argument("--timeout", type=float, default=30)
+    p.add_argument("--label", default="")
+    p.add_argument("--out", help="write the JSON report here")
+
+    c = sub.add_parser("compare", help="compare two JSON reports")
+    c.add_argument("base")
+    c.add_argument("new")
+
+    args = parser.parse_args()
+    if args.cmd == "compare":
+        with open(args.base) as fb, open(args.new) as fn:
+            compare(json.load(fb), json.load(fn))
+        return
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
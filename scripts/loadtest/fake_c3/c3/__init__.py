@@ -0,0 +1,239 @@
+"""
+Fake C3 SDK for load tests - same surface as the parts of `c3` the backend uses.
+
+Put the parent directory first on PYTHONPATH so `from c3 import C3` resolves here:
+
+    PYTHONPATH=scripts/loadtest/fake_c3 uvicorn main:app
+
+Env:
+    FAKE_C3_LATENCY_MS   base latency per call (default 150)
+    FAKE_C3_JITTER_MS    uniform jitter added on top (default 100)
+    FAKE_C3_ERROR_RATE   probability a call raises APIError (default 0)
+    FAKE_C3_BOOT_SECONDS time from create to running (default 20)
+    FAKE_C3_REGIONS      per-region boot seconds, "down" marks a region without capacity
+                         (e.g. "us=20,eu=90,kr=down"; unlisted regions use FAKE_C3_BOOT_SECONDS)
+"""
+import os
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+LATENCY_MS = float(os.getenv("FAKE_C3_LATENCY_MS", "150"))
+JITTER_MS = float(os.getenv("FAKE_C3_JITTER_MS", "100"))
+ERROR_RATE = float(os.getenv("FAKE_C3_ERROR_RATE", "0"))
+BOOT_SECONDS = float(os.getenv("FAKE_C3_BOOT_SECONDS", "20"))
+
+REGIONS = ["us", "eu", "kr"]
+REGION_BOOT = dict(item.split("=") for item in os.getenv("FAKE_C3_REGIONS", "").split(",") if "=" in item)
+
+
+def _boot_seconds(region: str) -> float | None:
+    """Seconds from create to running in a region, None when it has no capacity"""
+    value = REGION_BOOT.get(region)
+    if value == "down":
+        return None
+    return float(value) if value else BOOT_SECONDS
+
+
+CATALOG = {
+    "l4": 0.45,
+    "l40s": 0.95,
+    "a100": 1.60,
+    "h100": 2.40,
+}
+
+_jobs: dict[str, dict] = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class APIError(Exception):
+    status_code: int
+    detail: str
+
+    def __str__(self):
+        return f"API Error {self.status_code}: {self.detail}"
+
+
+@dataclass
+class PricingTier:
+    region: str
+    on_demand: float | None = None
+    interruptible: float | None = None
+
+
+@dataclass
+class GPUPricing:
+    gpu_type: str
+    gpu_count: int
+    tiers: list[PricingTier]
+
+
+@dataclass
+class GPUConfig:
+    gpu_count: int
+    cpu_cores: float
+    memory_gb: float
+    storage_gb: float
+    regions: list[str]
+
+
+@dataclass
+class GPUType:
+    id: str
+    name: str
+    description: str
+    configs: list[GPUConfig]
+
+    def available_regions(self, gpu_count: int = 1) -> list[str]:
+        for config in self.configs:
+            if config.gpu_count == gpu_count:
+                return config.regions
+        return []
+
+
+@dataclass
+class Job:
+    job_id: str
+    job_key: str
+    state: str
+    gpu_type: str
+    gpu_count: int
+    region: str
+    interruptible: bool
+    price_per_hour: float
+    price_per_second: float
+    docker_image: str
+    runtime: int
+    hostname: str | None = None
+    created_at: float | None = None
+    started_at: float | None = None
+    completed_at: float | None = None
+
+
+@dataclass
+class GPUMetrics:
+    index: int
+    name: str
+    utilization: float
+    memory_used: float
+    memory_total: float
+    temperature: int
+    power_draw: float
+
+
+@dataclass
+class SystemMetrics:
+    cpu_percent: float
+    cpu_cores: float
+    cpu_unix_percent: float
+    memory_used: float
+    memory_limit: float
+
+
+@dataclass
+class JobMetrics:
+    gpus: list[GPUMetrics] = field(default_factory=list)
+    system: SystemMetrics | None = None
+
+
+def _call():
+    """Simulate network latency and injected failures (the real SDK is sync too)"""
+    time.sleep(max(0.0, LATENCY_MS + random.uniform(0, JITTER_MS)) / 1000)
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        raise APIError(503, "injected failure")
+
+
+def _snapshot(record: dict) -> Job:
+    now = time.time()
+    state = record["state"]
+    boot = _boot_seconds(record["region"])
+    if state == "pending" and boot is not None and now - record["created_at"] >= boot:
+        state = "running"
+        record.update(state=state, started_at=record["created_at"] + boot,
+                      hostname=f"{record['job_id'][:8]}.fake-c3.local")
+    if state == "running" and now - record["started_at"] >= record["runtime"]:
+        state = "completed"
+        record.update(state=state, completed_at=record["started_at"] + record["runtime"])
+    return Job(**{k: record[k] for k in Job.__dataclass_fields__})
+
+
+class Instances:
+    def pricing(self, refresh: bool = False) -> dict[str, GPUPricing]:
+        _call()
+        return {f"{gpu}_x1": GPUPricing(gpu, 1, [PricingTier(r, price * 2, price) for r in REGIONS])
+                for gpu, price in CATALOG.items()}
+
+    def types(self, refresh: bool = False) -> dict[str, GPUType]:
+        """Like the real catalog, a config only lists the regions that currently have capacity"""
+        _call()
+        regions = [r for r in REGIONS if _boot_seconds(r) is not None]
+        return {gpu: GPUType(gpu, gpu.upper(), "", [GPUConfig(1, 8, 32, 100, regions)]) for gpu in CATALOG}
+
+
+class Jobs:
+    def create(self, image: str, command: str = None, gpu_type: str = "l40s", gpu_count: int = 1,
+               region: str = None, runtime: int = None, interruptible: bool = True, env: dict = None,
+               ports: dict = None, auth: bool = False) -> Job:
+        _call()
+        if gpu_type not in CATALOG:
+            raise APIError(400, f"Unknown GPU type: {gpu_type}")
+        price = CATALOG[gpu_type]
+        record = {
+            "job_id": str(uuid.uuid4()), "job_key": uuid.uuid4().hex, "state": "pending",
+            "gpu_type": gpu_type, "gpu_count": gpu_count, "region": region or random.choice(REGIONS),
+            "interruptible": interruptible, "price_per_hour": price, "price_per_second": price / 3600,
+            "docker_image": image, "runtime": runtime or 3600, "hostname": None,
+            "created_at": time.time(), "started_at": None, "completed_at": None,
+        }
+        with _lock:
+            _jobs[record["job_id"]] = record
+        return _snapshot(record)
+
+    def _get(self, job_id: str) -> dict:
+        record = _jobs.get(job_id)
+        if record is None:
+            raise APIError(404, "Job not found")
+        return record
+
+    def get(self, job_id: str) -> Job:
+        _call()
+        return _snapshot(self._get(job_id))
+
+    def list(self, state: str = None) -> list[Job]:
+        _call()
+        jobs = [_snapshot(r) for r in list(_jobs.values())]
+        return [j for j in jobs if not state or j.state == state]
+
+    def cancel(self, job_id: str) -> dict:
+        _call()
+        self._get(job_id).update(state="cancelled", completed_at=time.time())
+        return {"job_id": job_id, "state": "cancelled"}
+
+    def extend(self, job_id: str, runtime: int) -> Job:
+        _call()
+        record = self._get(job_id)
+        record["runtime"] = runtime
+        return _snapshot(record)
+
+    def logs(self, job_id: str) -> str:
+        _call()
+        self._get(job_id)
+        return "fake-c3: container started\n"
+
+    def metrics(self, job_id: str) -> JobMetrics:
+        _call()
+        self._get(job_id)
+        return JobMetrics(
+            gpus=[GPUMetrics(0, "FAKE GPU", random.uniform(0, 100), 12000, 24000, 55, 180.0)],
+            system=SystemMetrics(35.0, 8, 35.0, 8000, 32000),
+        )
+
+
+class C3:
+    def __init__(self, api_key: str = None, api_url: str = None):
+        self._api_key = api_key or "fake"
+        self.instances = Instances()
+        self.jobs = Jobs()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the railgun HTTP API and CoinGecko.
+
+    python stubs.py --addresses 1000 --latency-ms 50 --jitter-ms 30 --error-rate 0.01
+
+Railgun stub: /verify (always valid), /transactions, /transactions/{addr}, /address
+CoinGecko stub: /api/v3/simple/price
+
+Every load-test address ("0zkload000000" ...) has a deterministic deposit history.
+"""
+import argparse
+import asyncio
+import random
+import zlib
+from dataclasses import dataclass
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+import uvicorn
+
+SERVICE_ADDRESS = "0zk1qyloadteststubservicev7j6fe3z53llhxknrhvmdlyzrswk5ghkmz"
+
+
+def load_address(i: int) -> str:
+    return f"0zkload{i:06d}"
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    error_rate: float = 0
+
+    async def apply(self):
+        """Sleep for latency + jitter, returns an error response when one is injected"""
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            return JSONResponse({"error": "injected failure"}, status_code=500)
+        return None
+
+
+def deposits_for(address: str, per_address: int) -> list[dict]:
+    """Deterministic deposit history for an address in the railgun response format"""
+    rng = random.Random(zlib.crc32(address.encode()))
+    txs = []
+    for n in range(rng.randint(1, per_address)):
+        txs.append({
+            "txid": f"0x{rng.getrandbits(256):064x}",
+            "blockNumber": 40_000_000 + n,
+            "timestamp": 1_733_000_000 + n * 60,
+            "category": "TransferReceiveERC20",
+            "received": [{
+                "token": "0xbb4cdb9cbd36b01bd1cbaebf2de08d9173bc095c",
+                "amount": str(rng.randint(5, 50) * 10**17),
+                "from": address,
+                "memo": None,
+            }],
+        })
+    return txs
+
+
+def railgun_app(faults: Faults, addresses: int, per_address: int) -> FastAPI:
+    app = FastAPI(title="railgun-stub")
+    history = [tx for i in range(addresses) for tx in deposits_for(load_address(i), per_address)]
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "wallet": "loaded", "scanning": False, "progress": "100.0%"}
+
+    @app.get("/address")
+    async def address():
+        return await faults.apply() or {"evmAddress": "0x" + "11" * 20, "railgunAddress": SERVICE_ADDRESS}
+
+    @app.post("/verify")
+    async def verify():
+        return await faults.apply() or {"valid": True}
+
+    @app.get("/transactions")
+    async def transactions():
+        return await faults.apply() or {"transactions": history}
+
+    @app.get("/transactions/{address}")
+    async def transactions_for(address: str):
+        return await faults.apply() or {"transactions": deposits_for(address, per_address)}
+
+    return app
+
+
+def coingecko_app(faults: Faults, price: float) -> FastAPI:
+    app = FastAPI(title="coingecko-stub")
+
+    @app.get("/api/v3/simple/price")
+    async def simple_price(ids: str = "binancecoin", vs_currencies: str = "usd"):
+        drift = price * random.uniform(-0.002, 0.002)
+        return await faults.apply() or {i: {vs_currencies: round(price + drift, 2)} for i in ids.split(",")}
+
+    return app
+
+
+async def serve(args):
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate)
+    servers = [
+        uvicorn.Server(uvicorn.Config(railgun_app(faults, args.addresses, args.deposits), host=args.host,
+                                      port=args.railgun_port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(coingecko_app(faults, args.bnb_price), host=args.host,
+                                      port=args.coingecko_port, log_level="warning")),
+    ]
+    print(f"railgun stub:   RAILGUN_URL=http://{args.host}:{args.railgun_port}")
+    print(f"coingecko stub: COINGECKO_URL=http://{args.host}:{args.coingecko_port}/api/v3")
+    await asyncio.gather(*(s.serve() for s in servers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--railgun-port", type=int, default=3900)
+    parser.add_argument("--coingecko-port", type=int, default=3901)
+    parser.add_argument("--addresses", type=int, default=1000, help="addresses in the full /transactions history")
+    parser.add_argument("--deposits", type=int, default=20, help="max deposits per address")
+    parser.add_argument("--bnb-price", type=float, default=650.0)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
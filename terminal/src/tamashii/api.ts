@@ -228,3 +228,73 @@ export const getRunningJob = async (): Promise<{ job: RunningJob | null }> => {
   if (!currentJwt) throw new Error("Not authenticated");
   return apiRequest("GET", "/jobs/running");
 };
+
+/**
+ * Stream job lifecycle events (queued, billed, running, terminated) instead of polling
+ * getRunningJob. Returns a function that closes the stream.
+ */
+export type JobEventType = "queued" | "billed" | "running" | "terminated";
+
+export interface JobEvent {
+  job_id: string;
+  c3_job_id: string;
+  gpu_type: string;
+  cost_bnb: number;
+  billed: boolean;
+  state?: string;
+  hostname?: string | null;
+}
+
+export const subscribeJobEvents = (
+  onEvent: (type: JobEventType, event: JobEvent) => void,
+  onError?: (err: Error) => void
+): (() => void) => {
+  if (!currentJwt) throw new Error("Not authenticated");
+  const url = new URL(TAMASHII_API_URL + "/jobs/events");
+  const isHttps = url.protocol === "https:";
+  const protocol = isHttps ? https : http;
+
+  const req = protocol.request(
+    {
+      hostname: url.hostname,
+      port: url.port || (isHttps ? 443 : 80),
+      path: url.pathname,
+      method: "GET",
+      headers: { Authorization: `Bearer ${currentJwt}`, Accept: "text/event-stream" },
+    },
+    (res) => {
+      if (res.statusCode && res.statusCode >= 400) {
+        onError?.(new Error(`API error ${res.statusCode}`));
+        res.resume();
+        return;
+      }
+      res.setEncoding("utf8");
+      let buffer = "";
+      res.on("data", (chunk: string) => {
+        buffer += chunk;
+        let end: number;
+        while ((end = buffer.indexOf("\n\n")) !== -1) {
+          const block = buffer.slice(0, end);
+          buffer = buffer.slice(end + 2);
+          let type = "";
+          let data = "";
+          for (const line of block.split("\n")) {
+            if (line.startsWith("event: ")) type = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
+          }
+          if (type && data) {
+            try {
+              onEvent(type as JobEventType, JSON.parse(data) as JobEvent);
+            } catch (e) {
+              onError?.(e as Error);
+            }
+          }
+        }
+      });
+      res.on("end", () => onError?.(new Error("Job event stream closed")));
+    }
+  );
+  req.on("error", (err) => onError?.(err));
+  req.end();
+  return () => req.destroy();
+};